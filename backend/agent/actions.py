@@ -0,0 +1,312 @@
+from utils.dom_mapper import build_strategies
+from utils.verify import verify_text
+from agent.plan import (register_action, GotoStep, TargetStep, TypeStep, SelectStep, WaitStep,
+                        ScrollStep, SearchStep, PlayStep, VerifyStep)
+
+# Built-in actions. Each handler runs one attempt of a compiled step (agent/plan.py)
+# and returns its result; raising fails the attempt and lets the retry policy decide.
+
+# Common consent button labels, with their strategy lists built once
+CONSENT_BUTTONS = [(label, build_strategies(label)) for label in ["Accept all", "Accept", "Agree", "I agree", "Consent"]]
+SEARCH_TRIGGER_STRATEGIES = build_strategies("Search")
+INPUT_SELECTOR = "input[type='text'], input[type='search'], input:not([type='hidden'])"
+
+
+# ---------------- OPEN ----------------
+@register_action("goto", GotoStep)
+async def goto(ctx, step):
+    page = ctx.page
+    ctx.log(f"Executing GOTO: {step.url}")
+    with ctx.tracer.span("navigation", url=step.url):
+        await page.goto(step.url, timeout=30000)
+        await page.wait_for_load_state("domcontentloaded")
+    ctx.log(f"Page loaded: {step.url}")
+
+    # Handle Google consent if present
+    try:
+        for btn_label, strategies in CONSENT_BUTTONS:
+            accept_btn = await ctx.find(page, btn_label, timeout=1000, strategies=strategies)
+            if accept_btn and await accept_btn.is_visible():
+                ctx.log(f"Dismissing cookie banner: {btn_label}")
+                await accept_btn.click()
+                await ctx.waits.network_idle("open", timeout_ms=2000)
+                break
+    except:
+        pass
+
+    return await ctx.passed(step, step.url, action="OPEN")
+
+
+# ---------------- CLICK ----------------
+@register_action("click", TargetStep)
+async def click(ctx, step):
+    ctx.log(f"Executing CLICK: {step.target}")
+    candidate = await ctx.locate(ctx.page, step.target, "click", step.no, step.strategies)
+    if not candidate:
+        raise Exception(f"Could not find element to click: {step.target}")
+
+    try:
+        # Force click to bypass overlay checks
+        await candidate.click(force=True, timeout=5000)
+        ctx.log("Click successful.")
+    except Exception as e:
+        ctx.log(f"Click failed: {e}")
+        raise e
+
+    await ctx.page.wait_for_load_state("domcontentloaded")
+    return await ctx.passed(step, step.target)
+
+
+# ---------------- TYPE ----------------
+@register_action("type", TypeStep)
+async def type_text(ctx, step):
+    ctx.log(f"Executing TYPE: '{step.input_text}' into '{step.target}'")
+    candidate = await ctx.locate(ctx.page, step.target, "type", step.no, step.strategies)
+    if not candidate:
+        raise Exception(f"Could not find element to type into: {step.target}")
+
+    try:
+        await candidate.click(force=True) # Focus
+        await candidate.fill(step.input_text)
+        ctx.log("Type successful.")
+    except Exception as e:
+        ctx.log(f"Type failed: {e}")
+        raise e
+
+    return await ctx.passed(step, step.target)
+
+
+# ---------------- HOVER ----------------
+@register_action("hover", TargetStep)
+async def hover(ctx, step):
+    ctx.log(f"Executing HOVER: {step.target}")
+    candidate = await ctx.locate(ctx.page, step.target, "hover", step.no, step.strategies)
+    if not candidate:
+        raise Exception(f"Could not find element to hover: {step.target}")
+
+    # Start hovering
+    await candidate.hover(force=True)
+
+    # CRITICAL: Wait and Keep Hovering
+    # Many menus disappear if the mouse leaves instantly or if JS is slow.
+    # We keep the mouse "technically" over the element until the menu
+    # has finished rendering (DOM stops changing), bounded at 2s.
+    await ctx.waits.dom_quiet("hover", quiet_ms=300, timeout_ms=2000)
+    return await ctx.passed(step, step.target)
+
+
+# ---------------- SELECT (Dropdown) ----------------
+@register_action("select", SelectStep)
+async def select(ctx, step):
+    ctx.log(f"Executing SELECT: '{step.option}' from '{step.target}'")
+
+    # Find the <select> element (or a wrapper)
+    candidate = await ctx.locate(ctx.page, step.target, "select", step.no, step.strategies)
+    if not candidate:
+        raise Exception(f"Could not find dropdown: {step.target}")
+
+    # Check if it's a standard <select>
+    tag = await candidate.evaluate("el => el.tagName")
+    if tag == "SELECT":
+        await candidate.select_option(label=step.option)
+    else:
+        # Try to find a select inside
+        # Works for both resolved ElementHandles and healed Locators
+        sel = (await candidate.evaluate_handle("el => el.querySelector('select')")).as_element()
+        if sel:
+            await sel.select_option(label=step.option)
+        else:
+            # Fallback for custom dropdowns (Click dropdown, then click option)
+            ctx.log("Not a standard <select>, trying click-to-select...")
+            await candidate.click()
+            await ctx.waits.dom_quiet("select", quiet_ms=200, timeout_ms=1000)
+            opt = await ctx.find(ctx.page, step.option, strategies=step.option_strategies)
+            if opt:
+                await opt.click()
+            else:
+                raise Exception("Could not find dropdown option")
+
+    return await ctx.passed(step, f"{step.option} in {step.target}")
+
+
+# ---------------- WAIT ----------------
+@register_action("wait", WaitStep)
+async def wait(ctx, step):
+    ctx.log(f"Executing WAIT: {step.seconds} seconds...")
+    await ctx.pause(step.seconds)
+    return await ctx.passed(step, f"{step.seconds}s", screenshot=False)
+
+
+# ---------------- SCROLL ----------------
+@register_action("scroll", ScrollStep)
+async def scroll(ctx, step):
+    ctx.log(f"Executing SCROLL: {step.direction}")
+    await ctx.page.mouse.wheel(0, step.delta)
+    # Lazy-loaded content renders after the scroll
+    await ctx.waits.dom_quiet("scroll", quiet_ms=200, timeout_ms=1000)
+    return await ctx.passed(step, step.direction)
+
+
+# ---------------- SEARCH ----------------
+@register_action("search", SearchStep)
+async def search(ctx, step):
+    page = ctx.page
+    # Strategy 1: Look for an already visible input field first
+    ctx.log(f"Executing SEARCH: {step.query}")
+    search_box = page.locator(INPUT_SELECTOR).filter(has=page.locator("visible=true")).first
+
+    if await search_box.count() > 0 and await search_box.is_visible():
+        ctx.log("Found visible search input directly.")
+    else:
+        # Strategy 2: If no visible input, find a "Search" button/icon and click it
+        ctx.log("No visible input. Looking for search triggers...")
+        trigger = await ctx.find(page, "Search", timeout=3000, strategies=SEARCH_TRIGGER_STRATEGIES)
+
+        if trigger:
+            ctx.log("Found search trigger. Clicking...")
+            await trigger.click(force=True)
+            # Wait for an input to appear
+            try:
+                await page.locator(INPUT_SELECTOR).wait_for(state="visible", timeout=3000)
+                # Re-select to get the locator handle
+                search_box = page.locator(INPUT_SELECTOR).filter(has=page.locator("visible=true")).first
+            except:
+                ctx.log("No input appeared after clicking trigger.")
+                search_box = None
+        else:
+            ctx.log("No search trigger found.")
+            search_box = None
+
+    # Fallback: Just grab the first input we can find, even if we aren't sure
+    if not search_box or await search_box.count() == 0:
+        ctx.log("Fallback: searching for any input.")
+        search_box = page.locator("input").first
+
+    if not search_box or await search_box.count() == 0:
+        raise Exception("Could not find any search input field.")
+
+    # Ensure we are interacting with an input-like element
+    tag_name = (await search_box.evaluate("el => el.tagName")).upper()
+    is_editable = await search_box.evaluate("el => el.isContentEditable")
+
+    if tag_name not in ["INPUT", "TEXTAREA"] and not is_editable:
+        # Sometimes the locator captures a wrapper div. Try to find an input inside.
+        ctx.log(f"Target is {tag_name}, looking for internal input...")
+        internal_input = search_box.locator("input, textarea").first
+        if await internal_input.count() > 0:
+            search_box = internal_input
+
+    ctx.log("Filling search box...")
+    await search_box.click(force=True)
+    await search_box.fill(step.query)
+    url_before_search = page.url
+    await page.keyboard.press("Enter")
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=10000)
+    except:
+        pass # Continue even if timeout (e.g. YouTube keeps loading)
+
+    # WAIT FOR RESULTS TO APPEAR
+    # After searching, wait for the results navigation and for new content to render
+    await ctx.waits.settle("search", timeout_ms=2000, old_url=url_before_search)
+    return await ctx.passed(step, step.query)
+
+
+# ---------------- PLAY ----------------
+@register_action("play", PlayStep)
+async def play(ctx, step):
+    page = ctx.page
+    ctx.log(f"Executing PLAY: {step.target}")
+
+    video_element = None
+
+    # 1. YouTube Specific: Target the main video title Link
+    if "youtube.com" in page.url:
+        ctx.log("YouTube Context: scanning for video titles...")
+        # Get all video titles
+        titles = page.locator("a#video-title")
+        count = await titles.count()
+        if count > 0:
+            # Pick the first visible one that isn't empty
+            for i in range(min(5, count)):
+                t = titles.nth(i)
+                if await t.is_visible():
+                    video_element = t
+                    ctx.log("Found visible YouTube video title.")
+                    break
+
+    # 2. Spotify Context: Target the specific song/artist play button
+    if not video_element and "spotify.com" in page.url:
+        ctx.log("Spotify Context: looking for play buttons...")
+        # Spotify often has green play buttons or list items
+        # Try finding the specific text first
+        if step.song_name:
+            video_element = await ctx.find(page, step.song_name, strategies=step.song_strategies)
+
+        if not video_element:
+            # Fallback: Click the big green play button if visible
+            video_element = page.locator("[data-testid='play-button']").first
+
+    # 3. Generic Fallback (Text Match)
+    if not video_element:
+        if step.first:
+            # Generic strategy for "click the first thing that looks like a video"
+            # This is risky but better than failing
+            video_element = page.locator("a").first
+        else:
+            video_element = await ctx.find(page, step.target, strategies=step.strategies)
+
+    if not video_element:
+        raise Exception(f"Could not find video/song to play: {step.target}")
+
+    try:
+        await video_element.scroll_into_view_if_needed()
+        await video_element.hover() # Helping UI wake up
+        await ctx.waits.stable("play", video_element, timeout_ms=500)
+        url_before_play = page.url
+        await video_element.click(force=True)
+        ctx.log("Clicked video/song successfully.")
+
+        # Wait for player/page load
+        await ctx.waits.settle("play", timeout_ms=3000, old_url=url_before_play)
+    except Exception as e:
+        ctx.log(f"Failed to click video element: {e}")
+        raise e
+
+    return await ctx.passed(step, step.target)
+
+
+# ---------------- VERIFY ----------------
+@register_action("verify", VerifyStep)
+async def verify(ctx, step):
+    page = ctx.page
+    ctx.log(f"Executing VERIFY: {step.expected}")
+    current_url = page.url
+    ctx.log(f"Checking content in URL: {current_url} and Page Title/Content")
+
+    # Plain verifies on search/result pages pass on the URL alone, without touching the page
+    url_match = (step.mode == "contains" and not step.container and not step.visible_only
+                 and ("google" in current_url or "search" in current_url))
+    check = None
+    if not url_match:
+        # Searched inside the page, stopping at the first match (no page.content() transfer)
+        with ctx.tracer.span("verify", mode=step.mode):
+            check = await verify_text(page, step.expected, mode=step.mode, visible_only=step.visible_only, container=step.container)
+        ctx.log(f"Scanned {check['nodes']} text node(s) ({check['chars']} chars) in {check['elapsed_ms']}ms")
+
+    if url_match or check["found"]:
+        ctx.log("Verification SUCCESS found content match.")
+        result = await ctx.passed(step, current_url)
+    else:
+        ctx.log(f"Verification FAILED. Content '{step.expected}' not found.")
+        result = {
+            "step_no": step.no,
+            "action": "VERIFY",
+            "target": current_url,
+            "status": "FAIL",
+            "error": f"Content '{step.expected}' not found in URL or Page Title",
+            "screenshot": await ctx.take_screenshot(page, step.no, "FAIL")
+        }
+    if check:
+        result["verify"] = {"mode": step.mode, "nodes_scanned": check["nodes"], "chars_scanned": check["chars"], "ms": check["elapsed_ms"]}
+    return result
@@ -0,0 +1,191 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+import threading
+import uuid
+import time
+import os
+
+# Worker processes for batch runs (each owns its own Playwright + browser)
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", str(os.cpu_count() or 2)))
+# Batches submitted through the API: how many run at once, and how many finished ones are kept for polling
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "1"))
+BATCH_HISTORY = int(os.environ.get("BATCH_HISTORY", "20"))
+
+MODES = ("run-all", "fail-fast")
+
+
+def _init_worker():
+    # One scenario at a time per process, so one warm browser is enough
+    from utils.browser_pool import configure_browser_pool
+    configure_browser_pool(size=1)
+
+
+def _scenario_status(report):
+    summary = (report or {}).get("summary", {})
+    return "PASS" if summary.get("failed", 1) == 0 and summary.get("total_steps", 0) > 0 else "FAIL"
+
+
+def _run_scenario(index, instruction, api_key, options=None):
+    # Runs inside a worker process
+    from agent.graph import run_agent
+
+    started = time.monotonic()
+    try:
+        report = run_agent(instruction, api_key, options=options)
+        error = None
+    except Exception as e:
+        report = None
+        error = f"Scenario crashed: {e}"
+
+    return {
+        "index": index,
+        "instruction": instruction,
+        "status": _scenario_status(report) if report else "FAIL",
+        "duration_s": round(time.monotonic() - started, 2),
+        "error": error,
+        "report": report,
+    }
+
+
+def run_batch(instructions, api_key=None, workers=None, mode="run-all", on_result=None, options=None):
+    """
+    Runs many scenarios in parallel, one per worker process.
+
+    mode="fail-fast" stops scheduling new scenarios after the first failure
+    (scenarios already running are allowed to finish). on_result, if given, is
+    called in the parent process with each finished scenario. options are the
+    per-run settings passed to every scenario (e.g. {"network_profile": "lean"}).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown batch mode '{mode}'. Expected one of {MODES}")
+
+    workers = max(1, min(workers or BATCH_WORKERS, len(instructions) or 1))
+    started = time.monotonic()
+    scenarios = {}
+    stopped = False
+
+    # 'spawn' gives every worker a clean interpreter: Playwright must not be forked
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+        futures = {pool.submit(_run_scenario, i, instruction, api_key, options): i
+                   for i, instruction in enumerate(instructions)}
+        pending = set(futures)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Worker process died (e.g. browser crash took it down)
+                    result = {"index": i, "instruction": instructions[i], "status": "FAIL",
+                              "duration_s": None, "error": f"Worker failed: {e}", "report": None}
+                scenarios[i] = result
+                if on_result:
+                    on_result(result)
+                if mode == "fail-fast" and result["status"] == "FAIL":
+                    stopped = True
+
+            if stopped:
+                for future in pending:
+                    future.cancel()
+                pending = {f for f in pending if not f.cancelled()}
+
+    for i, instruction in enumerate(instructions):
+        if i not in scenarios:
+            scenarios[i] = {"index": i, "instruction": instruction, "status": "SKIPPED",
+                            "duration_s": None, "error": "Skipped after an earlier failure (fail-fast)",
+                            "report": None}
+
+    ordered = [scenarios[i] for i in range(len(instructions))]
+    return {
+        "summary": _aggregate(ordered, workers, mode, time.monotonic() - started),
+        "scenarios": ordered,
+    }
+
+
+def _aggregate(scenarios, workers, mode, elapsed):
+    passed = sum(1 for s in scenarios if s["status"] == "PASS")
+    skipped = sum(1 for s in scenarios if s["status"] == "SKIPPED")
+    step_summaries = [s["report"]["summary"] for s in scenarios if s["report"]]
+    total_steps = sum(s.get("total_steps", 0) for s in step_summaries)
+    passed_steps = sum(s.get("passed", 0) for s in step_summaries)
+    scenario_time = sum(s["duration_s"] or 0 for s in scenarios)
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "total_scenarios": len(scenarios),
+        "passed": passed,
+        "failed": len(scenarios) - passed - skipped,
+        "skipped": skipped,
+        "pass_percentage": round((passed / len(scenarios)) * 100, 2) if scenarios else 0,
+        "total_steps": total_steps,
+        "passed_steps": passed_steps,
+        "failed_steps": total_steps - passed_steps,
+        "duration_s": round(elapsed, 2),
+        # Sum of scenario durations / wall clock: ~workers when scaling linearly
+        "parallel_speedup": round(scenario_time / elapsed, 2) if elapsed else 0,
+    }
+
+
+# ---------------- BACKGROUND BATCHES ----------------
+_batches = {} # batch_id -> state, in submission order
+_batches_lock = threading.Lock()
+_batch_slots = threading.BoundedSemaphore(max(1, BATCH_CONCURRENCY))
+
+
+def _prune_batches():
+    finished = [bid for bid, b in _batches.items() if b["status"] in ("done", "failed")]
+    for bid in finished[:max(0, len(finished) - BATCH_HISTORY)]:
+        del _batches[bid]
+
+
+def submit_batch(instructions, api_key=None, workers=None, mode="run-all", on_result=None, options=None):
+    """
+    Runs run_batch() in a background thread (BATCH_CONCURRENCY batches at a time).
+    Returns the batch id; poll get_batch() for progress and the batch report.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown batch mode '{mode}'. Expected one of {MODES}")
+
+    batch_id = uuid.uuid4().hex
+    state = {"batch_id": batch_id, "status": "queued", "mode": mode, "total_scenarios": len(instructions),
+             "completed": 0, "passed": 0, "failed": 0, "submitted_at": time.time(), "finished_at": None,
+             "error": None, "report": None}
+    with _batches_lock:
+        _batches[batch_id] = state
+        _prune_batches()
+
+    def progress(result):
+        with _batches_lock:
+            state["completed"] += 1
+            state["passed" if result["status"] == "PASS" else "failed"] += 1
+        if on_result:
+            on_result(result)
+
+    def work():
+        with _batch_slots:
+            with _batches_lock:
+                state["status"] = "running"
+            try:
+                report = run_batch(instructions, api_key, workers=workers, mode=mode, on_result=progress, options=options)
+                status, error = "done", None
+            except Exception as e:
+                report, status, error = None, "failed", str(e)
+                print(f"❌ Batch {batch_id} failed: {e}")
+        with _batches_lock:
+            state.update(status=status, error=error, report=report, finished_at=time.time())
+
+    threading.Thread(target=work, name=f"batch-{batch_id[:8]}", daemon=True).start()
+    return batch_id
+
+
+def get_batch(batch_id):
+    """State of a submitted batch (its report once done), or None if unknown or expired."""
+    with _batches_lock:
+        state = _batches.get(batch_id)
+        return dict(state) if state else None
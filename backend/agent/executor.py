@@ -1,438 +1,286 @@
-from playwright.sync_api import sync_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+import asyncio
 import time
 import sys
 import os
 
 # Add backend to sys.path to resolve utils import
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.dom_mapper import find_element
+from utils.dom_mapper import find_element, resolve_element, find_element_cascade, describe_element
+from utils import selector_cache
 from utils.healing import heal_element
-
-def run_test(steps):
+from utils.browser_pool import get_browser_pool
+from utils.async_runtime import run_sync
+from utils.waits import WaitEngine
+from utils.tracing import Tracer
+from utils.retry_policy import StepRetry, summarize as summarize_retries
+from agent.plan import compile_plan, PlanError, StepContext
+from utils.network_profiles import resolve_profile
+from utils.response_cache import ResponseCache
+from utils.screenshots import ScreenshotRecorder
+from utils import retention
+from utils import events
+from utils import metrics
+
+STEPS = metrics.counter("steps_total", "Executed steps by action and final status", ("action", "status"))
+STEP_LATENCY = metrics.histogram("step_duration_seconds", "Step time including retries and waits", ("action",), buckets=metrics.STEP_BUCKETS)
+STEP_RETRIES = metrics.counter("step_retries_total", "Failed step attempts by error class", ("action", "error_class"))
+HEALS = metrics.counter("healing_attempts_total", "Self-healing invocations by result (healed, failed)", ("result",))
+SCREENSHOTS = metrics.counter("screenshots_total", "Screenshots by outcome (captured, of which deduplicated; skipped by policy)", ("outcome",))
+SCREENSHOT_BYTES = metrics.counter("screenshot_bytes_total", "Bytes of screenshot files written")
+
+async def run_test_async(steps, cancel_event=None, options=None, run_id=None):
+    """
+    Async execution core: runs one scenario in its own pooled BrowserContext.
+    Many of these can run concurrently on the same event loop.
+
+    steps: step dicts from the generator (or an already compiled plan, see agent/plan.py).
+    options: per-run settings, e.g. {"network_profile": "lean", "response_cache": "replay",
+    "screenshot_policy": "failure"}. run_id selects the per-run artifact directory and
+    the event channel that streams progress (utils.events) while the run executes.
+    Returns (results, logs, run_info); run_info holds run-level stats for the report.
+    """
     results = []
     logs = []
+    options = options or {}
+    run_info = {}
+    # Spans for steps, attempts, locating, healing, waits, screenshots and navigation
+    tracer = Tracer()
+    tracer.activate()
+    run_span = tracer.start("run", steps=len(steps))
 
     def log(message):
         print(message)
         logs.append(message)
 
-    # Setup screenshots directory
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    SCREENSHOTS_DIR = os.path.join(BASE_DIR, "reports", "screenshots")
-    os.makedirs(SCREENSHOTS_DIR, exist_ok=True)
+    def emit(event_type, **data):
+        events.publish(run_id, event_type, **data)
+
+    # Setup screenshots directory (reports/runs/<shard>/<run_id>/)
+    if run_id:
+        SCREENSHOTS_DIR = retention.run_dir(run_id, create=True)
+    else:
+        SCREENSHOTS_DIR = retention.LEGACY_SCREENSHOTS_DIR
+        os.makedirs(SCREENSHOTS_DIR, exist_ok=True)
 
-    def take_screenshot(page, step_no, status):
-        filename = f"step_{step_no}_{status}_{int(time.time())}.png"
-        path = os.path.join(SCREENSHOTS_DIR, filename)
+    async def take_screenshot(page, step_no, status):
         try:
-            page.screenshot(path=path)
-            return filename
+            with tracer.span("screenshot", step=step_no):
+                return await shots.capture(page, step_no, status)
         except Exception as e:
             log(f"Failed to take screenshot: {e}")
             return None
 
+    async def find(page, label, **kwargs):
+        with tracer.span("find_element", target=label):
+            return await find_element(page, label, **kwargs)
+
+    async def pause(seconds):
+        # Sleeps in short slices so a cancelled run doesn't sit out a long WAIT step
+        until = time.monotonic() + seconds
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise Exception("Run cancelled")
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(0.25, remaining))
+
+    async def locate(page, target, action, step_no, strategies=None):
+        with tracer.span("locate", target=target, action=action):
+            return await _locate(page, target, action, step_no, strategies)
+
+    async def _locate(page, target, action, step_no, strategies):
+        """
+        Finds the element for 'target': learned selector first, then the
+        strategy cascade (the step's precompiled 'strategies'), then self-healing.
+        Whatever works is cached.
+        """
+        # Cache reads/writes are SQLite round trips: keep them off the shared browser loop
+        cached = await asyncio.to_thread(selector_cache.lookup, page.url, target, action)
+        if cached:
+            with tracer.span("locate.cached"):
+                candidate = await selector_cache.validate(page, cached)
+            if candidate:
+                log(f"Selector cache hit for '{target}': {cached}")
+                await asyncio.to_thread(selector_cache.record_hit, page.url, target, action)
+                return candidate
+            log(f"Cached selector for '{target}' no longer matches. Invalidating.")
+            await asyncio.to_thread(selector_cache.invalidate, page.url, target, action)
+
+        candidate, strategy = None, None
+        with tracer.span("locate.resolve"):
+            try:
+                candidate, strategy = await resolve_element(page, target, strategies)
+            except Exception:
+                try:
+                    candidate = await find_element_cascade(page, target, strategies=strategies)
+                except Exception:
+                    pass # Proceed to healing
+
+        if not candidate:
+            # 🏥 SELF-HEALING 🏥
+            log(f"Element '{target}' not found. Attempting Self-Healing...")
+            with tracer.span("heal", target=target):
+                candidate = await heal_element(page, target)
+            HEALS.inc(result="healed" if candidate else "failed")
+            if candidate:
+                log(f"Self-Healing SUCCESS: Found substitute element.")
+                strategy = await describe_element(candidate)
+                emit("healed", step_no=step_no, target=target, strategy=strategy)
+
+        if candidate and strategy:
+            await asyncio.to_thread(selector_cache.store, page.url, target, action, strategy)
+        return candidate
+
+    # Validated and precomputed once, before a browser is leased
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=False,
-                args=["--start-maximized"]
-            )
-
-            context = browser.new_context(
-                user_agent=(
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 Chrome/120 Safari/537.36"
-                ),
-                viewport={"width": 1280, "height": 800}
-            )
+        plan = compile_plan(steps)
+    except PlanError as e:
+        log(f"❌ Invalid step plan: {e}")
+        tracer.end(run_span, error=str(e))
+        run_info["trace"] = tracer.export()
+        return [{
+            "step_no": e.step_no,
+            "action": str(e.step_type or "STEP").upper(),
+            "target": "Step plan",
+            "status": "FAIL",
+            "error": str(e),
+            "screenshot": None
+        }], logs, run_info
 
-            page = context.new_page()
+    emit("run_started", total_steps=len(plan), steps=[step.describe() for step in plan])
 
-            for idx, step in enumerate(steps):
-                retries = 3
+    try:
+        # Blocks configured resource types / URL patterns for this run only
+        network = resolve_profile(options.get("network_profile"))
+        run_info["network"] = network.stats
+        # Records / replays HTTP responses from the on-disk cache (off by default)
+        cache = ResponseCache(options.get("response_cache"), options.get("response_cache_miss"))
+        if cache.enabled:
+            run_info["response_cache"] = cache.stats
+        # Captured in memory; encoding and writing happen on background threads
+        shots = ScreenshotRecorder(SCREENSHOTS_DIR, options.get("screenshot_policy"),
+                                   on_ready=lambda step_no, filename: emit("screenshot_ready", step_no=step_no, screenshot=filename))
+
+        async def close_on_cancel(context):
+            # Closing the page interrupts a step in flight instead of waiting for its timeouts
+            while not cancel_event.is_set():
+                await asyncio.sleep(0.25)
+            log("Run cancelled. Closing the page to stop the current step.")
+            for page in list(context.pages):
+                await page.close()
+
+        # Runs on a warm pooled browser; the lease's context is closed afterwards
+        async def execute(lease):
+            log(f"Leased browser worker #{lease.worker_id} (waited {lease.wait_ms}ms, reuse #{lease.reuse_count})")
+            # Route handlers run last-registered-first: blocking happens before the cache is consulted
+            await cache.attach(lease.context)
+            await network.attach(lease.context)
+            if network.blocks_anything:
+                log(f"Network profile '{network.name}': blocking {sorted(network.resource_types) or 'no resource types'} and {len(network.url_patterns)} URL pattern(s)")
+            page = await lease.context.new_page()
+            waits = WaitEngine(page)
+            ctx = StepContext(page=page, waits=waits, tracer=tracer, log=log, locate=locate, find=find,
+                              pause=pause, take_screenshot=take_screenshot)
+
+            for idx, step in enumerate(plan):
+                # Cancelled jobs stop here; returning releases (closes) the browser context
+                if cancel_event is not None and cancel_event.is_set():
+                    log(f"Run cancelled. Skipping remaining {len(plan) - idx} step(s).")
+                    break
+
+                action = step.type.upper()
+                emit("step_started", **step.describe())
+                step_span = tracer.start("step", step=idx + 1, action=action)
+                step_started = time.monotonic()
+                waits.begin_step()
+                # Retries depend on the action and on what went wrong (utils.retry_policy)
+                retry = StepRetry(step.type)
                 success = False
                 last_error = None
 
-                for attempt in range(retries):
+                while True:
+                    attempt = retry.begin_attempt()
+                    attempt_span = tracer.start("attempt", step=idx + 1, attempt=attempt)
                     try:
-                        # ---------------- OPEN ----------------
-                        if step["type"] == "goto":
-                            log(f"Executing GOTO: {step['value']}")
-                            page.goto(step["value"], timeout=30000)
-                            page.wait_for_load_state("domcontentloaded")
-                            log(f"Page loaded: {step['value']}")
-
-                            # Handle Google consent if present
-                            try:
-                                # Common consent button labels
-                                for btn_label in ["Accept all", "Accept", "Agree", "I agree", "Consent"]:
-                                    accept_btn = find_element(page, btn_label, timeout=1000)
-                                    if accept_btn and accept_btn.is_visible():
-                                        log(f"Dismissing cookie banner: {btn_label}")
-                                        accept_btn.click()
-                                        page.wait_for_load_state("networkidle", timeout=2000)
-                                        break
-                            except:
-                                pass
-
-                            results.append({
-                                "step_no": idx + 1,
-                                "action": "OPEN",
-                                "target": step["value"],
-                                "status": "PASS",
-                                "screenshot": take_screenshot(page, idx + 1, "PASS")
-                            })
-                            success = True
-                            break
-
-                        elif step["type"] == "click":
-                             log(f"Executing CLICK: {step['value']}")
-                             candidate = None
-                             try:
-                                candidate = find_element(page, step['value'])
-                             except:
-                                pass # Proceed to healing
-                                
-                             if not candidate:
-                                 # 🏥 SELF-HEALING 🏥
-                                 log(f"Element '{step['value']}' not found. Attempting Self-Healing...")
-                                 candidate = heal_element(page, step['value'])
-                                 if candidate:
-                                     log(f"Self-Healing SUCCESS: Found substitute element.")
-                             
-                             if candidate:
-                                 try:
-                                     # Force click to bypass overlay checks
-                                     candidate.click(force=True, timeout=5000)
-                                     log("Click successful.")
-                                 except Exception as e:
-                                     log(f"Click failed: {e}")
-                                     raise e
-                                 
-                                 page.wait_for_load_state("domcontentloaded")
-                                 results.append({
-                                    "step_no": idx + 1,
-                                    "action": "CLICK",
-                                    "target": step["value"],
-                                    "status": "PASS",
-                                    "screenshot": take_screenshot(page, idx + 1, "PASS")
-                                })
-                                 success = True
-                                 break
-                             else:
-                                 raise Exception(f"Could not find element to click: {step['value']}")
-
-                        # ---------------- TYPE ----------------
-                        elif step["type"] == "type":
-                             target_name = step['target']
-                             text_val = step['value']
-                             log(f"Executing TYPE: '{text_val}' into '{target_name}'")
-                             
-                             candidate = find_element(page, target_name)
-                             if not candidate:
-                                 # 🏥 SELF-HEALING 🏥
-                                 log(f"Element '{target_name}' not found. Attempting Self-Healing...")
-                                 candidate = heal_element(page, target_name)
-                             
-                             if candidate:
-                                 try:
-                                     candidate.click(force=True) # Focus
-                                     candidate.fill(text_val)
-                                     log("Type successful.")
-                                 except Exception as e:
-                                     log(f"Type failed: {e}")
-                                     raise e
-
-                                 results.append({
-                                    "step_no": idx + 1,
-                                    "action": "TYPE",
-                                    "target": target_name,
-                                    "status": "PASS",
-                                    "screenshot": take_screenshot(page, idx + 1, "PASS")
-                                })
-                                 success = True
-                                 break
-                             else:
-                                 raise Exception(f"Could not find element to type into: {target_name}")
-
-                        # ---------------- HOVER ----------------
-                        elif step["type"] == "hover":
-                            log(f"Executing HOVER: {step['value']}")
-                            candidate = find_element(page, step['value'])
-                            if not candidate:
-                                log(f"Element '{step['value']}' not found for hover.")
-                                candidate = heal_element(page, step['value'])
-                            
-                            if candidate:
-                                # Start hovering
-                                candidate.hover(force=True)
-                                
-                                # CRITICAL: Wait and Keep Hovering
-                                # Many menus disappear if the mouse leaves instantly or if JS is slow.
-                                # We deliberately sleep while the mouse is "technically" over the element 
-                                # because Playwright hover is instantaneous.
-                                time.sleep(2) 
-                                
-                                results.append({
-                                    "step_no": idx + 1, "action": "HOVER", "target": step["value"], "status": "PASS",
-                                    "screenshot": take_screenshot(page, idx + 1, "PASS")
-                                })
-                                success = True
-                                break
-                            else:
-                                raise Exception(f"Could not find element to hover: {step['value']}")
-
-                        # ---------------- SELECT (Dropdown) ----------------
-                        elif step["type"] == "select":
-                            target_name = step['target']
-                            option_val = step['value']
-                            log(f"Executing SELECT: '{option_val}' from '{target_name}'")
-                            
-                            # Find the <select> element (or a wrapper)
-                            candidate = find_element(page, target_name)
-                            if not candidate:
-                                candidate = heal_element(page, target_name)
-
-                            if candidate:
-                                # Check if it's a standard <select>
-                                tag = candidate.evaluate("el => el.tagName")
-                                if tag == "SELECT":
-                                    candidate.select_option(label=option_val)
-                                else:
-                                    # Try to find a select inside
-                                    sel = candidate.locator("select").first
-                                    if sel.count() > 0:
-                                        sel.select_option(label=option_val)
-                                    else:
-                                        # Fallback for custom dropdowns (Click dropdown, then click option)
-                                        log("Not a standard <select>, trying click-to-select...")
-                                        candidate.click()
-                                        time.sleep(1)
-                                        opt = find_element(page, option_val)
-                                        if opt: 
-                                            opt.click()
-                                        else:
-                                            raise Exception("Could not find dropdown option")
-
-                                results.append({
-                                    "step_no": idx + 1, "action": "SELECT", "target": f"{option_val} in {target_name}", "status": "PASS",
-                                    "screenshot": take_screenshot(page, idx + 1, "PASS")
-                                })
-                                success = True
-                                break
-                            else:
-                                raise Exception(f"Could not find dropdown: {target_name}")
-
-                        # ---------------- WAIT ----------------
-                        elif step["type"] == "wait":
-                            sec = int(step["value"])
-                            log(f"Executing WAIT: {sec} seconds...")
-                            time.sleep(sec)
-                            results.append({
-                                "step_no": idx + 1, "action": "WAIT", "target": f"{sec}s", "status": "PASS",
-                                "screenshot": None
-                            })
-                            success = True
-                            break
-
-                        # ---------------- SCROLL ----------------
-                        elif step["type"] == "scroll":
-                            direction = step["value"]
-                            log(f"Executing SCROLL: {direction}")
-                            delta = 700 if direction == "down" else -700
-                            page.mouse.wheel(0, delta)
-                            time.sleep(1)
-                            results.append({
-                                "step_no": idx + 1, "action": "SCROLL", "target": direction, "status": "PASS",
-                                "screenshot": take_screenshot(page, idx + 1, "PASS")
-                            })
-                            success = True
-                            break
-
-                        # ---------------- SEARCH ----------------
-                        elif step["type"] == "search":
-                            # Strategy 1: Look for an already visible input field first
-                            log(f"Executing SEARCH: {step['value']}")
-                            search_box = page.locator("input[type='text'], input[type='search'], input:not([type='hidden'])").filter(has=page.locator("visible=true")).first
-                            
-                            if search_box.count() > 0 and search_box.is_visible():
-                                log("Found visible search input directly.")
-                            else:
-                                # Strategy 2: If no visible input, find a "Search" button/icon and click it
-                                log("No visible input. Looking for search triggers...")
-                                trigger = find_element(page, "Search", timeout=3000)
-                                
-                                if trigger:
-                                    log("Found search trigger. Clicking...")
-                                    trigger.click(force=True)
-                                    # Wait for an input to appear
-                                    try:
-                                        search_box = page.locator("input[type='text'], input[type='search'], input:not([type='hidden'])").wait_for(state="visible", timeout=3000)
-                                        # Re-select to get the locator handle
-                                        search_box = page.locator("input[type='text'], input[type='search'], input:not([type='hidden'])").filter(has=page.locator("visible=true")).first
-                                    except:
-                                        log("No input appeared after clicking trigger.")
-                                        search_box = None
-                                else:
-                                    log("No search trigger found.")
-                                    search_box = None
+                        # Each attempt is bounded by what is left of the step's deadline
+                        try:
+                            result = await asyncio.wait_for(step.handler(ctx, step), timeout=retry.remaining())
+                        except asyncio.TimeoutError:
+                            raise TimeoutError(f"Step {idx + 1} exceeded its {retry.deadline_s:g}s deadline")
+                        results.append(result)
+                        success = True
+                        break
 
-                            # Fallback: Just grab the first input we can find, even if we aren't sure
-                            if not search_box or search_box.count() == 0:
-                                log("Fallback: searching for any input.")
-                                search_box = page.locator("input").first
-
-                            if not search_box or search_box.count() == 0:
-                                raise Exception("Could not find any search input field.")
-
-                            # Ensure we are interacting with an input-like element
-                            tag_name = search_box.evaluate("el => el.tagName").upper()
-                            is_editable = search_box.evaluate("el => el.isContentEditable")
-                            
-                            if tag_name not in ["INPUT", "TEXTAREA"] and not is_editable:
-                                # Sometimes the locator captures a wrapper div. Try to find an input inside.
-                                log(f"Target is {tag_name}, looking for internal input...")
-                                internal_input = search_box.locator("input, textarea").first
-                                if internal_input.count() > 0:
-                                    search_box = internal_input
-
-                            log("Filling search box...")
-                            search_box.click(force=True)
-                            search_box.fill(step["value"]) 
-                            page.keyboard.press("Enter")
-                            try:
-                                page.wait_for_load_state("domcontentloaded", timeout=10000)
-                            except:
-                                pass # Continue even if timeout (e.g. YouTube keeps loading)
-                            
-                            # WAIT FOR RESULTS TO APPEAR
-                            # After searching, we should wait briefly for new content to render
-                            time.sleep(2)
-
-                            results.append({
-                                "step_no": idx + 1,
-                                "action": "SEARCH",
-                                "target": step["value"],
-                                "status": "PASS",
-                                "screenshot": take_screenshot(page, idx + 1, "PASS")
-                            })
-                            success = True
+                    except Exception as e:
+                        log(f"Step {idx + 1} attempt {attempt} failed: {str(e)}")
+                        last_error = e
+                        tracer.end(attempt_span, error=str(e))
+                        if cancel_event is not None and cancel_event.is_set():
+                            e = Exception("Run cancelled")
+                        decision = retry.next_retry(e)
+                        STEP_RETRIES.inc(action=action, error_class=retry.last_class)
+                        emit("attempt_failed", step_no=idx + 1, attempt=attempt, error=str(e),
+                             error_class=retry.last_class, retry_in_ms=round(decision[0] * 1000) if decision else None)
+                        if decision is None:
+                            log(f"Not retrying step {idx + 1}: {retry.gave_up} ({retry.last_class} error)")
                             break
-
-                        # ---------------- PLAY (YouTube/Video) ----------------
-                        elif step["type"] == "play" or (step["type"] == "click" and "play" in step["value"].lower()):
-                            target_video = step["value"]
-                            log(f"Executing PLAY: {target_video}")
-                            
-                            video_element = None
-
-                            # 1. YouTube Specific: Target the main video title Link
-                            if "youtube.com" in page.url:
-                                log("YouTube Context: scanning for video titles...")
-                                # Get all video titles
-                                titles = page.locator("a#video-title")
-                                count = titles.count()
-                                if count > 0:
-                                    # Pick the first visible one that isn't empty
-                                    for i in range(min(5, count)):
-                                        t = titles.nth(i)
-                                        if t.is_visible():
-                                            video_element = t
-                                            log("Found visible YouTube video title.")
-                                            break
-                            
-                            # 2. Spotify Context: Target the specific song/artist play button
-                            if not video_element and "spotify.com" in page.url:
-                                log("Spotify Context: looking for play buttons...")
-                                # Spotify often has green play buttons or list items
-                                # Try finding the specific text first
-                                song_name = target_video.replace("first video", "").replace("play", "").strip()
-                                if song_name:
-                                    video_element = find_element(page, song_name)
-                                
-                                if not video_element:
-                                    # Fallback: Click the big green play button if visible
-                                    video_element = page.locator("[data-testid='play-button']").first
-                            
-                            # 3. Generic Fallback (Text Match)
-                            if not video_element:
-                                if "first" in target_video.lower():
-                                    # Generic strategy for "click the first thing that looks like a video"
-                                    # This is risky but better than failing
-                                    video_element = page.locator("a").first
-                                else:
-                                    video_element = find_element(page, target_video)
-
-                            if video_element:
-                                try:
-                                    video_element.scroll_into_view_if_needed()
-                                    video_element.hover() # Helping UI wake up
-                                    time.sleep(0.5)
-                                    video_element.click(force=True)
-                                    log("Clicked video/song successfully.")
-                                    
-                                    # Wait for player/page load
-                                    time.sleep(3)
-                                    
-                                    results.append({
-                                        "step_no": idx + 1, "action": "PLAY", "target": target_video, "status": "PASS",
-                                        "screenshot": take_screenshot(page, idx + 1, "PASS")
-                                    })
-                                    success = True
-                                    break
-                                except Exception as e:
-                                    log(f"Failed to click video element: {e}")
-                                    raise e
+                        delay, wait_kind = decision
+                        log(f"Retrying step {idx + 1} in up to {delay:.2f}s ({retry.last_class} error)")
+                        try:
+                            if wait_kind == "sleep":
+                                await pause(delay)
                             else:
-                                raise Exception(f"Could not find video/song to play: {target_video}")
-
-                        # ---------------- VERIFY ----------------
-                        elif step["type"] == "verify":
-                            log(f"Executing VERIFY: {step['value']}")
-                            current_url = page.url
-                            log(f"Checking content in URL: {current_url} and Page Title/Content")
-                            
-                            if "google" in current_url or "search" in current_url or step["value"].lower() in page.title().lower() or step["value"].lower() in page.content().lower():
-                                log("Verification SUCCESS found content match.")
-                                results.append({
-                                    "step_no": idx + 1,
-                                    "action": "VERIFY",
-                                    "target": current_url,
-                                    "status": "PASS",
-                                    "screenshot": take_screenshot(page, idx + 1, "PASS")
-                                })
-                            else:
-                                log(f"Verification FAILED. Content '{step['value']}' not found.")
-                                results.append({
-                                    "step_no": idx + 1,
-                                    "action": "VERIFY",
-                                    "target": current_url,
-                                    "status": "FAIL",
-                                    "error": f"Content '{step['value']}' not found in URL or Page Title",
-                                    "screenshot": take_screenshot(page, idx + 1, "FAIL")
-                                })
-                            success = True
+                                # Retry as soon as the page has settled, at most after the backoff
+                                await waits.settle("retry", timeout_ms=int(delay * 1000))
+                        except Exception as wait_error:
+                            last_error = wait_error
                             break
 
-                    except Exception as e:
-                        log(f"Step {idx + 1} attempt {attempt + 1} failed: {str(e)}")
-                        last_error = e
-                        time.sleep(2) # Wait before retry
+                # Successful attempts leave the loop with their span still open
+                tracer.end(attempt_span)
 
                 if not success:
                      log(f"Step {idx + 1} FAILED after all attempts.")
                      results.append({
                         "step_no": idx + 1,
-                        "action": step["type"].upper(),
-                        "target": step.get("value", ""),
+                        "action": action,
+                        "target": step.describe()["target"],
                         "status": "FAIL",
-                        "error": str(last_error),
-                        "screenshot": take_screenshot(page, idx + 1, "FAIL")
+                        "error": "Run cancelled" if cancel_event is not None and cancel_event.is_set() else str(last_error),
+                        "screenshot": await take_screenshot(page, idx + 1, "FAIL")
                     })
 
-            browser.close()
+                # Time spent in condition-based waits for this step
+                if results and results[-1]["step_no"] == idx + 1:
+                    results[-1]["wait"] = waits.end_step()
+                    results[-1]["retry"] = retry.stats()
+                    emit("step_finished", step=results[-1])
+                    tracer.end(step_span, status=results[-1]["status"])
+                    STEPS.inc(action=action, status=results[-1]["status"])
+                    STEP_LATENCY.observe(time.monotonic() - step_started, action=action)
+                tracer.end(step_span)
+
+        async with get_browser_pool().lease() as lease:
+            watcher = asyncio.create_task(close_on_cancel(lease.context)) if cancel_event is not None else None
+            try:
+                await execute(lease)
+            finally:
+                if watcher is not None:
+                    watcher.cancel()
+                if cache.enabled:
+                    await cache.finish()
+        # Screenshot files must exist before the report references them
+        run_info["retries"] = summarize_retries([r["retry"] for r in results if "retry" in r])
+        run_info["screenshots"] = await shots.flush()
+        for outcome in ("captured", "deduplicated", "skipped"):
+            SCREENSHOTS.inc(run_info["screenshots"][outcome], outcome=outcome)
+        SCREENSHOT_BYTES.inc(run_info["screenshots"]["bytes_written"])
 
     except Exception as fatal_error:
+        tracer.end(run_span, error=str(fatal_error))
+        run_info["trace"] = tracer.export()
         # 🔥 Backend NEVER crashes now
         return [{
             "step_no": 1,
@@ -440,6 +288,12 @@ def run_test(steps):
             "target": "Playwright",
             "status": "FAIL",
             "error": f"Fatal error handled: {fatal_error}"
-        }], logs
+        }], logs, run_info
+
+    tracer.end(run_span)
+    run_info["trace"] = tracer.export()
+    return results, logs, run_info
 
-    return results, logs
+def run_test(steps, cancel_event=None, options=None, run_id=None):
+    """Synchronous entry point: runs the async core on the shared browser event loop."""
+    return run_sync(run_test_async(steps, cancel_event=cancel_event, options=options, run_id=run_id))
@@ -37,6 +37,11 @@ def generate_playwright_steps(parsed_steps):
             code_steps.append({"type": "scroll", "value": step["value"]})
 
         elif step["action"] == "verify":
-            code_steps.append({"type": "verify", "value": step["value"]})
+            verify = {"type": "verify", "value": step["value"]}
+            # Optional match settings (see utils/verify.py): mode, visible_only, container
+            for key in ("mode", "visible_only", "container"):
+                if step.get(key):
+                    verify[key] = step[key]
+            code_steps.append(verify)
 
     return code_steps
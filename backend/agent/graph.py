@@ -1,63 +1,95 @@
 from agent.parser import parse_instruction
 from agent.generator import generate_playwright_steps
 from agent.executor import run_test
-from agent.reporter import generate_pdf_report, generate_report
+from agent.reporter import generate_report
+from utils import retention
+from utils import metrics
+from utils.tracing import Tracer
 
+import uuid
+import time
 import os
 
 # Updated to use environment variable for security
 DEFAULT_API_KEY = os.environ.get("GROQ_API_KEY")
 
-def run_agent(user_input, api_key=None):
+RUNS = metrics.counter("runs_total", "Finished runs by outcome (passed, failed, llm_error)", ("outcome",))
+RUN_LATENCY = metrics.histogram("run_duration_seconds", "Parse, execute and report time of a run", buckets=metrics.RUN_BUCKETS)
+PARSES = metrics.counter("parses_total", "Instructions parsed, by the parser whose steps were used", ("parser",))
+LLM_PARSE_LATENCY = metrics.histogram("llm_parse_duration_seconds", "LLM parse time (cache hits included)", ("outcome",))
+LLM_FALLBACKS = metrics.counter("llm_fallbacks_total", "LLM parses that fell back to the Regex parser", ("reason",))
+
+def run_agent(user_input, api_key=None, cancel_event=None, options=None, run_id=None):
     parsed = []
+    started = time.monotonic()
+    # Keys the run's artifact directory (screenshots, reports)
+    run_id = run_id or uuid.uuid4().hex
     
     # Use hardcoded key if user didn't provide one
     if not api_key:
         api_key = DEFAULT_API_KEY
     
     llm_error = None
+    # Traces the parse; only reported when the run stops before execution (the executor traces the rest)
+    parse_tracer = Tracer()
     # 1. Try LLM Parsing if Key is provided
     # Updated: Allow both 'sk-' (OpenAI) and 'gsk_' (Groq) or just check if key exists
     if api_key and len(api_key) > 10:
+        parse_started = time.monotonic()
         try:
             from agent.llm_agent import parse_with_llm
             print("🧠 using LLM Parser (Groq/OpenAI)...")
-            parsed = parse_with_llm(user_input, api_key)
+            # "bypass_llm_cache" forces a fresh LLM parse instead of a cached one
+            with parse_tracer.span("llm_parse"):
+                parsed = parse_with_llm(user_input, api_key, use_cache=not (options or {}).get("bypass_llm_cache"))
+            LLM_PARSE_LATENCY.observe(time.monotonic() - parse_started, outcome="ok")
             if not parsed:
                 print("⚠️ LLM returned empty steps. Parsing manually.")
+                LLM_FALLBACKS.inc(reason="empty")
         except Exception as e:
             llm_error = str(e)
             print(f"⚠️ LLM Crashed: {e}")
             parsed = [] # Reset to trigger fallback
+            LLM_PARSE_LATENCY.observe(time.monotonic() - parse_started, outcome="error")
     else:
         print("ℹ️ No API Key provided. Using Regex Parser.")
 
     # 2. Handle Critical LLM Errors (Quota/Auth) - Do NOT fallback to Regex
-    # Updated to include Groq specific error messages if possible, though '429' is standard
-    if llm_error and ("insufficient_quota" in llm_error or "invalid_api_key" in llm_error or "429" in llm_error or "401" in llm_error):
+    # Rate limits (429) are retried by utils.llm_clients; one that persists falls back to Regex below
+    if llm_error and ("insufficient_quota" in llm_error or "invalid_api_key" in llm_error or "401" in llm_error):
          print("❌ Aborting due to Critical LLM Error")
-         return {
-             "summary": {"total_steps": 0, "passed": 0, "failed": 1, "pass_percentage": 0},
-             "steps": [{
-                 "step_no": 1, 
-                 "action": "LLM_ERROR", 
-                 "target": "LLM Provider API",
-                 "status": "FAIL", 
-                 "error": f"LLM Account Error (Quota/Auth): {llm_error}. Please check your API key and billing.",
-                 "screenshot": None
-             }],
-             "logs": [f"Critical LLM Failure: {llm_error}"]
-         }
+         RUNS.inc(outcome="llm_error")
+         # Written to the run's directory like any report, so /runs/<run_id>/report.* and trace.json resolve
+         return generate_report([{
+             "step_no": 1,
+             "action": "LLM_ERROR",
+             "target": "LLM Provider API",
+             "status": "FAIL",
+             "error": f"LLM Account Error (Quota/Auth): {llm_error}. Please check your API key and billing.",
+             "screenshot": None
+         }], [f"Critical LLM Failure: {llm_error}"], {"run_id": run_id, "trace": parse_tracer.export()})
 
     # 3. Fallback to Regex if LLM failed (non-critical) or yielded no steps
     if not parsed:
         print("⚠️ Falling back to Rule-Based (Regex) logic...")
+        if llm_error:
+            LLM_FALLBACKS.inc(reason="rate_limited" if "429" in llm_error else "error")
         parsed = parse_instruction(user_input)
         print(f"📋 Regex Parsed Steps: {len(parsed)}")
+        PARSES.inc(parser="regex")
+    else:
+        PARSES.inc(parser="llm")
         
     steps = generate_playwright_steps(parsed)
-    results, logs = run_test(steps)
-    report = generate_report(results, logs)
-    generate_pdf_report(report)
+    retention.mark_active(run_id)
+    try:
+        results, logs, run_info = run_test(steps, cancel_event=cancel_event, options=options, run_id=run_id)
+        run_info["run_id"] = run_id
+        # The PDF is rendered on demand (utils.pdf_cache), not for every run
+        report = generate_report(results, logs, run_info)
+    finally:
+        retention.mark_finished(run_id)
 
+    RUNS.inc(outcome="passed" if report["summary"]["failed"] == 0 else "failed")
+    RUN_LATENCY.observe(time.monotonic() - started)
     return report
@@ -1,26 +1,19 @@
 import json
 import os
-from langchain_groq import ChatGroq
+import sys
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 
-def parse_with_llm(instruction, api_key):
-    """
-    Uses Groq (free + fast) to convert natural language instructions into
-    structured JSON steps for the automation agent.
-    """
-    if not api_key:
-        raise ValueError("API Key is required for LLM features.")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import parse_cache
+from utils.llm_clients import get_client
 
-    # Initialize LLM with Groq
-    llm = ChatGroq(
-        model="llama3-70b-8192",
-        temperature=0,
-        api_key=api_key
-    )
+LLM_MODEL = os.environ.get("GROQ_MODEL", "llama3-70b-8192")
+# Bump whenever the prompt below changes: cached parses of older prompts are then ignored
+PROMPT_VERSION = "2"
 
-    # Define the schema we want
-    format_instructions = """
+# Define the schema we want
+FORMAT_INSTRUCTIONS = """
     You are an automation parsing engine. Convert the user's natural language text into a JSON array of execution steps.
     
     Valid Actions:
@@ -28,7 +21,7 @@ def parse_with_llm(instruction, api_key):
     2. "click"  -> {"action": "click", "value": "Button/Link Text"}
     3. "type"   -> {"action": "type", "value": "Text to type", "target": "Input Field Name/Label"}
     4. "search" -> {"action": "search", "value": "Query"} (Use this if user just says 'Search for X' without specifying a field)
-    5. "verify" -> {"action": "verify", "value": "Text to expect"}
+    5. "verify" -> {"action": "verify", "value": "Text to expect"} (Only if the user asks for it, add "mode": "exact" (case-sensitive) or "regex", "visible_only": true, or "container": "CSS selector of the area to check")
     6. "wait"   -> {"action": "wait", "value": int_seconds}
     7. "scroll" -> {"action": "scroll", "value": "up/down"}
     8. "hover"  -> {"action": "hover", "value": "Element Text"}
@@ -51,18 +44,78 @@ def parse_with_llm(instruction, api_key):
     ]
     """
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an expert QA Automation Engineer. Your goal is to convert user intent into specific execution steps for a Playwright-based agent. \n\n{format_instructions}"),
-        ("user", "{instruction}")
-    ])
+PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert QA Automation Engineer. Your goal is to convert user intent into specific execution steps for a Playwright-based agent. \n\n{format_instructions}"),
+    ("user", "{instruction}")
+])
 
-    chain = prompt | llm | JsonOutputParser()
+# Several scenarios in one request (micro-batching); each answer is checked like a single parse
+BATCH_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert QA Automation Engineer. Your goal is to convert user intent into specific execution steps for a Playwright-based agent. \n\n{format_instructions}\n\n"
+               "You will receive several numbered scenarios. Return ONLY a JSON object that maps each scenario number (as a string) to its JSON list of steps."),
+    ("user", "{scenarios}")
+])
 
-    # Let exceptions propagate to graph.py so triggers fallback
-    result = chain.invoke({
+def _parse_one(client, instruction):
+    chain = PROMPT | client.llm | JsonOutputParser()
+    return client.call(lambda llm: chain.invoke({
         "instruction": instruction,
-        "format_instructions": format_instructions
-    })
+        "format_instructions": FORMAT_INSTRUCTIONS
+    }))
+
+def _parse_batch(client, instructions):
+    """Parses instructions that arrived together with one request. Returns one result (or Exception) per instruction."""
+    if len(instructions) == 1:
+        return [_parse_one(client, instructions[0])]
+
+    scenarios = "\n\n".join(f"Scenario {i}:\n{text}" for i, text in enumerate(instructions, start=1))
+    chain = BATCH_PROMPT | client.llm | JsonOutputParser()
+    try:
+        answer = client.call(lambda llm: chain.invoke({"scenarios": scenarios, "format_instructions": FORMAT_INSTRUCTIONS}))
+    except Exception as e:
+        if getattr(e, "status_code", None) is not None:
+            raise # API errors (auth, quota) apply to every instruction
+        answer = {} # Unparseable batch answer: fall back to one request per instruction
+
+    results = []
+    for i, instruction in enumerate(instructions, start=1):
+        steps = answer.get(str(i)) if isinstance(answer, dict) else None
+        try:
+            parse_cache.validate_steps(steps)
+        except ValueError:
+            try:
+                steps = _parse_one(client, instruction)
+            except Exception as e:
+                steps = e
+        results.append(steps)
+    return results
+
+def parse_with_llm(instruction, api_key, use_cache=True):
+    """
+    Uses Groq (free + fast) to convert natural language instructions into
+    structured JSON steps for the automation agent.
+
+    Results are cached per (instruction, model, prompt version); a cache hit
+    skips the API call. use_cache=False forces a fresh parse (and refreshes the entry).
+    """
+    if not api_key:
+        raise ValueError("API Key is required for LLM features.")
+
+    if use_cache:
+        cached = parse_cache.lookup(instruction, LLM_MODEL, PROMPT_VERSION)
+        if cached:
+            print("⚡ LLM parse cache hit: skipping the API call")
+            return cached
+    else:
+        parse_cache.record_bypass()
+
+    # Shared Groq client (kept-alive connections, rate limited, 429s retried);
+    # instructions arriving together go out as one request
+    client = get_client(api_key, LLM_MODEL)
+
+    # Let exceptions propagate to graph.py so triggers fallback
+    result = client.submit(instruction, _parse_batch)
+    parse_cache.store(instruction, LLM_MODEL, PROMPT_VERSION, result)
     return result
 
 if __name__ == "__main__":
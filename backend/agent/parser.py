@@ -2,48 +2,119 @@ import re
 
 COMMANDS = ["open", "go", "goto", "navigate", "search", "click", "type", "hover", "select", "wait", "scroll", "verify", "check", "analyze", "validate", "play"]
 
+# Patterns are compiled once; bulk parsing (history analytics, replays) runs them thousands of times.
+# Separators are replaced in two passes on purpose: " ,and" only splits because the comma became a newline first.
+_SEPARATORS = re.compile(r'[,|&]')
+_AND_SEPARATOR = re.compile(r'\s+and\s+', re.IGNORECASE)
+_LEADING_NUMBER = re.compile(r'^\d+\.?\s*')
+# Matched against lowercased text, like the startswith() checks it replaces
+_COMMAND_START = re.compile(r'(?:\d+\.?\s*)?(?:' + "|".join(map(re.escape, COMMANDS)) + ')')
+
 def preprocess_text(text):
     """
     intelligent splitter handling newlines, periods, commas, and 'and'.
     Attempts to break text into distinct command steps.
     """
-    # 1. Normalize separators: Replace commas and 'and' with newlines 
+    # 1. Normalize separators: Replace commas and 'and' with newlines
     # (unless inside quotes - simplistic approach)
-    text = re.sub(r'[,|&]', '\n', text)
-    text = re.sub(r'\s+and\s+', '\n', text, flags=re.IGNORECASE)
-    
+    text = _SEPARATORS.sub('\n', text)
+    text = _AND_SEPARATOR.sub('\n', text)
+
     raw_lines = text.split("\n")
     final_lines = []
-    
+
     for rline in raw_lines:
         rline = rline.strip()
         if not rline: continue
-        
+
         # Split by period-space to separate sentences
         parts = rline.split(". ")
         buffer = ""
-        
+
         for part in parts:
             part = part.strip()
             if not part: continue
-            
-            # Simple check: If part matches a command start, it's a new line
-            # Clean leading numbers if any (e.g. "2. Click") for the check
-            clean_part = re.sub(r'^\d+\.?\s*', '', part).lower()
-            is_command = any(clean_part.startswith(cmd) for cmd in COMMANDS)
-            
+
+            # Simple check: If part matches a command start (after any leading number
+            # e.g. "2. Click"), it's a new line
+            is_command = _COMMAND_START.match(part.lower()) is not None
+
             if is_command or not buffer:
                 if buffer: final_lines.append(buffer)
                 buffer = part
             else:
                  # Likely a continuation
                  buffer += ". " + part
-        
+
         if buffer:
             final_lines.append(buffer)
-            
+
     return final_lines
 
+def _unquote(value):
+    # Remove quotes if user added them
+    return value.strip('"').strip("'")
+
+def _prefixed(action, prefix):
+    """Step whose value is the rest of the line after the command word(s)."""
+    pattern = re.compile(prefix, re.IGNORECASE)
+    def parse(line, lower_line):
+        return {"action": action, "value": _unquote(pattern.sub('', line).strip())}
+    return parse
+
+def _quoted_pair(action, pattern):
+    """Step with a quoted value and a quoted target (Type "x" into "y", Select "x" from "y")."""
+    pattern = re.compile(pattern, re.IGNORECASE)
+    def parse(line, lower_line):
+        match = pattern.search(line)
+        if match:
+            value, target = match.groups()
+            return {"action": action, "value": value, "target": target}
+        return None
+    return parse
+
+_PLAY_PREFIX = re.compile(r'^play\s+', re.IGNORECASE)
+_WAIT_SECONDS = re.compile(r'wait\s+(\d+)', re.IGNORECASE)
+
+def _parse_play(line, lower_line):
+    # "Play it" or "Play video"
+    value = _PLAY_PREFIX.sub('', line).strip()
+    if value.lower() in ["it", "video", "first video"]:
+        value = "first video" # Generic marker
+    return {"action": "play", "value": value}
+
+def _parse_wait(line, lower_line):
+    # Extract seconds: Wait 5 seconds
+    match = _WAIT_SECONDS.search(line)
+    if match:
+        return {"action": "wait", "value": int(match.group(1))}
+    return None
+
+def _parse_scroll(line, lower_line):
+    # Scroll Down / Up
+    return {"action": "scroll", "value": "up" if "up" in lower_line else "down"}
+
+# Command verbs in priority order: the first prefix that matches the line wins.
+# "open"/"goto"/"navigate to"/"go to"/"go" share one handler ("go to" vs "go" is settled by its pattern).
+_HANDLERS = [
+    (("open", "goto", "navigate to", "go to", "go"), _prefixed("open", r'^(open|goto|navigate to|go to|go)\s+')),
+    (("search",), _prefixed("search", r'^search\s+(for\s+)?')),
+    (("click",), _prefixed("click", r'^click\s+(on\s+)?')),
+    (("type",), _quoted_pair("type", r'type\s+["\'](.+?)["\']\s+into\s+["\'](.+?)["\']')),
+    (("hover",), _prefixed("hover", r'^hover\s+(over\s+)?')),
+    (("select",), _quoted_pair("select", r'select\s+["\'](.+?)["\']\s+from\s+["\'](.+?)["\']')),
+    (("play",), _parse_play),
+    (("wait",), _parse_wait),
+    (("scroll",), _parse_scroll),
+]
+# One alternation over every verb; group i+1 matching means _HANDLERS[i] applies
+_DISPATCH = re.compile("|".join(
+    "(" + "|".join(map(re.escape, verbs)) + ")" for verbs, _ in _HANDLERS
+))
+# Verification words may appear anywhere in the line, not just at the start
+_VERIFY_WORD = re.compile(r'verify|check|analyze|validate')
+_parse_verify = _prefixed("verify", r'^(verify|check|analyze|validate)\s+')
+
 def parse_instruction(text):
     steps = []
     lines = preprocess_text(text)
@@ -51,77 +122,25 @@ def parse_instruction(text):
     for line in lines:
         line_clean = line.strip()
         if not line_clean: continue
-        
+
         # Remove leading numbers (e.g. "1. Open..." -> "Open...")
-        line_clean = re.sub(r'^\d+\.?\s*', '', line_clean)
+        line_clean = _LEADING_NUMBER.sub('', line_clean)
         # Remove trailing period
         if line_clean.endswith("."):
             line_clean = line_clean[:-1]
-        
+
         lower_line = line_clean.lower()
-        
-        if lower_line.startswith(("open", "goto", "navigate to", "go to", "go")):
-            # Extract URL/Site. Handle "go to" vs "go"
-            value = re.sub(r'^(open|goto|navigate to|go to|go)\s+', '', line_clean, flags=re.IGNORECASE).strip()
-            # Remove quotes if user added them
-            value = value.strip('"').strip("'")
-            steps.append({"action": "open", "value": value})
-            
-        elif lower_line.startswith("search"):
-            # Extract search term
-            value = re.sub(r'^search\s+(for\s+)?', '', line_clean, flags=re.IGNORECASE).strip()
-            value = value.strip('"').strip("'")
-            steps.append({"action": "search", "value": value})
-
-        elif lower_line.startswith("click"):
-            # Extract target to click
-            value = re.sub(r'^click\s+(on\s+)?', '', line_clean, flags=re.IGNORECASE).strip()
-            value = value.strip('"').strip("'")
-            steps.append({"action": "click", "value": value})
-            
-        elif lower_line.startswith("type"):
-            # Extract value and target: Type "value" into "Target"
-            match = re.search(r'type\s+["\'](.+?)["\']\s+into\s+["\'](.+?)["\']', line_clean, re.IGNORECASE)
-            if match:
-                value, target = match.groups()
-                steps.append({"action": "type", "value": value, "target": target})
-
-        elif lower_line.startswith("hover"):
-            # Extract target to hover
-            value = re.sub(r'^hover\s+(over\s+)?', '', line_clean, flags=re.IGNORECASE).strip()
-            value = value.strip('"').strip("'")
-            steps.append({"action": "hover", "value": value})
-
-        elif lower_line.startswith("select"):
-            # Extract option and target: Select "Option" from "Dropdown"
-            match = re.search(r'select\s+["\'](.+?)["\']\s+from\s+["\'](.+?)["\']', line_clean, re.IGNORECASE)
-            if match:
-                value, target = match.groups()
-                steps.append({"action": "select", "value": value, "target": target})
-        
-        elif lower_line.startswith("play"):
-             # "Play it" or "Play video"
-             value = re.sub(r'^play\s+', '', line_clean, flags=re.IGNORECASE).strip()
-             if value.lower() in ["it", "video", "first video"]:
-                 value = "first video" # Generic marker
-             steps.append({"action": "play", "value": value})
-
-        elif lower_line.startswith("wait"):
-            # Extract seconds: Wait 5 seconds
-            match = re.search(r'wait\s+(\d+)', line_clean, re.IGNORECASE)
-            if match:
-                steps.append({"action": "wait", "value": int(match.group(1))})
-        
-        elif lower_line.startswith("scroll"):
-            # Scroll Down / Up
-            direction = "down"
-            if "up" in lower_line: direction = "up"
-            steps.append({"action": "scroll", "value": direction})
-            
-        elif any(x in lower_line for x in ["verify", "check", "analyze", "validate"]):
-             # Remove the command word
-             value = re.sub(r'^(verify|check|analyze|validate)\s+', '', line_clean, flags=re.IGNORECASE).strip()
-             value = value.strip('"').strip("'")
-             steps.append({"action": "verify", "value": value})
-            
+
+        match = _DISPATCH.match(lower_line)
+        if match:
+            handler = _HANDLERS[match.lastindex - 1][1]
+        elif _VERIFY_WORD.search(lower_line):
+            handler = _parse_verify
+        else:
+            continue
+
+        step = handler(line_clean, lower_line)
+        if step:
+            steps.append(step)
+
     return steps
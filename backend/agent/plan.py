@@ -0,0 +1,215 @@
+from urllib.parse import urlparse
+
+from utils.dom_mapper import build_strategies
+from utils.verify import MODES as VERIFY_MODES
+
+# Step plans: the executor's step dicts ({"type": "click", "value": ...}) compiled once,
+# before a browser is leased, into typed step objects. Everything that doesn't depend
+# on the page (URL parsing, locator strategy lists, argument checks) happens here, so
+# attempts only run the action. Actions are looked up in ACTIONS; plugins add their own
+# with @register_action.
+
+ACTIONS = {} # step type -> (step class, async handler(ctx, step) -> result dict)
+
+
+class PlanError(ValueError):
+    """A step that cannot run. Raised by compile_plan() before any browser is used."""
+    def __init__(self, step_no, step_type, message):
+        super().__init__(f"Step {step_no} ({step_type}): {message}")
+        self.step_no = step_no
+        self.step_type = step_type
+
+
+def register_action(step_type, step_class):
+    """
+    Decorator registering the handler for steps of 'step_type':
+
+        @register_action("double_click", TargetStep)
+        async def double_click(ctx, step): ... return await ctx.passed(step, step.target)
+
+    The handler gets the run's StepContext and the compiled step, and returns the
+    step's result dict. Raising an exception fails the attempt (see utils.retry_policy).
+    """
+    def decorator(handler):
+        ACTIONS[step_type] = (step_class, handler)
+        return handler
+    return decorator
+
+
+class StepContext:
+    """What the executor hands to action handlers for one run (one page)."""
+    __slots__ = ("page", "waits", "tracer", "log", "locate", "find", "pause", "take_screenshot")
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs[name])
+
+    async def passed(self, step, target, action=None, screenshot=True):
+        """A PASS result for 'step', with a screenshot unless screenshot=False."""
+        return {
+            "step_no": step.no,
+            "action": action or step.type.upper(),
+            "target": target,
+            "status": "PASS",
+            "screenshot": await self.take_screenshot(self.page, step.no, "PASS") if screenshot else None,
+        }
+
+
+# ---------------- STEP TYPES ----------------
+class Step:
+    """Base step: position, type and raw value. Subclasses parse their fields in compile()."""
+    __slots__ = ("no", "type", "value", "handler")
+
+    def __init__(self, no, step_type, value, handler):
+        self.no = no
+        self.type = step_type
+        self.value = value
+        self.handler = handler
+
+    def compile(self, raw):
+        pass
+
+    def fail(self, message):
+        raise PlanError(self.no, self.type, message)
+
+    def text(self, raw, key):
+        value = raw.get(key)
+        if value is None or not str(value).strip():
+            self.fail(f"'{key}' is required")
+        return str(value)
+
+    def flag(self, raw, key, default=False):
+        """A boolean option. LLM output often has "true"/"false" strings, so bool() won't do."""
+        value = raw.get(key, default)
+        if value is None:
+            return default
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (int, float)) and value in (0, 1):
+            return bool(value)
+        text = str(value).strip().lower()
+        if text in ("true", "yes", "1", "on"):
+            return True
+        if text in ("false", "no", "0", "off", ""):
+            return False
+        self.fail(f"'{key}' must be true or false, got '{value}'")
+
+    def describe(self):
+        """step_no/action/target as shown in events before the step runs."""
+        return {"step_no": self.no, "action": self.type.upper(), "target": self.value if self.value is not None else ""}
+
+
+class GotoStep(Step):
+    __slots__ = ("url",)
+
+    def compile(self, raw):
+        self.url = self.text(raw, "value").strip()
+        parsed = urlparse(self.url)
+        if parsed.scheme not in ("http", "https", "file", "about", "data"):
+            self.fail(f"Unsupported URL '{self.url}'")
+        if parsed.scheme in ("http", "https") and not parsed.netloc:
+            self.fail(f"URL '{self.url}' has no host")
+
+
+class TargetStep(Step):
+    """Steps acting on one element (click, hover). The strategy list is built once per step."""
+    __slots__ = ("target", "strategies")
+
+    def compile(self, raw):
+        self.target = self.text(raw, "value")
+        self.strategies = build_strategies(self.target)
+
+
+class TypeStep(Step):
+    __slots__ = ("input_text", "target", "strategies")
+
+    def compile(self, raw):
+        self.input_text = "" if raw.get("value") is None else str(raw["value"])
+        self.target = self.text(raw, "target")
+        self.strategies = build_strategies(self.target)
+
+
+class SelectStep(Step):
+    __slots__ = ("option", "target", "strategies", "option_strategies")
+
+    def compile(self, raw):
+        self.option = self.text(raw, "value")
+        self.target = self.text(raw, "target")
+        self.strategies = build_strategies(self.target)
+        self.option_strategies = build_strategies(self.option)
+
+
+class WaitStep(Step):
+    __slots__ = ("seconds",)
+
+    def compile(self, raw):
+        try:
+            self.seconds = int(raw.get("value"))
+        except (TypeError, ValueError):
+            self.fail(f"Wait needs a whole number of seconds, got '{raw.get('value')}'")
+        if self.seconds < 0:
+            self.fail("Wait seconds cannot be negative")
+
+
+class ScrollStep(Step):
+    __slots__ = ("direction", "delta")
+
+    def compile(self, raw):
+        self.direction = str(raw.get("value") or "down").lower()
+        if self.direction not in ("up", "down"):
+            self.fail(f"Scroll direction must be 'up' or 'down', got '{self.direction}'")
+        self.delta = 700 if self.direction == "down" else -700
+
+
+class SearchStep(Step):
+    __slots__ = ("query",)
+
+    def compile(self, raw):
+        self.query = self.text(raw, "value")
+
+
+class PlayStep(Step):
+    __slots__ = ("target", "song_name", "first", "strategies", "song_strategies")
+
+    def compile(self, raw):
+        self.target = self.text(raw, "value")
+        # Spotify: the song/artist to look for; "first" picks the first result anywhere
+        self.song_name = self.target.replace("first video", "").replace("play", "").strip()
+        self.first = "first" in self.target.lower()
+        self.strategies = build_strategies(self.target)
+        self.song_strategies = build_strategies(self.song_name) if self.song_name else None
+
+
+class VerifyStep(Step):
+    __slots__ = ("expected", "mode", "visible_only", "container")
+
+    def compile(self, raw):
+        self.expected = self.text(raw, "value")
+        self.mode = raw.get("mode") or "contains"
+        if self.mode not in VERIFY_MODES:
+            self.fail(f"Unknown verify mode '{self.mode}'. Expected one of {list(VERIFY_MODES)}")
+        self.visible_only = self.flag(raw, "visible_only")
+        self.container = raw.get("container") or None
+
+
+# ---------------- COMPILER ----------------
+def compile_step(no, raw):
+    if isinstance(raw, Step):
+        return raw
+    if not isinstance(raw, dict):
+        raise PlanError(no, "?", f"Expected a step object, got {type(raw).__name__}")
+    step_type = raw.get("type")
+    entry = ACTIONS.get(step_type)
+    if entry is None:
+        raise PlanError(no, step_type, f"Unknown step type '{step_type}'. Expected one of {sorted(ACTIONS)}")
+    step_class, handler = entry
+    step = step_class(no, step_type, raw.get("value"), handler)
+    step.compile(raw)
+    return step
+
+
+def compile_plan(steps):
+    """Compiles step dicts (already compiled steps pass through). Raises PlanError."""
+    # Built-in actions register themselves on import
+    import agent.actions
+    return [compile_step(i + 1, raw) for i, raw in enumerate(steps)]
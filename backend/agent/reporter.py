@@ -1,11 +1,53 @@
 import json
+import uuid
 import os
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
+from utils import retention
+from PIL import Image
+
+# Screenshots are embedded as JPEG thumbnails of this width (pixels), made once per screenshot
+PDF_THUMB_WIDTH = int(os.environ.get("PDF_THUMB_WIDTH", "800"))
+
+# ---------------- ARTIFACTS ----------------
+def report_path(report, filename):
+    """
+    Where a report artifact is written: the run's own directory, so concurrent
+    runs never overwrite each other (reports without a run id use reports/test_<filename>).
+    """
+    if report.get("run_id"):
+        return os.path.join(retention.run_dir(report["run_id"], create=True), filename)
+    os.makedirs(retention.REPORTS_DIR, exist_ok=True)
+    return os.path.join(retention.REPORTS_DIR, f"test_{filename}")
+
+def atomic_write(path, write):
+    """Calls write(tmp_path), then renames the temp file over path, so readers never see a partial file."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+# ---------------- WAIT STATS ----------------
+def summarize_waits(results):
+    """Time spent in condition-based waits per action, and time saved vs. the old fixed sleeps."""
+    waits = {}
+    for r in results:
+        if not r.get("wait"):
+            continue
+        entry = waits.setdefault(r["action"], {"steps": 0, "waited_ms": 0.0, "saved_ms": 0.0})
+        entry["steps"] += 1
+        entry["waited_ms"] = round(entry["waited_ms"] + r["wait"]["waited_ms"], 1)
+        entry["saved_ms"] = round(entry["saved_ms"] + r["wait"]["saved_ms"], 1)
+    return waits
 
 # ---------------- JSON REPORT ----------------
-def generate_report(results, logs=[]):
+def generate_report(results, logs=[], run_info=None):
     passed = sum(1 for r in results if r["status"] == "PASS")
     total = len(results)
 
@@ -17,29 +59,43 @@ def generate_report(results, logs=[]):
             "pass_percentage": round((passed / total) * 100, 2) if total else 0
         },
         "steps": results,
-        "logs": logs
+        "logs": logs,
+        "waits": summarize_waits(results)
     }
+    # Run-level stats from the executor (e.g. "network": blocked requests / bytes)
+    report.update(run_info or {})
 
+    def write_json(path):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
 
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    REPORT_DIR = os.path.join(BASE_DIR, "reports")
-    os.makedirs(REPORT_DIR, exist_ok=True)
-
-    json_path = os.path.join(REPORT_DIR, "test_report.json")
-    with open(json_path, "w") as f:
-        json.dump(report, f, indent=4)
-
+    atomic_write(report_path(report, "report.json"), write_json)
     return report
 
 
 # ---------------- PDF REPORT ----------------
-def generate_pdf_report(report):
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    REPORT_DIR = os.path.join(BASE_DIR, "reports")
-    os.makedirs(REPORT_DIR, exist_ok=True)
+def pdf_thumbnail(screenshot_path):
+    """
+    Downsampled JPEG copy of a screenshot, cached in a thumbs/ folder next to it.
+    JPEG data is embedded as-is by ReportLab, so re-rendering a PDF doesn't decode anything.
+    """
+    thumbs_dir = os.path.join(os.path.dirname(screenshot_path), "thumbs")
+    thumb_path = os.path.join(thumbs_dir, os.path.splitext(os.path.basename(screenshot_path))[0] + ".jpg")
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    os.makedirs(thumbs_dir, exist_ok=True)
+    def write_thumb(path):
+        with Image.open(screenshot_path) as img:
+            img = img.convert("RGB")
+            img.thumbnail((PDF_THUMB_WIDTH, PDF_THUMB_WIDTH * 4))
+            img.save(path, "JPEG", quality=70, optimize=True)
+    return atomic_write(thumb_path, write_thumb)
 
-    pdf_path = os.path.join(REPORT_DIR, "test_report.pdf")
+def generate_pdf_report(report):
+    return atomic_write(report_path(report, "report.pdf"), lambda path: _render_pdf(report, path))
 
+def _render_pdf(report, pdf_path):
     c = canvas.Canvas(pdf_path, pagesize=A4)
     width, height = A4
     y = height - 40
@@ -64,6 +120,9 @@ def generate_pdf_report(report):
     c.drawString(40, y, "Step Details")
     y -= 20
 
+    # Screenshots live in the run's artifact directory (older reports: the flat screenshots folder)
+    screenshots_dir = retention.run_dir(report["run_id"]) if report.get("run_id") else retention.LEGACY_SCREENSHOTS_DIR
+
     c.setFont("Helvetica", 11)
     for step in report["steps"]:
         # Check if we need a new page for text
@@ -78,10 +137,10 @@ def generate_pdf_report(report):
 
         # Embed Screenshot if available
         if "screenshot" in step and step["screenshot"]:
-            screenshot_path = os.path.join(REPORT_DIR, "screenshots", step["screenshot"])
+            screenshot_path = os.path.join(screenshots_dir, step["screenshot"])
             if os.path.exists(screenshot_path):
                 try:
-                    img = ImageReader(screenshot_path)
+                    img = ImageReader(pdf_thumbnail(screenshot_path))
                     img_width, img_height = img.getSize()
                     aspect = img_height / float(img_width)
                     
@@ -101,4 +160,3 @@ def generate_pdf_report(report):
                     print(f"Error adding image to PDF: {e}")
 
     c.save()
-    return pdf_path
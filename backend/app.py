@@ -1,32 +1,330 @@
 from flask import Flask, request, jsonify
-from agent.graph import run_agent
-from flask import send_file
+from agent.batch import submit_batch, get_batch, MODES as BATCH_MODES
+from job_queue import JobQueue, FINAL_STATES
+from flask import send_file, Response, g
+from utils.browser_pool import get_browser_pool
+from utils import selector_cache
+from utils.network_profiles import resolve_profile
+from utils import response_cache
+from utils import screenshots
+from utils import retention
+from utils import pdf_cache
+from utils import parse_cache
+from utils.events import get_event_bus
+from utils.tracing import chrome_trace
+from utils import metrics
+import datetime
+import json
+import time
 import os
 import database
 
 app = Flask(__name__)
 database.init_db()
 
+jobs = JobQueue()
+# Batch worker processes re-import this module as __mp_main__; only the server runs jobs
+if __name__ != "__mp_main__":
+    jobs.start()
+    retention.start_sweeper()
+
+# ---------------- METRICS ----------------
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests handled", ("method", "endpoint", "status"))
+HTTP_LATENCY = metrics.histogram("http_request_duration_seconds", "Time to produce the response (streams: until headers)", ("method", "endpoint"))
+
+@app.before_request
+def start_timer():
+    g.request_started = time.monotonic()
+
+@app.after_request
+def record_request(response):
+    # The route pattern, not the path, keeps the label set small
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUESTS.inc(method=request.method, endpoint=endpoint, status=response.status_code)
+    started = g.get("request_started")
+    if started is not None:
+        HTTP_LATENCY.observe(time.monotonic() - started, method=request.method, endpoint=endpoint)
+    return response
+
+# Read from the job queue, browser pool and event bus when /metrics is scraped
+def jobs_by_status():
+    counts = database.count_jobs_by_status()
+    return {(status,): counts.get(status, 0) for status in ("queued", "running") + FINAL_STATES}
+
+metrics.gauge("jobs", "Jobs in the queue table by status", ("status",)).set_function(jobs_by_status)
+metrics.gauge("job_concurrency_limit", "Jobs run at once").set_function(lambda: jobs.concurrency)
+metrics.gauge("browser_leases_active", "Browser contexts leased to runs").set_function(lambda: get_browser_pool().stats()["active"])
+metrics.gauge("browser_leases_waiting", "Runs waiting for a free browser").set_function(lambda: get_browser_pool().stats()["waiting"])
+metrics.gauge("browsers_running", "Launched browser processes").set_function(lambda: get_browser_pool().stats()["browsers_running"])
+metrics.gauge("event_channels_open", "Runs with a live event stream").set_function(lambda: get_event_bus().stats()["open_runs"])
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
 @app.route("/")
 def home():
     return {"status": "Backend running"}
 
+# Per-run settings accepted by /run and /batch and passed through to the executor
+RUN_OPTIONS = ("network_profile", "response_cache", "response_cache_miss", "screenshot_policy", "bypass_llm_cache")
+
+def run_options(body):
+    """Picks the run options out of a request body. Raises ValueError for invalid values."""
+    options = {name: body[name] for name in RUN_OPTIONS if body.get(name)}
+    resolve_profile(options.get("network_profile"))
+    response_cache.validate_options(options.get("response_cache", response_cache.CACHE_MODE),
+                                    options.get("response_cache_miss", response_cache.MISS_POLICY))
+    screenshots.validate_policy(options.get("screenshot_policy", screenshots.SCREENSHOT_POLICY))
+    return options
+
 @app.route("/run", methods=["POST"])
 def run_test():
     user_input = request.json.get("instruction")
     api_key = request.json.get("api_key") # Optional
-    
-    report = run_agent(user_input, api_key)
-    
-    database.add_test_run(user_input, report)
-    return jsonify(report)
+
+    if not user_input or not str(user_input).strip():
+        return {"error": "'instruction' is required"}, 400
+    try:
+        options = run_options(request.json)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    # Runs in the background; poll /jobs/<id> and fetch /jobs/<id>/result
+    job_id = jobs.submit(user_input, api_key, options)
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+        "result_url": f"/jobs/{job_id}/result",
+    }, 202
+
+@app.route("/jobs/metrics")
+def job_metrics():
+    return jsonify(jobs.metrics())
+
+@app.route("/jobs/<job_id>", methods=["GET", "DELETE"])
+def job_status(job_id):
+    job = jobs.cancel(job_id) if request.method == "DELETE" else database.get_job(job_id)
+    if not job:
+        return {"error": "Job not found"}, 404
+    job.pop("options_json", None)
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = jobs.cancel(job_id)
+    if not job:
+        return {"error": "Job not found"}, 404
+    return {"job_id": job_id, "status": job["status"]}
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = database.get_job(job_id)
+    if not job:
+        return {"error": "Job not found"}, 404
+    if job["status"] == "failed":
+        return {"job_id": job_id, "status": "failed", "error": job["error"]}, 500
+    if not job["test_run_id"]:
+        # Still queued/running, or cancelled before it started
+        code = 409 if job["status"] == "cancelled" else 202
+        return {"job_id": job_id, "status": job["status"]}, code
+    run = database.get_test_run(job["test_run_id"])
+    if not run:
+        # Removed through DELETE /history after the job finished
+        return {"job_id": job_id, "status": job["status"], "error": "Run deleted"}, 410
+    return jsonify(json.loads(run["report_json"]))
+
+EVENT_FORMATS = ("sse", "ndjson")
+EVENT_KEEPALIVE_SECONDS = 15
+
+def format_event(event, fmt):
+    if fmt == "ndjson":
+        return json.dumps(event) + "\n"
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """
+    Streams a job's progress (step started/finished, retries, healing, screenshots)
+    as Server-Sent Events, or as JSON lines with ?format=ndjson. The stream ends with
+    a "run_finished" event. Reconnects resume after Last-Event-ID (or ?after=<id>).
+    """
+    job = database.get_job(job_id)
+    if not job:
+        return {"error": "Job not found"}, 404
+    fmt = request.args.get("format", "sse")
+    if fmt not in EVENT_FORMATS:
+        return {"error": f"'format' must be one of {list(EVENT_FORMATS)}"}, 400
+    try:
+        after = int(request.headers.get("Last-Event-ID") or request.args.get("after", 0))
+    except ValueError:
+        return {"error": "'after' must be an event id"}, 400
+
+    bus = get_event_bus()
+    replayed = bus.known(job_id)
+    if not replayed and job["status"] not in FINAL_STATES:
+        bus.open(job_id) # Queued before a restart: its events start when a worker picks it up
+        replayed = True
+
+    def stream():
+        for event in bus.subscribe(job_id, after, timeout=EVENT_KEEPALIVE_SECONDS):
+            if event is None:
+                # Keeps proxies from closing an idle connection during long steps
+                yield ": keep-alive\n\n" if fmt == "sse" else "\n"
+            else:
+                yield format_event(event, fmt)
+        if not replayed:
+            # Finished long ago (events expired) or in a previous process: only the outcome is known
+            final = database.get_job(job_id)
+            yield format_event({"id": after + 1, "type": "run_finished", "status": final["status"],
+                                "test_run_id": final["test_run_id"], "error": final["error"]}, fmt)
+
+    mimetype = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return Response(stream(), mimetype=mimetype, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/batch", methods=["POST"])
+def run_batch_tests():
+    instructions = request.json.get("instructions")
+    api_key = request.json.get("api_key") # Optional
+    workers = request.json.get("workers") # Optional, defaults to BATCH_WORKERS
+    mode = request.json.get("mode", "run-all")
+
+    if not isinstance(instructions, list) or not instructions or not all(isinstance(i, str) and i.strip() for i in instructions):
+        return {"error": "'instructions' must be a non-empty list of strings"}, 400
+    if mode not in BATCH_MODES:
+        return {"error": f"'mode' must be one of {list(BATCH_MODES)}"}, 400
+    if workers is not None and (isinstance(workers, bool) or not isinstance(workers, int) or workers < 1):
+        return {"error": "'workers' must be a positive integer"}, 400
+    try:
+        options = run_options(request.json) # Applies to every scenario
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    def record(result):
+        if result["report"]:
+            database.add_test_run(result["instruction"], result["report"])
+
+    # Runs in the background; poll /batch/<id> for progress and the batch report
+    batch_id = submit_batch(instructions, api_key, workers=workers, mode=mode, on_result=record, options=options)
+    return {"batch_id": batch_id, "status": "queued", "status_url": f"/batch/{batch_id}"}, 202
+
+@app.route("/batch/<batch_id>")
+def batch_status(batch_id):
+    batch = get_batch(batch_id)
+    if not batch:
+        return {"error": "Batch not found"}, 404
+    report = batch.pop("report")
+    if batch["status"] == "failed":
+        return jsonify(batch), 500
+    if batch["status"] != "done":
+        return jsonify(batch), 202
+    return jsonify({"batch_id": batch_id, "status": "done", **report})
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+
+def history_date(value, end_of_day=False):
+    """Validates a YYYY-MM-DD or "YYYY-MM-DD HH:MM:SS" bound; a bare until-date includes the whole day."""
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            datetime.datetime.strptime(value, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Invalid date '{value}'. Expected YYYY-MM-DD or 'YYYY-MM-DD HH:MM:SS'")
+    if len(value) == 10 and end_of_day:
+        return value + " 23:59:59"
+    return value
 
 @app.route("/history", methods=["GET", "DELETE"])
 def handle_history():
     if request.method == "DELETE":
         database.clear_history()
+        retention.delete_all_artifacts()
         return {"status": "History cleared"}
-    return jsonify(database.get_all_test_runs())
+
+    # Keyset pagination: pass next_cursor back as ?cursor= for the next page
+    args = request.args
+    try:
+        limit = min(max(int(args.get("limit", HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        cursor = int(args["cursor"]) if args.get("cursor") else None
+        status = args.get("status", "").upper() or None
+        if status and status not in ("PASS", "FAIL"):
+            raise ValueError("'status' must be PASS or FAIL")
+        since = history_date(args.get("since"))
+        until = history_date(args.get("until"), end_of_day=True)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    runs, next_cursor = database.list_test_runs(limit, cursor, status, since, until, args.get("q", "").strip() or None)
+    return jsonify({"runs": runs, "next_cursor": next_cursor, "limit": limit})
+
+@app.route("/history/trends")
+def history_trends():
+    args = request.args
+    bucket = args.get("bucket", "day")
+    if bucket not in database.TREND_BUCKETS:
+        return {"error": f"'bucket' must be one of {list(database.TREND_BUCKETS)}"}, 400
+    try:
+        since = history_date(args.get("since"))
+        until = history_date(args.get("until"), end_of_day=True)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    # Optional: trend of one scenario (matched ignoring case and whitespace)
+    instruction = args.get("instruction")
+    scenario = database.instruction_hash(instruction) if instruction else None
+    return jsonify({"bucket": bucket, "points": database.get_pass_rate_trend(bucket, since, until, scenario)})
+
+@app.route("/history/<int:test_run_id>", methods=["DELETE"])
+def delete_history_entry(test_run_id):
+    run_id = database.delete_test_run(test_run_id)
+    if run_id is False:
+        return {"error": "Run not found"}, 404
+    retention.delete_run_artifacts(run_id)
+    return {"status": "Run deleted", "id": test_run_id}
+
+@app.route("/pool/stats")
+def pool_stats():
+    return jsonify(get_browser_pool().stats())
+
+@app.route("/selector-cache/stats")
+def selector_cache_stats():
+    return jsonify(selector_cache.stats())
+
+@app.route("/retention/stats")
+def retention_stats():
+    return jsonify(retention.stats())
+
+@app.route("/pdf/stats")
+def pdf_stats():
+    return jsonify(pdf_cache.stats())
+
+@app.route("/response-cache/stats")
+def response_cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route("/llm-cache/stats")
+def llm_cache_stats():
+    return jsonify(parse_cache.stats())
+
+@app.route("/llm/stats")
+def llm_stats():
+    # Imported lazily like the LLM parser itself (graph.py), so the backend starts without langchain-groq
+    from utils import llm_clients
+    return jsonify(llm_clients.stats())
+
+@app.route("/llm-cache", methods=["DELETE"])
+def clear_llm_cache():
+    return {"status": "LLM parse cache cleared", "removed": parse_cache.clear()}
+
+@app.route("/events/stats")
+def event_stats():
+    return jsonify(get_event_bus().stats())
 
 # Fix: BASE_DIR should point to 'backend' folder where 'reports' is located
 # Use logging to debug path issues
@@ -35,19 +333,57 @@ REPORTS_DIR = os.path.join(BASE_DIR, "reports")
 print(f"DEBUG: App BASE_DIR: {BASE_DIR}")
 print(f"DEBUG: Reports expected at: {REPORTS_DIR}")
 
-@app.route("/download/pdf")
-def download_pdf():
-    pdf_path = os.path.join(REPORTS_DIR, "test_report.pdf")
-    if not os.path.exists(pdf_path):
-        return {"error": f"File not found at {pdf_path}"}, 404
-    return send_file(pdf_path, as_attachment=True)
+REPORT_FORMATS = ("json", "pdf")
+
+def send_run_report(run_id, fmt):
+    if fmt not in REPORT_FORMATS:
+        return {"error": f"Unknown report format '{fmt}'. Expected one of {list(REPORT_FORMATS)}"}, 404
+    try:
+        path = os.path.join(retention.run_dir(run_id), f"report.{fmt}")
+        if fmt == "pdf":
+            # Rendered on first request and cached; large reports render in the background
+            status, path = pdf_cache.request_pdf(run_id)
+            if status == "rendering":
+                return {"run_id": run_id, "status": "rendering"}, 202, {"Retry-After": "1"}
+    except pdf_cache.PdfRenderError as e:
+        return {"run_id": run_id, "status": "failed", "error": f"PDF rendering failed: {e}"}, 500
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": f"PDF rendering failed: {e}"}, 500
+    if not path or not os.path.exists(path):
+        return {"error": f"No {fmt.upper()} report for run {run_id}"}, 404
+    return send_file(path, as_attachment=True, download_name=f"test_report_{run_id}.{fmt}")
+
+@app.route("/runs/<run_id>/report.<fmt>")
+def run_report(run_id, fmt):
+    return send_run_report(run_id, fmt)
+
+@app.route("/runs/<run_id>/trace.json")
+def run_trace(run_id):
+    # Chrome trace-event JSON of the run's spans: open in chrome://tracing or ui.perfetto.dev
+    try:
+        report = pdf_cache.load_report(run_id)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if not report or not report.get("trace"):
+        return {"error": f"No trace for run {run_id}"}, 404
+    body = json.dumps(chrome_trace(report["trace"], name=f"run {run_id}"))
+    return Response(body, mimetype="application/json",
+                    headers={"Content-Disposition": f"attachment; filename=trace_{run_id}.json"})
+
+@app.route("/download/<fmt>")
+def download_report(fmt):
+    # ?run_id=... picks a run; otherwise the most recent run in history
+    run_id = request.args.get("run_id") or database.get_latest_run_id()
+    if run_id:
+        return send_run_report(run_id, fmt)
 
-@app.route("/download/json")
-def download_json():
-    json_path = os.path.join(REPORTS_DIR, "test_report.json")
-    if not os.path.exists(json_path):
-        return {"error": f"File not found at {json_path}"}, 404
-    return send_file(json_path, as_attachment=True)
+    # Reports written before per-run artifact directories
+    path = os.path.join(REPORTS_DIR, f"test_report.{fmt}")
+    if fmt not in REPORT_FORMATS or not os.path.exists(path):
+        return {"error": f"File not found at {path}"}, 404
+    return send_file(path, as_attachment=True)
 
 @app.route("/screenshots/<filename>")
 def serve_screenshot(filename):
@@ -60,6 +396,18 @@ def serve_screenshot(filename):
         return send_file(path)
     return {"error": "File not found"}, 404
 
+@app.route("/screenshots/<run_id>/<filename>")
+def serve_run_screenshot(run_id, filename):
+    if ".." in filename or filename.startswith("/"):
+         return {"error": "Invalid filename"}, 400
+    try:
+        path = os.path.join(retention.run_dir(run_id), filename)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if os.path.exists(path):
+        return send_file(path)
+    return {"error": "File not found"}, 404
+
 if __name__ == "__main__":
     app.run(host="127.0.0.1", port=5000, debug=False, threaded=True)
 
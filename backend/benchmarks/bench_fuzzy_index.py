@@ -0,0 +1,97 @@
+"""
+Per-heal matching latency of utils/fuzzy_index.py at 100 / 1k / 10k candidate elements.
+
+Candidates are generated element signatures (text, aria-label, placeholder, ...) like
+healing.py extracts them. For each size it reports the median of:
+
+  build+query  a heal on a new page: TrigramIndex built, then one query
+  query        a heal on an unchanged page (build_index() is memoized)
+  difflib      the old matcher, difflib.get_close_matches(cutoff=0.3)
+
+No browser needed.
+
+    cd backend && python benchmarks/bench_fuzzy_index.py --sizes 100,1000,10000
+"""
+import argparse
+import difflib
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.fuzzy_index import TrigramIndex
+
+VERBS = ["add to cart", "buy now", "sign in", "log out", "subscribe", "play", "share", "save", "download", "open menu",
+         "next page", "previous", "show more", "accept all", "reject", "search", "filter", "sort by price", "view details"]
+NOUNS = ["wireless mouse", "mechanical keyboard", "usb-c cable", "monitor stand", "laptop sleeve", "webcam", "headphones",
+         "desk lamp", "notebook", "backpack", "water bottle", "phone case", "charger", "speaker", "tablet"]
+# Renamed or reworded labels a heal has to map back to an element
+QUERIES = ["Add to basket", "Sign-in", "Accept cookies", "Show more results", "View product details", "Sort price"]
+
+
+def signatures(n, seed=4):
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        text = f"{rng.choice(VERBS)} {rng.choice(NOUNS)}"
+        if rng.random() < 0.3:
+            text += f" {text} button"  # text + matching aria-label, as the extractor joins them
+        if rng.random() < 0.2:
+            text += f" item {i}"
+        docs.append(text)
+    return docs
+
+
+def _median_ms(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", help="Candidate counts")
+    parser.add_argument("--iterations", type=int, default=10, help="Runs per measurement (the median is reported)")
+    args = parser.parse_args()
+
+    print(f"{'elements':>8} {'build+query ms':>15} {'query ms':>9} {'difflib ms':>11} {'same':>6}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        docs = signatures(n)
+        queries = [q.lower() for q in QUERIES]
+
+        def build_and_query():
+            for q in queries:
+                TrigramIndex(docs).best(q, cutoff=0.3)
+
+        index = TrigramIndex(docs)
+
+        def query_only():
+            for q in queries:
+                index.best(q, cutoff=0.3)
+
+        def old():
+            for q in queries:
+                difflib.get_close_matches(q, docs, n=1, cutoff=0.3)
+
+        # Heals where both matchers pick the same element (or both none); the scores differ by design
+        agree = 0
+        for q in queries:
+            best, _ = index.best(q, cutoff=0.3)
+            match = difflib.get_close_matches(q, docs, n=1, cutoff=0.3)
+            if (best is None and not match) or (best is not None and match and docs[best] == match[0]):
+                agree += 1
+
+        per_heal = len(queries)
+        print(f"{n:>8} {_median_ms(build_and_query, args.iterations) / per_heal:>15.2f} "
+              f"{_median_ms(query_only, args.iterations) / per_heal:>9.3f} "
+              f"{_median_ms(old, max(1, args.iterations // 5)) / per_heal:>11.2f} {agree:>3}/{per_heal}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Throughput of the regex parser (agent/parser.py) in instructions/sec.
+
+Parses the golden corpus (fixtures/parser_golden.jsonl) repeatedly. --compare loads
+another version of parser.py from a file for an A/B run, e.g. the version before a change:
+
+    git show <rev>:backend/agent/parser.py > /tmp/parser_old.py
+    cd backend && python benchmarks/bench_parser.py --compare /tmp/parser_old.py
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import parser as current
+from check_parser_golden import load
+
+
+def _load_module(path):
+    spec = importlib.util.spec_from_file_location("parser_compare", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench(module, texts, rounds):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for text in texts:
+            module.parse_instruction(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compare", help="Path to another parser.py to benchmark against")
+    parser.add_argument("--repeat", type=int, default=20, help="Corpus copies per round")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds (the best one is reported)")
+    args = parser.parse_args()
+
+    texts = [case["text"] for case in load()] * args.repeat
+    versions = [("current", current)]
+    if args.compare:
+        versions.append((os.path.basename(args.compare), _load_module(args.compare)))
+
+    print(f"{len(texts)} instructions per round, best of {args.rounds}")
+    rates = {}
+    for name, module in versions:
+        rates[name] = bench(module, texts, args.rounds)
+        print(f"{name:>16}: {rates[name]:>10,.0f} instructions/s")
+    if args.compare:
+        print(f"{'speedup':>16}: {rates['current'] / rates[versions[1][0]]:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Scenarios/sec and memory of the browser pool (utils/browser_pool.py).
+
+Runs the same local scenario (fixtures/scenario.html: type, click, verify) many
+times concurrently on the shared event loop, once per pool size, and reports
+throughput, latency, the worst event-loop stall and the peak RSS of this process
+plus its Chromium children. Needs Playwright's Chromium (playwright install chromium).
+
+    cd backend && python benchmarks/bench_pool.py --scenarios 40 --pool-sizes 1,2,4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "scenario.html")
+
+STEPS = [
+    {"type": "goto", "value": "file://" + FIXTURE},
+    {"type": "type", "value": "bench@example.com", "target": "Email"},
+    {"type": "click", "value": "Sign in"},
+    {"type": "verify", "value": "Welcome back", "container": "#status"},
+]
+
+
+# ---------------- MEMORY ----------------
+def _tree_rss_mb(root_pid):
+    """RSS of root_pid and all its descendants (Linux /proc), in MB."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields after ')' are fixed
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total_kb, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            pass
+    return total_kb / 1024
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_mb = max(self.peak_mb, _tree_rss_mb(os.getpid()))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# ---------------- BENCH ----------------
+async def _loop_lag(stop, interval=0.05):
+    """Worst delay of a 50ms timer on the shared loop: how long something blocked it."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.monotonic() - started - interval)
+    return worst
+
+
+async def _bench(pool_size, scenarios, concurrency, options):
+    from utils.browser_pool import configure_browser_pool
+    from agent.executor import run_test_async
+
+    pool = configure_browser_pool(size=pool_size)
+    # Launch the browsers outside the measured window
+    await asyncio.gather(*[_warm(pool) for _ in range(pool_size)])
+
+    gate = asyncio.Semaphore(concurrency)
+    latencies, failed = [], 0
+    stop = asyncio.Event()
+    lag_task = asyncio.ensure_future(_loop_lag(stop))
+
+    async def one(i):
+        nonlocal failed
+        async with gate:
+            started = time.monotonic()
+            results, _, _ = await run_test_async(STEPS, options=options, run_id=f"bench-{pool_size}-{i}")
+            latencies.append(time.monotonic() - started)
+            if any(r["status"] != "PASS" for r in results):
+                failed += 1
+
+    sampler = MemorySampler()
+    sampler.start()
+    started = time.monotonic()
+    await asyncio.gather(*[one(i) for i in range(scenarios)])
+    elapsed = time.monotonic() - started
+    stop.set()
+    sampler.stop()
+    worst_lag = await lag_task
+    await pool.shutdown()
+
+    latencies.sort()
+    return {
+        "pool": pool_size,
+        "scenarios": scenarios,
+        "failed": failed,
+        "per_sec": scenarios / elapsed,
+        "p50_s": statistics.median(latencies),
+        "p95_s": latencies[max(0, int(len(latencies) * 0.95) - 1)],
+        "loop_lag_ms": worst_lag * 1000,
+        "peak_mb": sampler.peak_mb,
+    }
+
+
+async def _warm(pool):
+    async with pool.lease():
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=40)
+    parser.add_argument("--pool-sizes", default="1,2,4")
+    parser.add_argument("--concurrency", type=int, default=None, help="Scenarios in flight (default: 2x pool size)")
+    parser.add_argument("--screenshots", default="failure", help="Screenshot policy for the runs")
+    args = parser.parse_args()
+
+    # Keep the history DB and run artifacts out of the working tree
+    workdir = tempfile.mkdtemp(prefix="bench_pool_")
+    import database
+    from utils import retention
+    from utils.async_runtime import run_sync
+    database.DB_PATH = os.path.join(workdir, "test_history.db")
+    database.init_db()
+    retention.RUNS_DIR = os.path.join(workdir, "runs")
+
+    options = {"screenshot_policy": args.screenshots}
+    print(f"Scenario: {len(STEPS)} steps on {FIXTURE}; artifacts in {workdir}")
+    print(f"{'pool':>4} {'runs':>5} {'fail':>4} {'runs/s':>7} {'p50 s':>6} {'p95 s':>6} {'lag ms':>7} {'peak MB':>8}")
+    for size in (int(s) for s in args.pool_sizes.split(",")):
+        concurrency = args.concurrency or size * 2
+        r = run_sync(_bench(size, args.scenarios, concurrency, options))
+        print(f"{r['pool']:>4} {r['scenarios']:>5} {r['failed']:>4} {r['per_sec']:>7.2f} {r['p50_s']:>6.2f} "
+              f"{r['p95_s']:>6.2f} {r['loop_lag_ms']:>7.1f} {r['peak_mb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Round trips and latency per element lookup: resolve_element() (one in-page pass over
+the whole strategy list) against find_element_cascade() (a locator query per strategy,
+then one per match).
+
+Round trips are Playwright protocol messages sent to the browser, counted with the
+run tracer (utils/tracing.py). Targets cover early and late strategies, many matches
+and a miss, on fixtures/scenario.html and fixtures/large_page.html.
+Needs Playwright's Chromium (playwright install chromium).
+
+    cd backend && python benchmarks/bench_resolve.py --iterations 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright
+
+from utils.dom_mapper import build_strategies, resolve_element, find_element_cascade
+from utils.tracing import Tracer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGES = [
+    ("scenario.html", ["Sign in", "Email", "Password", "Pricing", "Create account"]),
+    ("large_page.html?rows=2000", ["alpha bravo widget 1991", "Catalogue", "Marker late", "Checkout"]),
+]
+
+
+async def _resolve(page, target, strategies):
+    element, _ = await resolve_element(page, target, strategies)
+    return element
+
+
+async def _cascade(page, target, strategies):
+    return await find_element_cascade(page, target, strategies=strategies)
+
+
+async def _measure(lookup, page, target, iterations):
+    strategies = build_strategies(target)
+    tracer = Tracer(enabled=True)
+    tracer.activate()
+    timings, found = [], False
+    for _ in range(iterations):
+        before = tracer.ipc_calls
+        started = time.perf_counter()
+        found = await lookup(page, target, strategies) is not None
+        timings.append((time.perf_counter() - started) * 1000)
+        calls = tracer.ipc_calls - before
+    return found, calls, statistics.median(timings)
+
+
+async def run(iterations):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        page = await browser.new_page()
+        print(f"{'page':>26} {'target':>24} {'found':>5} {'cascade RT':>10} {'resolve RT':>10} {'cascade ms':>10} {'resolve ms':>10}")
+        for fixture, targets in PAGES:
+            await page.goto(f"file://{os.path.join(FIXTURES, fixture)}")
+            for target in targets:
+                old_found, old_calls, old_ms = await _measure(_cascade, page, target, iterations)
+                new_found, new_calls, new_ms = await _measure(_resolve, page, target, iterations)
+                found = "yes" if new_found else "no"
+                if old_found != new_found:
+                    found += "!"
+                print(f"{fixture:>26} {target:>24} {found:>5} {old_calls:>10} {new_calls:>10} {old_ms:>10.2f} {new_ms:>10.2f}")
+        await browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20, help="Lookups per target (the median is reported)")
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
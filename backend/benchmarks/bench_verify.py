@@ -0,0 +1,78 @@
+"""
+VERIFY on large pages: utils.verify.verify_text() against the old page.content() check.
+
+Loads fixtures/large_page.html with --rows product rows and, for text early, in the
+middle, late and missing from the page, reports the bytes returned over the Playwright
+pipe and the median latency per verify of:
+
+  content  the old check: text in page.title() or in page.content() (full serialized DOM)
+  verify   verify_text(): searched in the page, only a small result object returned
+
+Needs Playwright's Chromium (playwright install chromium).
+
+    cd backend && python benchmarks/bench_verify.py --rows 1000,10000,50000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright
+
+from utils.verify import verify_text
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "large_page.html")
+NEEDLES = {"early": "Marker early", "middle": "Marker middle", "late": "Marker late", "missing": "Marker absent"}
+
+
+async def _old_check(page, text):
+    title = await page.title()
+    content = await page.content()
+    found = text.lower() in title.lower() or text.lower() in content.lower()
+    return found, len(title.encode()) + len(content.encode())
+
+
+async def _new_check(page, text):
+    result = await verify_text(page, text)
+    return result["found"], len(json.dumps(result).encode())
+
+
+async def _measure(check, page, text, iterations):
+    timings, found, size = [], None, 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        found, size = await check(page, text)
+        timings.append((time.perf_counter() - started) * 1000)
+    return found, size, statistics.median(timings)
+
+
+async def run(rows_list, iterations):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        page = await browser.new_page()
+        print(f"{'rows':>6} {'needle':>8} {'content KB':>11} {'verify B':>9} {'content ms':>11} {'verify ms':>10} {'agree':>6}")
+        for rows in rows_list:
+            await page.goto(f"file://{FIXTURE}?rows={rows}")
+            for label, text in NEEDLES.items():
+                old_found, old_bytes, old_ms = await _measure(_old_check, page, text, iterations)
+                new_found, new_bytes, new_ms = await _measure(_new_check, page, text, iterations)
+                agree = "yes" if old_found == new_found else "DIFF"
+                print(f"{rows:>6} {label:>8} {old_bytes / 1024:>11.1f} {new_bytes:>9} {old_ms:>11.2f} {new_ms:>10.2f} {agree:>6}")
+        await browser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,10000,50000", help="Page sizes (product rows)")
+    parser.add_argument("--iterations", type=int, default=10, help="Verifies per case (the median is reported)")
+    args = parser.parse_args()
+    asyncio.run(run([int(r) for r in args.rows.split(",")], args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Regression check for GET /jobs/<id>/result after the job's run was deleted from history
+(DELETE /history/<id> or DELETE /history): it must answer JSON 410, not an HTML 500.
+
+Uses a temporary database and artifact directory; no browser or API key needed.
+
+    cd backend && python benchmarks/check_job_result.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Point the DB and artifacts at a scratch directory before the app starts its workers and sweeper
+WORKDIR = tempfile.mkdtemp(prefix="check_job_result_")
+import database
+from utils import retention
+database.DB_PATH = os.path.join(WORKDIR, "test_history.db")
+retention.RUNS_DIR = os.path.join(WORKDIR, "runs")
+retention.LEGACY_SCREENSHOTS_DIR = os.path.join(WORKDIR, "screenshots")
+
+import app as backend
+
+failures = []
+
+
+def check(name, ok, detail):
+    print(f"{'✅' if ok else '❌'} {name}: {detail}")
+    if not ok:
+        failures.append(name)
+
+
+def finished_job(job_id):
+    report = {"run_id": job_id, "summary": {"total_steps": 1, "passed": 1, "failed": 0, "pass_percentage": 100.0},
+              "steps": [], "logs": []}
+    test_run_id = database.add_test_run("Open example.com", report)
+    # The job workers are stopped in main(), so nothing claims the row before it is finished
+    database.create_job(job_id, "Open example.com", {}, time.time())
+    database.finish_job(job_id, "done", test_run_id, None, time.time())
+    return test_run_id
+
+
+def main():
+    backend.jobs.stop()
+    client = backend.app.test_client()
+
+    test_run_id = finished_job("jobresult1")
+    res = client.get("/jobs/jobresult1/result")
+    check("before delete", res.status_code == 200, f"{res.status_code}")
+
+    client.delete(f"/history/{test_run_id}")
+    res = client.get("/jobs/jobresult1/result")
+    check("after DELETE /history/<id>", res.status_code == 410 and res.is_json and res.json.get("error") == "Run deleted",
+          f"{res.status_code} {res.get_json(silent=True)}")
+
+    finished_job("jobresult2")
+    client.delete("/history")
+    res = client.get("/jobs/jobresult2/result")
+    check("after DELETE /history", res.status_code == 410 and res.is_json,
+          f"{res.status_code} {res.get_json(silent=True)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Checks utils/llm_clients.py against the local stub API (stub_llm_server.py):
+
+  reuse     sequential parses share one kept-alive connection and one client
+  batching  concurrent parses within LLM_BATCH_WINDOW_MS go out as one request
+  429       rate-limited requests are retried after Retry-After, then given up on
+  bucket    the token bucket spaces requests beyond the burst
+
+Exits 1 if any check fails. No API key or network needed.
+
+    cd backend && python benchmarks/check_llm_clients.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_llm_server as stub
+
+SERVER = stub.start()
+# Read by the modules at import: point them at the stub, skip the parse cache, retry fast
+os.environ["GROQ_API_BASE"] = f"http://127.0.0.1:{SERVER.server_port}"
+os.environ["LLM_CACHE"] = "0"
+os.environ["LLM_RETRY_BASE"] = "0.1"
+os.environ.setdefault("LLM_MAX_RETRIES", "4")
+
+from agent.llm_agent import parse_with_llm, LLM_MODEL
+from utils import llm_clients
+
+API_KEY = "gsk_stub_key_0000000000"
+failures = []
+
+
+def check(name, ok, detail):
+    print(f"{'✅' if ok else '❌'} {name}: {detail}")
+    if not ok:
+        failures.append(name)
+
+
+def main():
+    # Connection reuse
+    parse_with_llm("Open single.example", API_KEY)
+    parse_with_llm("Open single.example again", API_KEY)
+    same_client = llm_clients.get_client(API_KEY, LLM_MODEL) is llm_clients.get_client(API_KEY, LLM_MODEL)
+    check("reuse", len(stub.STATE["connections"]) == 1 and same_client,
+          f"{stub.STATE['requests']} requests over {len(stub.STATE['connections'])} connection(s), shared client: {same_client}")
+
+    # Micro-batching
+    results = {}
+
+    def parse(i):
+        results[i] = parse_with_llm(f"Open site {i}", API_KEY)
+
+    threads = [threading.Thread(target=parse, args=(i,)) for i in range(6)]
+    before = stub.STATE["requests"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    requests = stub.STATE["requests"] - before
+    urls = sorted(steps[0]["value"] for steps in results.values())
+    check("batching", requests < len(threads) and len(set(urls)) == len(threads),
+          f"{len(threads)} concurrent parses in {requests} request(s), {len(set(urls))} distinct answers")
+
+    # 429: retried after Retry-After, then given up on
+    stub.STATE["fail_429"] = 2
+    before = stub.STATE["requests"]
+    started = time.monotonic()
+    steps = parse_with_llm("Open retry.example", API_KEY)
+    check("429 retry", bool(steps) and stub.STATE["requests"] - before == 3,
+          f"succeeded after {stub.STATE['requests'] - before} requests in {time.monotonic() - started:.2f}s")
+
+    stub.STATE["fail_429"] = 100
+    try:
+        parse_with_llm("Open never.example", API_KEY)
+        check("429 give up", False, "parse succeeded while every request was rate limited")
+    except Exception as e:
+        check("429 give up", getattr(e, "status_code", None) == 429, f"{type(e).__name__} (status {getattr(e, 'status_code', None)})")
+    stub.STATE["fail_429"] = 0
+
+    # Token bucket: 2 immediate, then 10/s
+    bucket = llm_clients.TokenBucket(rate=10, burst=2)
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    elapsed = time.monotonic() - started
+    check("bucket", 0.25 <= elapsed < 0.6, f"5 acquires at 10/s with burst 2 took {elapsed:.2f}s")
+
+    print(llm_clients.stats())
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Golden-file check for the regex parser (agent/parser.py).
+
+fixtures/parser_golden.jsonl holds instructions with the preprocess_text() lines and
+parse_instruction() steps recorded from the parser before it was precompiled: hand-written
+instructions plus seeded random combinations of command words, separators, numbering,
+quotes and non-ASCII case-folding traps. Exits 1 if the current parser differs on any.
+
+    cd backend && python benchmarks/check_parser_golden.py
+    cd backend && python benchmarks/check_parser_golden.py --update   # after an intended change
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.parser import preprocess_text, parse_instruction
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "parser_golden.jsonl")
+
+
+def load(path=GOLDEN):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="Rewrite the expected outputs from the current parser")
+    parser.add_argument("--show", type=int, default=5, help="Mismatches to print")
+    args = parser.parse_args()
+
+    cases = load()
+    if args.update:
+        with open(GOLDEN, "w", encoding="utf-8") as f:
+            for case in cases:
+                text = case["text"]
+                f.write(json.dumps({"text": text, "lines": preprocess_text(text), "steps": parse_instruction(text)}, ensure_ascii=False) + "\n")
+        print(f"✅ Updated {len(cases)} golden cases")
+        return 0
+
+    mismatches = 0
+    for case in cases:
+        lines = preprocess_text(case["text"])
+        steps = parse_instruction(case["text"])
+        if lines != case["lines"] or steps != case["steps"]:
+            mismatches += 1
+            if mismatches <= args.show:
+                print(f"❌ {case['text']!r}")
+                print(f"   expected lines {case['lines']} steps {case['steps']}")
+                print(f"   got      lines {lines} steps {steps}")
+
+    if mismatches:
+        print(f"❌ {mismatches}/{len(cases)} golden cases differ")
+        return 1
+    print(f"✅ {len(cases)} golden cases match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
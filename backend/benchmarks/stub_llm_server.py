@@ -0,0 +1,84 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API, for exercising
+utils/llm_clients.py without a key or network. Point the backend at it with
+GROQ_API_BASE=http://127.0.0.1:<port>.
+
+Every request is recorded in STATE (bodies and client connections). Setting
+STATE["fail_429"] = n makes the next n requests answer 429 with Retry-After.
+Batched prompts ("Scenario 1: ...") get one step list per scenario.
+
+    cd backend && python benchmarks/stub_llm_server.py --port 8099
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import threading
+import json
+import time
+
+STATE = {"requests": 0, "fail_429": 0, "bodies": [], "connections": set()}
+RETRY_AFTER_SECONDS = "0.2"
+LATENCY_SECONDS = 0.05
+_lock = threading.Lock()
+
+
+def _steps_for(prompt):
+    if "Scenario 1:" in prompt:
+        n = prompt.count("Scenario ")
+        return {str(i): [{"action": "open", "value": f"https://site{i}.example"}] for i in range(1, n + 1)}
+    return [{"action": "open", "value": "https://single.example"}]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, so connection reuse is observable
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        with _lock:
+            STATE["requests"] += 1
+            STATE["bodies"].append(body)
+            STATE["connections"].add(self.client_address)
+            rate_limited = STATE["fail_429"] > 0
+            if rate_limited:
+                STATE["fail_429"] -= 1
+
+        if rate_limited:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                            {"retry-after": RETRY_AFTER_SECONDS})
+            return
+
+        time.sleep(LATENCY_SECONDS)
+        content = json.dumps(_steps_for(body["messages"][-1]["content"]))
+        self._send_json(200, {
+            "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+
+def start(port=0):
+    """Starts the stub on 127.0.0.1 in a daemon thread. Returns the server (server.server_port)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    print(f"Stub LLM API on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -1,62 +1,538 @@
+from contextlib import contextmanager
+import threading
+import datetime
+import hashlib
 import sqlite3
+import queue
 import json
-import datetime
+import zlib
+import time
 import os
 
+from utils import metrics
+
 DB_PATH = "test_history.db"
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+# Connections are opened once and reused; SQLite's per-connection statement
+# cache then keeps every query below prepared across calls.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+STATEMENT_CACHE_SIZE = 256
+
+# Bumped by every entry in MIGRATIONS; stored in PRAGMA user_version
+SCHEMA_VERSION = 4
+
+DB_POOL_WAIT = metrics.histogram("db_pool_wait_seconds", "Time spent waiting for a pooled SQLite connection", buckets=metrics.FAST_BUCKETS)
+DB_TRANSACTIONS = metrics.histogram("db_transaction_duration_seconds", "Time a connection is held, from checkout to commit/rollback", ("outcome",), buckets=metrics.FAST_BUCKETS)
+
+
+# ---------------- CONNECTION POOL ----------------
+class _ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections to one database file (WAL mode).
+    At most `size` connections are checked out at once; callers wait for a free one.
+    """
+    def __init__(self, path, size):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers run alongside the writer; NORMAL is durable across app crashes in WAL mode
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._open()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def release(self, conn):
+        self._idle.put(conn)
+        self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        # DB_PATH may be changed (e.g. by scripts) before first use
+        if _pool is None or _pool.path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = _ConnectionPool(DB_PATH, DB_POOL_SIZE)
+        return _pool
+
+@contextmanager
+def _connect():
+    """with _connect() as conn: ... commits on success, rolls back on error, returns the connection to the pool."""
+    pool = _get_pool()
+    requested = time.monotonic()
+    conn = pool.acquire()
+    acquired = time.monotonic()
+    DB_POOL_WAIT.observe(acquired - requested)
+    outcome = "commit"
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        outcome = "rollback"
+        conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
+        DB_TRANSACTIONS.observe(time.monotonic() - acquired, outcome=outcome)
+
+
+# ---------------- HELPERS ----------------
+def instruction_hash(instruction):
+    """Hash of an instruction, ignoring case and whitespace, so reruns of one scenario group together."""
+    normalized = " ".join((instruction or "").lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def _compress_report(report_json):
+    return zlib.compress(report_json.encode("utf-8"), 6)
+
+def _decompress_report(blob):
+    return zlib.decompress(blob).decode("utf-8") if blob is not None else None
+
+
+# ---------------- SCHEMA ----------------
+def _migration_1_base_tables(c):
     c.execute('''CREATE TABLE IF NOT EXISTS test_runs
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                  timestamp TEXT, 
-                  instruction TEXT, 
-                  total_steps INTEGER, 
-                  passed INTEGER, 
-                  failed INTEGER, 
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  timestamp TEXT,
+                  instruction TEXT,
+                  total_steps INTEGER,
+                  passed INTEGER,
+                  failed INTEGER,
+                  status TEXT,
+                  report_json TEXT,
+                  run_id TEXT)''')
+    # Databases created before per-run artifact directories lack run_id
+    columns = [row[1] for row in c.execute("PRAGMA table_info(test_runs)")]
+    if "run_id" not in columns:
+        c.execute("ALTER TABLE test_runs ADD COLUMN run_id TEXT")
+    c.execute('''CREATE TABLE IF NOT EXISTS selector_cache
+                 (host TEXT,
+                  path_pattern TEXT,
+                  target TEXT,
+                  action TEXT,
+                  selector TEXT,
+                  hits INTEGER DEFAULT 0,
+                  created_at REAL,
+                  last_used REAL,
+                  PRIMARY KEY (host, path_pattern, target, action))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS jobs
+                 (id TEXT PRIMARY KEY,
                   status TEXT,
-                  report_json TEXT)''')
-    conn.commit()
-    conn.close()
+                  instruction TEXT,
+                  options_json TEXT,
+                  created_at REAL,
+                  started_at REAL,
+                  finished_at REAL,
+                  test_run_id INTEGER,
+                  error TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS response_cache
+                 (key TEXT PRIMARY KEY,
+                  method TEXT,
+                  url TEXT,
+                  status INTEGER,
+                  headers_json TEXT,
+                  body_hash TEXT,
+                  size INTEGER,
+                  created_at REAL,
+                  last_used REAL)''')
+
+def _migration_2_report_blobs_and_indexes(c):
+    # Reports move out of test_runs into a zlib-compressed side table, so list queries never read them
+    c.execute('''CREATE TABLE IF NOT EXISTS test_run_reports
+                 (test_run_id INTEGER PRIMARY KEY,
+                  report BLOB)''')
+    columns = [row[1] for row in c.execute("PRAGMA table_info(test_runs)")]
+    if "report_json" in columns:
+        c.execute("""INSERT OR REPLACE INTO test_run_reports (test_run_id, report)
+                     SELECT id, compress_report(report_json) FROM test_runs WHERE report_json IS NOT NULL""")
+        try:
+            c.execute("ALTER TABLE test_runs DROP COLUMN report_json")
+        except sqlite3.OperationalError:
+            # SQLite < 3.35 can't drop columns: just free the space
+            c.execute("UPDATE test_runs SET report_json=NULL")
+    if "instruction_hash" not in columns:
+        c.execute("ALTER TABLE test_runs ADD COLUMN instruction_hash TEXT")
+    c.execute("UPDATE test_runs SET instruction_hash=instruction_hash(instruction) WHERE instruction_hash IS NULL")
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_test_runs_timestamp ON test_runs (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_test_runs_status ON test_runs (status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_test_runs_instruction_hash ON test_runs (instruction_hash)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_test_runs_run_id ON test_runs (run_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+
+def _migration_3_history_search(c):
+    # Trigram FTS5 index answers instruction substring searches without scanning every row
+    try:
+        c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS test_runs_fts
+                     USING fts5(instruction, content='test_runs', content_rowid='id', tokenize='trigram')""")
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ FTS5 trigram search unavailable ({e}); instruction search falls back to LIKE")
+        return
+    c.execute("""CREATE TRIGGER IF NOT EXISTS test_runs_fts_insert AFTER INSERT ON test_runs BEGIN
+                     INSERT INTO test_runs_fts (rowid, instruction) VALUES (new.id, new.instruction);
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS test_runs_fts_delete AFTER DELETE ON test_runs BEGIN
+                     INSERT INTO test_runs_fts (test_runs_fts, rowid, instruction) VALUES ('delete', old.id, old.instruction);
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS test_runs_fts_update AFTER UPDATE OF instruction ON test_runs BEGIN
+                     INSERT INTO test_runs_fts (test_runs_fts, rowid, instruction) VALUES ('delete', old.id, old.instruction);
+                     INSERT INTO test_runs_fts (rowid, instruction) VALUES (new.id, new.instruction);
+                 END""")
+    c.execute("INSERT INTO test_runs_fts (test_runs_fts) VALUES ('rebuild')")
+
+def _migration_4_llm_parse_cache(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS llm_parse_cache
+                 (key TEXT PRIMARY KEY,
+                  model TEXT,
+                  prompt_version TEXT,
+                  steps_json TEXT,
+                  hits INTEGER DEFAULT 0,
+                  created_at REAL,
+                  last_used REAL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_llm_parse_cache_last_used ON llm_parse_cache (last_used)")
 
+MIGRATIONS = [
+    _migration_1_base_tables,
+    _migration_2_report_blobs_and_indexes,
+    _migration_3_history_search,
+    _migration_4_llm_parse_cache,
+]
+
+def init_db():
+    """Creates the schema or upgrades an existing test_history.db to SCHEMA_VERSION."""
+    with _connect() as conn:
+        conn.create_function("compress_report", 1, lambda text: _compress_report(text) if text is not None else None)
+        conn.create_function("instruction_hash", 1, instruction_hash)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return
+        c = conn.cursor()
+        # DDL is transactional in SQLite: a failed upgrade leaves the old schema intact
+        c.execute("BEGIN IMMEDIATE")
+        for number, migration in enumerate(MIGRATIONS, start=1):
+            if version < number:
+                print(f"🗄️ Migrating database to schema version {number} ({migration.__name__})")
+                migration(c)
+        c.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+
+# ---------------- TEST RUNS ----------------
 def add_test_run(instruction, report):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
     summary = report.get("summary", {})
     total = summary.get("total_steps", 0)
     passed = summary.get("passed", 0)
     failed = summary.get("failed", 0)
     status = "PASS" if failed == 0 and total > 0 else "FAIL"
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    c.execute("INSERT INTO test_runs (timestamp, instruction, total_steps, passed, failed, status, report_json) VALUES (?, ?, ?, ?, ?, ?, ?)",
-              (timestamp, instruction, total, passed, failed, status, json.dumps(report)))
-    conn.commit()
-    conn.close()
-
-def get_all_test_runs():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT id, timestamp, instruction, total_steps, passed, failed, status FROM test_runs ORDER BY id DESC")
-    rows = c.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+
+    with _connect() as conn:
+        c = conn.cursor()
+        c.execute("INSERT INTO test_runs (timestamp, instruction, instruction_hash, total_steps, passed, failed, status, run_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                  (timestamp, instruction, instruction_hash(instruction), total, passed, failed, status, report.get("run_id")))
+        run_id = c.lastrowid
+        c.execute("INSERT INTO test_run_reports (test_run_id, report) VALUES (?, ?)",
+                  (run_id, _compress_report(json.dumps(report))))
+    return run_id
+
+_fts_available = None
+
+def _has_fts(conn):
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = conn.execute("SELECT 1 FROM sqlite_master WHERE name='test_runs_fts'").fetchone() is not None
+    return _fts_available
+
+def _history_filters(conn, status=None, since=None, until=None, query=None, instruction_hash=None):
+    """WHERE clauses and parameters shared by the history list and trend queries."""
+    clauses, params = [], []
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if since:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        clauses.append("timestamp <= ?")
+        params.append(until)
+    if instruction_hash:
+        clauses.append("instruction_hash = ?")
+        params.append(instruction_hash)
+    if query:
+        if len(query) >= 3 and _has_fts(conn):
+            # Quoted as one phrase: a case-insensitive substring match with the trigram tokenizer
+            clauses.append("id IN (SELECT rowid FROM test_runs_fts WHERE test_runs_fts MATCH ?)")
+            params.append('"' + query.replace('"', '""') + '"')
+        else:
+            # Trigrams need at least 3 characters
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("instruction LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+    return clauses, params
+
+def list_test_runs(limit=50, before_id=None, status=None, since=None, until=None, query=None):
+    """
+    One page of history, newest first, using keyset pagination on id.
+    Returns (runs, next_cursor); pass next_cursor as before_id to get the following page.
+    since/until compare against the "YYYY-MM-DD HH:MM:SS" timestamp.
+    """
+    with _connect() as conn:
+        clauses, params = _history_filters(conn, status, since, until, query)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = conn.execute(f"""SELECT id, timestamp, instruction, total_steps, passed, failed, status, run_id
+                                FROM test_runs {where} ORDER BY id DESC LIMIT ?""", (*params, limit + 1)).fetchall()
+    runs = [dict(row) for row in rows[:limit]]
+    next_cursor = runs[-1]["id"] if len(rows) > limit else None
+    return runs, next_cursor
+
+# Length of the timestamp prefix that identifies each trend bucket
+TREND_BUCKETS = {"hour": 13, "day": 10, "month": 7}
+
+def get_pass_rate_trend(bucket="day", since=None, until=None, instruction_hash=None):
+    """Runs, passed runs and step totals per hour/day/month, oldest bucket first."""
+    width = TREND_BUCKETS[bucket]
+    with _connect() as conn:
+        clauses, params = _history_filters(conn, since=since, until=until, instruction_hash=instruction_hash)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = conn.execute(f"""SELECT substr(timestamp, 1, {width}) AS bucket,
+                                       COUNT(*) AS runs,
+                                       SUM(status = 'PASS') AS passed_runs,
+                                       SUM(total_steps) AS total_steps,
+                                       SUM(passed) AS passed_steps
+                                FROM test_runs {where}
+                                GROUP BY bucket ORDER BY bucket""", params).fetchall()
+    trend = []
+    for row in rows:
+        point = dict(row)
+        point["pass_rate"] = round(point["passed_runs"] / point["runs"] * 100, 2) if point["runs"] else 0
+        trend.append(point)
+    return trend
 
 def get_test_run(run_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM test_runs WHERE id=?", (run_id,))
-    row = c.fetchone()
-    conn.close()
-    return dict(row) if row else None
+    """One run including its full report as 'report_json'."""
+    with _connect() as conn:
+        row = conn.execute("""SELECT r.id, r.timestamp, r.instruction, r.total_steps, r.passed, r.failed, r.status, r.run_id,
+                                     b.report AS report_blob
+                              FROM test_runs r LEFT JOIN test_run_reports b ON b.test_run_id = r.id
+                              WHERE r.id=?""", (run_id,)).fetchone()
+    if not row:
+        return None
+    run = dict(row)
+    run["report_json"] = _decompress_report(run.pop("report_blob"))
+    return run
+
+def get_report_json_by_run_id(run_id):
+    with _connect() as conn:
+        row = conn.execute("""SELECT b.report FROM test_runs r JOIN test_run_reports b ON b.test_run_id = r.id
+                              WHERE r.run_id=?""", (run_id,)).fetchone()
+    return _decompress_report(row[0]) if row else None
+
+def get_latest_run_id():
+    """run_id of the most recent run that has per-run artifacts, or None."""
+    with _connect() as conn:
+        row = conn.execute("SELECT run_id FROM test_runs WHERE run_id IS NOT NULL ORDER BY id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
 
 def clear_history():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM test_runs")
-    conn.commit()
-    conn.close()
+    with _connect() as conn:
+        conn.execute("DELETE FROM test_run_reports")
+        conn.execute("DELETE FROM test_runs")
+
+def delete_test_run(test_run_id):
+    """Deletes one run. Returns its run_id (artifact directory key), or False if it didn't exist."""
+    with _connect() as conn:
+        row = conn.execute("SELECT run_id FROM test_runs WHERE id=?", (test_run_id,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM test_run_reports WHERE test_run_id=?", (test_run_id,))
+            conn.execute("DELETE FROM test_runs WHERE id=?", (test_run_id,))
+    return row[0] if row else False
+
+# ---------------- JOB QUEUE ----------------
+def create_job(job_id, instruction, options, now):
+    with _connect() as conn:
+        conn.execute("INSERT INTO jobs (id, status, instruction, options_json, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                     (job_id, instruction, json.dumps(options or {}), now))
+
+def claim_next_job(now):
+    """Atomically moves the oldest queued job to 'running' and returns it."""
+    with _connect() as conn:
+        # Take the write lock up front so two workers can't claim the same job
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM jobs WHERE status='queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row:
+            conn.execute("UPDATE jobs SET status='running', started_at=? WHERE id=?", (now, row["id"]))
+    if not row:
+        return None
+    job = dict(row)
+    job["status"] = "running"
+    job["started_at"] = now
+    return job
+
+def finish_job(job_id, status, test_run_id, error, now):
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET status=?, test_run_id=?, error=?, finished_at=? WHERE id=?",
+                     (status, test_run_id, error, now, job_id))
+
+def cancel_queued_job(job_id, now):
+    """Cancels a job that has not started yet. Returns True if it was still queued."""
+    with _connect() as conn:
+        cur = conn.execute("UPDATE jobs SET status='cancelled', finished_at=? WHERE id=? AND status='queued'", (now, job_id))
+        return cur.rowcount > 0
+
+def requeue_interrupted_jobs():
+    """Jobs left 'running' by a previous process are put back in the queue."""
+    with _connect() as conn:
+        cur = conn.execute("UPDATE jobs SET status='queued', started_at=NULL WHERE status='running'")
+        return cur.rowcount
+
+def get_job(job_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def count_jobs_by_status():
+    with _connect() as conn:
+        rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+    return {status: count for status, count in rows}
+
+# ---------------- SELECTOR CACHE ----------------
+def get_cached_selector(host, path_pattern, target, action):
+    with _connect() as conn:
+        row = conn.execute("SELECT selector, hits, created_at, last_used FROM selector_cache WHERE host=? AND path_pattern=? AND target=? AND action=?",
+                           (host, path_pattern, target, action)).fetchone()
+    return dict(row) if row else None
+
+def save_cached_selector(host, path_pattern, target, action, selector, now):
+    with _connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO selector_cache (host, path_pattern, target, action, selector, hits, created_at, last_used) VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                     (host, path_pattern, target, action, selector, now, now))
+
+def touch_cached_selector(host, path_pattern, target, action, now):
+    with _connect() as conn:
+        conn.execute("UPDATE selector_cache SET hits = hits + 1, last_used=? WHERE host=? AND path_pattern=? AND target=? AND action=?",
+                     (now, host, path_pattern, target, action))
+
+def delete_cached_selector(host, path_pattern, target, action):
+    with _connect() as conn:
+        conn.execute("DELETE FROM selector_cache WHERE host=? AND path_pattern=? AND target=? AND action=?",
+                     (host, path_pattern, target, action))
+
+def prune_selector_cache(max_entries, expire_before):
+    """Drops expired entries, then the least recently used ones beyond max_entries."""
+    with _connect() as conn:
+        removed = conn.execute("DELETE FROM selector_cache WHERE created_at < ?", (expire_before,)).rowcount
+        removed += conn.execute("""DELETE FROM selector_cache WHERE rowid IN
+                                   (SELECT rowid FROM selector_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)""", (max_entries,)).rowcount
+    return removed
+
+def count_cached_selectors():
+    with _connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM selector_cache").fetchone()[0]
+
+# ---------------- LLM PARSE CACHE ----------------
+def get_cached_parse(key):
+    with _connect() as conn:
+        row = conn.execute("SELECT steps_json, model, prompt_version, hits, created_at, last_used FROM llm_parse_cache WHERE key=?",
+                           (key,)).fetchone()
+    return dict(row) if row else None
+
+def save_cached_parse(key, model, prompt_version, steps_json, now):
+    with _connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO llm_parse_cache (key, model, prompt_version, steps_json, hits, created_at, last_used) VALUES (?, ?, ?, ?, 0, ?, ?)",
+                     (key, model, prompt_version, steps_json, now, now))
+
+def touch_cached_parse(key, now):
+    with _connect() as conn:
+        conn.execute("UPDATE llm_parse_cache SET hits = hits + 1, last_used=? WHERE key=?", (now, key))
+
+def delete_cached_parse(key):
+    with _connect() as conn:
+        conn.execute("DELETE FROM llm_parse_cache WHERE key=?", (key,))
+
+def prune_parse_cache(max_entries, expire_before):
+    """Drops expired parses, then the least recently used ones beyond max_entries."""
+    with _connect() as conn:
+        removed = conn.execute("DELETE FROM llm_parse_cache WHERE created_at < ?", (expire_before,)).rowcount
+        removed += conn.execute("""DELETE FROM llm_parse_cache WHERE key IN
+                                   (SELECT key FROM llm_parse_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)""", (max_entries,)).rowcount
+    return removed
+
+def clear_parse_cache():
+    with _connect() as conn:
+        return conn.execute("DELETE FROM llm_parse_cache").rowcount
+
+def count_cached_parses():
+    with _connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM llm_parse_cache").fetchone()[0]
+
+# ---------------- RESPONSE CACHE ----------------
+def get_cached_response(key):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM response_cache WHERE key=?", (key,)).fetchone()
+    return dict(row) if row else None
+
+def save_cached_response(key, method, url, status, headers, body_hash, size, now):
+    with _connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO response_cache (key, method, url, status, headers_json, body_hash, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (key, method, url, status, json.dumps(headers), body_hash, size, now, now))
+
+def touch_cached_responses(keys, now):
+    with _connect() as conn:
+        conn.executemany("UPDATE response_cache SET last_used=? WHERE key=?", [(now, key) for key in keys])
+
+def prune_response_cache(max_bytes, max_entries):
+    """
+    Drops the least recently used responses beyond max_entries / max_bytes.
+    Returns the body hashes that are no longer referenced by any entry.
+    """
+    with _connect() as conn:
+        total = 0
+        dropped = []
+        rows = conn.execute("SELECT key, body_hash, size FROM response_cache ORDER BY last_used DESC").fetchall()
+        for i, (key, body_hash, size) in enumerate(rows):
+            total += size or 0
+            if i >= max_entries or total > max_bytes:
+                dropped.append((key, body_hash))
+
+        orphaned = []
+        if dropped:
+            conn.executemany("DELETE FROM response_cache WHERE key=?", [(key,) for key, _ in dropped])
+            for body_hash in {h for _, h in dropped}:
+                if not conn.execute("SELECT 1 FROM response_cache WHERE body_hash=? LIMIT 1", (body_hash,)).fetchone():
+                    orphaned.append(body_hash)
+    return orphaned
+
+def response_cache_usage():
+    """Returns (entries, total_bytes) of the response cache."""
+    with _connect() as conn:
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache").fetchone()
+    return entries, total
@@ -0,0 +1,154 @@
+import threading
+import json
+import uuid
+import time
+import os
+
+import database
+from agent.graph import run_agent
+from utils.events import get_event_bus
+from utils import metrics
+
+# Number of scenarios executed at the same time
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "2"))
+
+FINAL_STATES = ("done", "failed", "cancelled")
+
+JOBS_FINISHED = metrics.counter("jobs_finished_total", "Jobs that left the queue by final status", ("status",))
+JOB_WAIT = metrics.histogram("job_queue_wait_seconds", "Time jobs spent queued before a worker started them", buckets=metrics.RUN_BUCKETS)
+JOB_RUN = metrics.histogram("job_run_seconds", "Time from job start to finish", buckets=metrics.RUN_BUCKETS)
+
+
+class JobQueue:
+    """
+    Runs /run requests in the background.
+
+    Jobs are persisted in the `jobs` table, so queued work survives a backend
+    restart (jobs interrupted mid-run are queued again). API keys are only kept
+    in memory: a job resumed after a restart falls back to GROQ_API_KEY.
+    Progress is published on the event bus under the job id until the job ends.
+    """
+    def __init__(self, concurrency=JOB_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._events = get_event_bus()
+        self._api_keys = {}
+        self._cancel_events = {}
+        self._stats = {
+            "completed": 0,
+            "total_wait_s": 0.0,
+            "max_wait_s": 0.0,
+            "total_run_s": 0.0,
+            "max_run_s": 0.0,
+        }
+
+    def start(self):
+        requeued = database.requeue_interrupted_jobs()
+        if requeued:
+            print(f"♻️ Re-queued {requeued} job(s) interrupted by a restart")
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def submit(self, instruction, api_key=None, options=None):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if api_key:
+                self._api_keys[job_id] = api_key
+            self._cancel_events[job_id] = threading.Event()
+        self._events.open(job_id)
+        database.create_job(job_id, instruction, options, time.time())
+        self._wakeup.set()
+        return job_id
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. Queued jobs never start; running jobs stop before their
+        next step and their browser context is closed. Returns the job or None.
+        """
+        job = database.get_job(job_id)
+        if not job or job["status"] in FINAL_STATES:
+            return job
+        if database.cancel_queued_job(job_id, time.time()):
+            JOBS_FINISHED.inc(status="cancelled")
+            self._finish_events(job_id, "cancelled")
+        else:
+            with self._lock:
+                event = self._cancel_events.setdefault(job_id, threading.Event())
+            event.set()
+        return database.get_job(job_id)
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = database.claim_next_job(time.time())
+            if not job:
+                self._wakeup.wait(1)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job_id = job["id"]
+        with self._lock:
+            api_key = self._api_keys.pop(job_id, None)
+            cancel_event = self._cancel_events.setdefault(job_id, threading.Event())
+        # Jobs re-queued after a restart were not opened by submit()
+        self._events.open(job_id)
+
+        test_run_id, error, summary = None, None, None
+        try:
+            options = json.loads(job["options_json"] or "{}")
+            # The job id doubles as the run id of its artifact directory
+            report = run_agent(job["instruction"], api_key, cancel_event=cancel_event, options=options, run_id=job_id)
+            test_run_id = database.add_test_run(job["instruction"], report)
+            summary = report.get("summary")
+            status = "cancelled" if cancel_event.is_set() else "done"
+        except Exception as e:
+            status, error = "failed", str(e)
+            print(f"❌ Job {job_id} failed: {e}")
+
+        finished = time.time()
+        database.finish_job(job_id, status, test_run_id, error, finished)
+        self._finish_events(job_id, status, test_run_id=test_run_id, error=error, summary=summary)
+
+        wait_s = job["started_at"] - job["created_at"]
+        run_s = finished - job["started_at"]
+        JOBS_FINISHED.inc(status=status)
+        JOB_WAIT.observe(wait_s)
+        JOB_RUN.observe(run_s)
+        with self._lock:
+            self._cancel_events.pop(job_id, None)
+            self._stats["completed"] += 1
+            self._stats["total_wait_s"] += wait_s
+            self._stats["max_wait_s"] = max(self._stats["max_wait_s"], wait_s)
+            self._stats["total_run_s"] += run_s
+            self._stats["max_run_s"] = max(self._stats["max_run_s"], run_s)
+
+    def _finish_events(self, job_id, status, **data):
+        self._events.publish(job_id, "run_finished", status=status, **data)
+        self._events.close(job_id)
+
+    def metrics(self):
+        counts = database.count_jobs_by_status()
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats.pop("completed")
+        return {
+            "queue_depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "concurrency_limit": self.concurrency,
+            "jobs_by_status": counts,
+            "completed_since_start": completed,
+            "avg_wait_s": round(stats["total_wait_s"] / completed, 3) if completed else 0,
+            "max_wait_s": round(stats["max_wait_s"], 3),
+            "avg_run_s": round(stats["total_run_s"] / completed, 3) if completed else 0,
+            "max_run_s": round(stats["max_run_s"], 3),
+        }
@@ -0,0 +1,31 @@
+import threading
+import asyncio
+
+# One long-lived event loop runs every browser session in this process.
+# Sync callers (Flask threads, job workers) hand it coroutines and block on the result.
+_loop = None
+_loop_thread = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    """Returns the shared event loop, starting its thread on first use."""
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="playwright-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def submit(coro):
+    """Schedules coro on the shared loop. Returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro):
+    """Runs coro on the shared loop and waits for its result."""
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("run_sync() called from the event loop thread; await the coroutine instead")
+    return submit(coro).result()
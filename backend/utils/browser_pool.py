@@ -0,0 +1,196 @@
+from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+from utils import metrics
+import threading
+import asyncio
+import time
+import os
+
+# Pool configuration (override through environment variables)
+POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "4"))
+MAX_RUNS_PER_BROWSER = int(os.environ.get("BROWSER_MAX_RUNS", "50"))
+HEADLESS = os.environ.get("BROWSER_HEADLESS", "1").lower() not in ("0", "false", "no")
+
+LAUNCH_ARGS = ["--start-maximized"]
+
+LAUNCH_LATENCY = metrics.histogram("browser_launch_duration_seconds", "Chromium launch time", buckets=metrics.STEP_BUCKETS)
+LEASE_WAIT = metrics.histogram("browser_lease_wait_seconds", "Time runs waited for a free browser", buckets=metrics.RUN_BUCKETS)
+
+CONTEXT_OPTIONS = {
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 Chrome/120 Safari/537.36"
+    ),
+    "viewport": {"width": 1280, "height": 800},
+}
+
+
+class BrowserLease:
+    """
+    An isolated BrowserContext handed out by the pool for a single run.
+    """
+    def __init__(self, context, worker_id, wait_ms, reuse_count):
+        self.context = context
+        self.worker_id = worker_id
+        self.wait_ms = wait_ms
+        self.reuse_count = reuse_count
+
+
+class _Slot:
+    def __init__(self, slot_id):
+        self.id = slot_id
+        self.browser = None
+        self.runs = 0
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` Chromium processes warm on one async Playwright instance.
+
+    All browsers are driven from the shared event loop (utils.async_runtime), so
+    many scenarios run concurrently without an OS thread each. Every run gets a
+    fresh BrowserContext; the browser itself is health-checked before every
+    lease and recycled after `max_runs` runs.
+    """
+    def __init__(self, size=POOL_SIZE, max_runs=MAX_RUNS_PER_BROWSER, headless=HEADLESS):
+        self.size = max(1, size)
+        self.max_runs = max(1, max_runs)
+        self.headless = headless
+        self._playwright = None
+        self._slots = None
+        self._all_slots = []
+        self._start_lock = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "leases": 0,
+            "reused_leases": 0,
+            "launches": 0,
+            "recycled": 0,
+            "unhealthy": 0,
+            "active": 0,
+            "waiting": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    async def _ensure_started(self):
+        # Created lazily so they bind to the loop the pool is used from
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._slots is None:
+                self._playwright = await async_playwright().start()
+                self._slots = asyncio.Queue()
+                for slot_id in range(self.size):
+                    slot = _Slot(slot_id)
+                    self._all_slots.append(slot)
+                    self._slots.put_nowait(slot)
+
+    async def _prepare_browser(self, slot):
+        # Health check: a crashed/disconnected browser is replaced
+        if slot.browser is not None and not slot.browser.is_connected():
+            self._count("unhealthy")
+            slot.browser = None
+
+        # Recycling: long-lived Chromium slowly leaks memory
+        if slot.browser is not None and slot.runs >= self.max_runs:
+            try:
+                await slot.browser.close()
+            except Exception:
+                pass
+            self._count("recycled")
+            slot.browser = None
+
+        if slot.browser is None:
+            started = time.monotonic()
+            slot.browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+            LAUNCH_LATENCY.observe(time.monotonic() - started)
+            slot.runs = 0
+            self._count("launches")
+        return slot.browser
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        async with pool.lease() as lease: ... lease.context ...
+        Waits for a free browser; the context is closed when the block exits.
+        """
+        await self._ensure_started()
+        queued_at = time.monotonic()
+        self._count("waiting")
+        try:
+            slot = await self._slots.get()
+        finally:
+            self._count("waiting", -1)
+        wait_ms = round((time.monotonic() - queued_at) * 1000, 1)
+        LEASE_WAIT.observe(wait_ms / 1000)
+
+        context = None
+        try:
+            browser = await self._prepare_browser(slot)
+            context = await browser.new_context(**CONTEXT_OPTIONS)
+            with self._lock:
+                self._stats["leases"] += 1
+                self._stats["active"] += 1
+                self._stats["total_wait_ms"] += wait_ms
+                self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+                if slot.runs > 0:
+                    self._stats["reused_leases"] += 1
+
+            yield BrowserLease(context, slot.id, wait_ms, slot.runs)
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+                slot.runs += 1
+                self._count("active", -1)
+            self._slots.put_nowait(slot)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["max_runs_per_browser"] = self.max_runs
+        stats["browsers_running"] = sum(1 for s in self._all_slots if s.browser is not None)
+        stats["avg_wait_ms"] = round(stats["total_wait_ms"] / stats["leases"], 1) if stats["leases"] else 0
+        return stats
+
+    async def shutdown(self):
+        for slot in self._all_slots:
+            if slot.browser is not None:
+                try:
+                    await slot.browser.close()
+                except Exception:
+                    pass
+                slot.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool():
+    """Returns the process-wide browser pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+def configure_browser_pool(**kwargs):
+    """
+    Replaces the process-wide pool with one built from kwargs (size, max_runs, headless).
+    Meant for process start-up, e.g. in batch worker processes, before any lease.
+    """
+    global _pool
+    with _pool_lock:
+        _pool = BrowserPool(**kwargs)
+        return _pool
@@ -1,14 +1,22 @@
-from playwright.sync_api import Page, Locator
+from playwright.async_api import Page, Locator, ElementHandle
 
-def find_element(page: Page, selector: str, timeout: int = 5000) -> Locator:
+def _css_str(value: str) -> str:
+    """Quotes a value for use inside a CSS attribute selector."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def build_strategies(selector: str) -> list:
     """
-    Tries to find an element using multiple strategies to handle dynamic IDs or changes.
+    Builds the ordered list of strategies used to locate 'selector'.
+
+    Each entry is a (playwright_selector, spec) pair. The Playwright selector is
+    what the locator cascade uses; the spec is the same strategy in a form the
+    in-page resolver understands ({"css": ...} or {"text": ..., "exact": ...}).
     """
     # Prioritize original casing, then Title, then lower
     variations = [selector]
     if selector.title() != selector: variations.append(selector.title())
     if selector.lower() != selector: variations.append(selector.lower())
-    
+
     # Pre-cleaning: "Usage-based" synonyms
     # If user says "Search Box", we should also look for "Search"
     if "search" in selector.lower():
@@ -17,64 +25,192 @@ def find_element(page: Page, selector: str, timeout: int = 5000) -> Locator:
         variations.append("q") # Google's specific query param
 
     strategies = []
-    
+
     # 1. STRICT EXACT MATCHES (Highest Priority)
     # This prevents partial matches (e.g., 'Electronics' matching 'Consumer Electronics Policy')
     for s in variations:
+        q = _css_str(s)
         strategies.extend([
-            f"text='{s}'",                          # Exact text match (Case-sensitive-ish)
-            f"a:text-is('{s}')",                    # Exact link text
-            f"button:text-is('{s}')",               # Exact button text
-            f"[aria-label='{s}']",                  # Exact Aria
-            f"textarea[aria-label='{s}']",          # Textarea Aria (Google specific catch)
-            f"[title='{s}']",                       # Title attribute (Google 'Search')
-            f"[placeholder='{s}']",                 # Exact Placeholder
-            f"input[value='{s}']",                  # Exact Input Value
+            (f"text='{s}'", {"text": s, "exact": True}),                    # Exact text match (Case-sensitive-ish)
+            (f"a:text-is('{s}')", {"tag": "a", "text": s, "exact": True}),  # Exact link text
+            (f"button:text-is('{s}')", {"tag": "button", "text": s, "exact": True}), # Exact button text
+            (f"[aria-label='{s}']", {"css": f"[aria-label={q}]"}),           # Exact Aria
+            (f"textarea[aria-label='{s}']", {"css": f"textarea[aria-label={q}]"}), # Textarea Aria (Google specific catch)
+            (f"[title='{s}']", {"css": f"[title={q}]"}),                     # Title attribute (Google 'Search')
+            (f"[placeholder='{s}']", {"css": f"[placeholder={q}]"}),         # Exact Placeholder
+            (f"input[value='{s}']", {"css": f"input[value={q}]"}),           # Exact Input Value
         ])
-        
+
     # 2. LOOSE/SUBSTRING MATCHES (Fallback)
     for s in variations:
+        q = _css_str(s)
         strategies.extend([
-            f"button:has-text('{s}')",              # Button containing text
-            f"a:has-text('{s}')",                   # Link containing text
-            f"input[name='{s}']",                   # Exact Input Name
-            f"textarea[name='{s}']",                # Textarea Name
-            f"[aria-label*='{s}' i]",               # Case-insensitive partial Aria
-            f"[placeholder*='{s}' i]",              # Case-insensitive partial Placeholder
-            f"input[name*='{s}']",                  # Input Name partial
-            f"text={s}",                            # Generic text content (Low priority)
-            f"[data-testid='{s}']",                 # Test ID
-             # Basic IDs if valid CSS 
-            f"#{s}" if " " not in s else None, 
+            (f"button:has-text('{s}')", {"tag": "button", "text": s, "exact": False}), # Button containing text
+            (f"a:has-text('{s}')", {"tag": "a", "text": s, "exact": False}),  # Link containing text
+            (f"input[name='{s}']", {"css": f"input[name={q}]"}),             # Exact Input Name
+            (f"textarea[name='{s}']", {"css": f"textarea[name={q}]"}),       # Textarea Name
+            (f"[aria-label*='{s}' i]", {"css": f"[aria-label*={q} i]"}),     # Case-insensitive partial Aria
+            (f"[placeholder*='{s}' i]", {"css": f"[placeholder*={q} i]"}),   # Case-insensitive partial Placeholder
+            (f"input[name*='{s}']", {"css": f"input[name*={q}]"}),           # Input Name partial
+            (f"text={s}", {"text": s, "exact": False}),                      # Generic text content (Low priority)
+            (f"[data-testid='{s}']", {"css": f"[data-testid={q}]"}),         # Test ID
+             # Basic IDs if valid CSS
+            (f"#{s}", {"css": f"#{s}"}) if " " not in s else None,
         ])
-    
+
     # Filter out None and duplicate strategies while preserving order
     seen = set()
     cleaned_strategies = []
     for s in strategies:
-        if s and s not in seen:
+        if s and s[0] not in seen:
             cleaned_strategies.append(s)
-            seen.add(s)
-    
+            seen.add(s[0])
+
     # Add generic fallbacks at the end
-    cleaned_strategies.append(selector)
+    cleaned_strategies.append((selector, {"css": selector}))
+    return cleaned_strategies
+
+
+# Evaluates every strategy inside the page in priority order and returns
+# [element, strategy_index] for the first visible match, falling back to the
+# first (invisible) match, or null. Text specs mirror Playwright's engines:
+#   exact  -> text='..' / :text-is('..')  (case-sensitive, whitespace-normalized)
+#   !exact -> text=.. / :has-text('..')   (case-insensitive substring)
+# Untagged text specs return the innermost matching element, like text=.
+_RESOLVE_JS = """
+(specs) => {
+    const SKIP = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'HEAD', 'TEMPLATE']);
+    const textCache = new Map();
+    const textOf = (el) => {
+        let t = textCache.get(el);
+        if (t === undefined) {
+            const raw = (el.tagName === 'INPUT' && /^(button|submit|reset)$/i.test(el.type)) ? el.value : el.textContent;
+            t = (raw || '').replace(/\\s+/g, ' ').trim();
+            textCache.set(el, t);
+        }
+        return t;
+    };
+    let allElements = null;
+    const elements = () => {
+        if (!allElements) {
+            allElements = Array.from(document.querySelectorAll('body *')).filter(el => !SKIP.has(el.tagName));
+        }
+        return allElements;
+    };
+    const visible = (el) => {
+        const r = el.getBoundingClientRect();
+        if (!r.width || !r.height) return false;
+        return getComputedStyle(el).visibility !== 'hidden';
+    };
+    const textMatch = (spec) => {
+        const needle = spec.text.replace(/\\s+/g, ' ').trim();
+        const lowered = needle.toLowerCase();
+        const test = spec.exact ? (t) => t === needle : (t) => t.toLowerCase().includes(lowered);
+        const pool = spec.tag ? Array.from(document.querySelectorAll(spec.tag)) : elements();
+        const hits = pool.filter(el => test(textOf(el)));
+        if (spec.tag) return hits;
+        // Keep only the innermost elements carrying the text
+        const hitSet = new Set(hits);
+        return hits.filter(el => !Array.from(el.children).some(child => hitSet.has(child)));
+    };
+
+    let fallback = null;
+    for (let i = 0; i < specs.length; i++) {
+        let matches;
+        try {
+            matches = specs[i].css !== undefined ? document.querySelectorAll(specs[i].css) : textMatch(specs[i]);
+        } catch (e) {
+            continue; // Invalid selector for this page, same as a failed locator
+        }
+        for (const el of matches) {
+            if (visible(el)) return [el, i];
+            if (!fallback) fallback = [el, i];
+        }
+    }
+    return fallback;
+}
+"""
 
+async def resolve_element(page: Page, selector: str, strategies: list = None):
+    """
+    Single-pass resolver: ships the whole ordered strategy list into the page
+    in one evaluate call instead of one locator round trip per strategy.
+
+    Returns (element_handle, playwright_selector) or (None, None).
+    """
+    if strategies is None:
+        strategies = build_strategies(selector)
+
+    result = await page.evaluate_handle(_RESOLVE_JS, [spec for _, spec in strategies])
+    try:
+        props = await result.get_properties()
+        element = props["0"].as_element() if "0" in props else None
+        if element is None:
+            return None, None
+        index = await props["1"].json_value()
+        return element, strategies[index][0]
+    finally:
+        await result.dispose()
+
+async def find_element_cascade(page: Page, selector: str, timeout: int = 5000, strategies: list = None) -> Locator:
+    """
+    Locator-by-locator resolution (one round trip per strategy and per match).
+    Used when the in-page resolver cannot run, e.g. mid-navigation.
+    """
     best_candidate = None
+    if strategies is None:
+        strategies = build_strategies(selector)
 
-    for strategy in cleaned_strategies:
+    for strategy, _ in strategies:
         try:
             # Get all matches for this strategy
-            locs = page.locator(strategy).all()
-            
+            locs = await page.locator(strategy).all()
+
             for loc in locs:
-                if loc.is_visible():
+                if await loc.is_visible():
                     return loc # Found a visible match! Best case.
-                
+
                 # Keep the first finding as a fallback
                 if best_candidate is None:
                     best_candidate = loc
         except Exception:
             continue
-            
+
     # Fallback: If no visible element found, return the first invisible one we found
     return best_candidate
+
+async def find_element(page: Page, selector: str, timeout: int = 5000, strategies: list = None) -> ElementHandle:
+    """
+    Tries to find an element using multiple strategies to handle dynamic IDs or changes.
+    'strategies' is build_strategies(selector) when the caller already has it.
+    """
+    try:
+        element, _ = await resolve_element(page, selector, strategies)
+        return element
+    except Exception:
+        return await find_element_cascade(page, selector, timeout, strategies)
+
+# Builds a reusable selector for an element found by other means (e.g. healing):
+# a unique id or attribute selector when possible, otherwise tag + exact text.
+_DESCRIBE_JS = """
+(el) => {
+    const q = (v) => '"' + v.replace(/\\\\/g, '\\\\\\\\').replace(/"/g, '\\\\"') + '"';
+    const unique = (sel) => { try { return document.querySelectorAll(sel).length === 1; } catch (e) { return false; } };
+    const tag = el.tagName.toLowerCase();
+    if (el.id && unique('#' + CSS.escape(el.id))) return '#' + CSS.escape(el.id);
+    for (const attr of ['data-testid', 'aria-label', 'name', 'title', 'placeholder']) {
+        const v = el.getAttribute(attr);
+        if (v && unique(`${tag}[${attr}=${q(v)}]`)) return `${tag}[${attr}=${q(v)}]`;
+    }
+    const text = (el.textContent || '').replace(/\\s+/g, ' ').trim();
+    if (text && text.length <= 80) return `${tag}:text-is(${q(text)})`;
+    return null;
+}
+"""
+
+async def describe_element(element) -> str:
+    """Returns a selector that should find 'element' again, or None."""
+    try:
+        return await element.evaluate(_DESCRIBE_JS)
+    except Exception:
+        return None
@@ -0,0 +1,115 @@
+import threading
+import time
+import os
+
+# Events kept per run so late subscribers (or reconnects) can replay from the start
+EVENTS_MAX_PER_RUN = int(os.environ.get("EVENTS_MAX_PER_RUN", "2000"))
+# Finished runs keep their events this long for clients that connect late
+EVENTS_TTL_SECONDS = int(os.environ.get("EVENTS_TTL_SECONDS", "600"))
+
+# Types published by the executor and the job queue
+EVENT_TYPES = (
+    "run_started", "step_started", "attempt_failed", "healed",
+    "step_finished", "screenshot_ready", "run_finished",
+)
+
+
+class _Channel:
+    def __init__(self):
+        self.events = []
+        self.next_id = 1
+        self.closed_at = None
+
+
+class EventBus:
+    """
+    In-process publish/subscribe of run events, keyed by run id.
+
+    Publishers (executor on the browser loop, encoder threads, job workers) never
+    block; subscribers wait on a condition and resume after the last id they saw.
+    Only opened runs are recorded, so runs nobody can subscribe to (batches) cost nothing.
+    """
+    def __init__(self, max_events=EVENTS_MAX_PER_RUN, ttl=EVENTS_TTL_SECONDS):
+        self.max_events = max_events
+        self.ttl = ttl
+        self._channels = {}
+        self._cond = threading.Condition()
+
+    def open(self, run_id):
+        with self._cond:
+            self._channels.setdefault(run_id, _Channel())
+
+    def publish(self, run_id, event_type, **data):
+        with self._cond:
+            channel = self._channels.get(run_id)
+            if channel is None or channel.closed_at is not None:
+                return
+            channel.events.append({"id": channel.next_id, "type": event_type, "ts": time.time(), **data})
+            channel.next_id += 1
+            if len(channel.events) > self.max_events:
+                del channel.events[0]
+            self._cond.notify_all()
+
+    def close(self, run_id):
+        """No more events for this run; subscribers drain what is left and stop."""
+        with self._cond:
+            channel = self._channels.get(run_id)
+            if channel is not None and channel.closed_at is None:
+                channel.closed_at = time.monotonic()
+                self._cond.notify_all()
+            self._expire()
+
+    def known(self, run_id):
+        with self._cond:
+            return run_id in self._channels
+
+    def subscribe(self, run_id, after=0, timeout=15):
+        """
+        Yields events of a run with an id greater than 'after', as they arrive.
+        Yields None every 'timeout' seconds without events (for keep-alives) and
+        returns once the run's channel is closed and drained (or was never opened).
+        """
+        while True:
+            with self._cond:
+                channel = self._channels.get(run_id)
+                if channel is None:
+                    return
+                pending = [e for e in channel.events if e["id"] > after]
+                if not pending and channel.closed_at is None:
+                    self._cond.wait(timeout)
+                    pending = [e for e in channel.events if e["id"] > after]
+                closed = channel.closed_at is not None
+            for event in pending:
+                after = event["id"]
+                yield event
+            if closed and not pending:
+                return
+            if not pending:
+                yield None
+
+    def _expire(self):
+        # Called with the condition held
+        now = time.monotonic()
+        expired = [run_id for run_id, channel in self._channels.items()
+                   if channel.closed_at is not None and now - channel.closed_at > self.ttl]
+        for run_id in expired:
+            del self._channels[run_id]
+
+    def stats(self):
+        with self._cond:
+            return {
+                "runs": len(self._channels),
+                "open_runs": sum(1 for c in self._channels.values() if c.closed_at is None),
+                "buffered_events": sum(len(c.events) for c in self._channels.values()),
+            }
+
+
+_bus = EventBus()
+
+
+def get_event_bus():
+    return _bus
+
+
+def publish(run_id, event_type, **data):
+    _bus.publish(run_id, event_type, **data)
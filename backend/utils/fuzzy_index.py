@@ -0,0 +1,91 @@
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+
+def _trigrams(text):
+    # Pad so that short words and word boundaries still produce grams
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class TrigramIndex:
+    """
+    TF-IDF weighted character-trigram index over a list of documents.
+
+    Postings are stored column-major (trigram -> documents) in flat NumPy
+    arrays, so scoring a query only touches the trigrams it contains and all
+    documents are scored in one vectorized pass. Documents keep their
+    position, so duplicate texts stay distinct entries.
+    """
+    def __init__(self, docs):
+        self.size = len(docs)
+        self.vocab = {}
+        rows, cols, counts = [], [], []
+        for i, doc in enumerate(docs):
+            for gram, n in Counter(_trigrams(doc)).items():
+                j = self.vocab.setdefault(gram, len(self.vocab))
+                rows.append(i)
+                cols.append(j)
+                counts.append(n)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        tf = 1.0 + np.log(np.asarray(counts, dtype=np.float64)) if counts else np.zeros(0)
+
+        df = np.bincount(cols, minlength=len(self.vocab))
+        self.idf = np.log((1.0 + self.size) / (1.0 + df)) + 1.0
+        self.unseen_idf = np.log(1.0 + self.size) + 1.0
+
+        weights = tf * self.idf[cols] if counts else np.zeros(0)
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=self.size))
+        norms[norms == 0] = 1.0
+        weights = weights / norms[rows] if counts else weights
+
+        order = np.argsort(cols, kind="stable")
+        self._docs = rows[order]
+        self._weights = weights[order]
+        self._offsets = np.concatenate(([0], np.cumsum(df)))
+
+    def scores(self, query):
+        """Cosine similarity between 'query' and every document (array of len(docs))."""
+        if not self.size:
+            return np.zeros(0)
+
+        grams = Counter(_trigrams(query))
+        ids, q_weights = [], []
+        q_norm_sq = 0.0
+        for gram, n in grams.items():
+            j = self.vocab.get(gram)
+            idf = self.idf[j] if j is not None else self.unseen_idf
+            w = (1.0 + np.log(n)) * idf
+            q_norm_sq += w * w
+            if j is not None:
+                ids.append(j)
+                q_weights.append(w)
+
+        if not ids or q_norm_sq == 0:
+            return np.zeros(self.size)
+
+        ids = np.asarray(ids)
+        starts, ends = self._offsets[ids], self._offsets[ids + 1]
+        lengths = ends - starts
+        # Flat positions of every posting for the query's trigrams
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        contrib = self._weights[positions] * np.repeat(np.asarray(q_weights), lengths)
+        return np.bincount(self._docs[positions], weights=contrib, minlength=self.size) / np.sqrt(q_norm_sq)
+
+    def best(self, query, cutoff=0.0):
+        """Returns (index, score) of the best match above cutoff, or (None, 0.0). Ties keep document order."""
+        scores = self.scores(query)
+        if not len(scores):
+            return None, 0.0
+        i = int(np.argmax(scores))
+        if scores[i] < cutoff:
+            return None, float(scores[i])
+        return i, float(scores[i])
+
+
+@lru_cache(maxsize=16)
+def build_index(docs: tuple) -> TrigramIndex:
+    """Index for a tuple of documents; repeated heals on an unchanged page reuse it."""
+    return TrigramIndex(list(docs))
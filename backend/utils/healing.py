@@ -1,58 +1,89 @@
-from playwright.sync_api import Page
-import difflib
+from playwright.async_api import Page
+from utils.fuzzy_index import build_index
+import asyncio
+import os
 
-def heal_element(page: Page, target_text: str):
+# Minimum TF-IDF trigram cosine similarity accepted as a replacement
+HEAL_CUTOFF = float(os.environ.get("HEAL_CUTOFF", "0.3"))
+
+INTERACTIVE_SELECTOR = "button, a, input[type='submit'], input[type='button'], [role='button']"
+
+# Collects the signature of every visible interactive element in one call.
+# The matching elements are parked on window so the winner can be fetched by index.
+_EXTRACT_JS = """
+(selector) => {
+    const kept = [];
+    const signatures = [];
+    for (const el of document.querySelectorAll(selector)) {
+        const r = el.getBoundingClientRect();
+        if (!r.width || !r.height || getComputedStyle(el).visibility === 'hidden') continue;
+        const attr = (name) => (el.getAttribute(name) || '').trim();
+        const signature = [(el.textContent || '').trim(), attr('aria-label'), attr('placeholder'), attr('value'), attr('title')]
+            .join(' ').trim().toLowerCase();
+        if (signature) {
+            kept.push(el);
+            signatures.push(signature);
+        }
+    }
+    if (kept.length) window.__aiAgentHealCandidates = kept; // Deleted by heal_element once it is done
+    return signatures;
+}
+"""
+
+_TAKE_JS = """
+(i) => {
+    const el = window.__aiAgentHealCandidates[i];
+    delete window.__aiAgentHealCandidates;
+    return el;
+}
+"""
+
+
+async def _clear_candidates(page: Page):
+    try:
+        await page.evaluate("() => { delete window.__aiAgentHealCandidates; }")
+    except Exception:
+        pass # Page navigated or closed: nothing left to clear
+
+
+async def heal_element(page: Page, target_text: str):
     """
     Scans the DOM for interactive elements and uses fuzzy matching
     to find the closest match to 'target_text'.
     """
     print(f"🏥 Healing initiated for: '{target_text}'")
-    
-    # 1. Get handles to all potential interactive elements
-    # We look for buttons, links, and inputs
-    elements = page.locator("button, a, input[type='submit'], input[type='button'], [role='button']").all()
-    
-    candidates = []
-    element_map = {}
-
-    for el in elements:
-        try:
-            if not el.is_visible():
-                continue
-                
-            # Extract text attributes
-            text = (el.text_content() or "").strip()
-            label = (el.get_attribute("aria-label") or "").strip()
-            placeholder = (el.get_attribute("placeholder") or "").strip()
-            value = (el.get_attribute("value") or "").strip()
-            title = (el.get_attribute("title") or "").strip()
-            
-            # Combine all text signals
-            signature = f"{text} {label} {placeholder} {value} {title}".strip().lower()
-            
-            if signature:
-                # Store for matching
-                candidates.append(signature)
-                # Map signature back to element (using index if duplicates exist, but simple map here)
-                element_map[signature] = el
-        except:
-            continue
-
-    # 2. Find closest match using difflib
-    # cutoff=0.4 means we accept 40% similarity (quite loose, good for finding renamed things)
-    # We use a lower cutoff (0.3) to catch substrings like "Feeling Lucky" in "I'm Feeling Lucky"
-    matches = difflib.get_close_matches(target_text.lower(), candidates, n=1, cutoff=0.3)
-    
-    if matches:
-        best_match_key = matches[0]
-        print(f"✅ Healed! Found replacement: '{best_match_key}' (Match for '{target_text}')")
-        return element_map[best_match_key]
-    
-    # Fallback: check for substring manually if difflib fails
-    for candidate in candidates:
-         if target_text.lower() in candidate:
-             print(f"✅ Healed (Substring Match)! Found replacement: '{candidate}'")
-             return element_map[candidate]
-
-    print("❌ Healing failed. No similar elements found.")
-    return None
+
+    # 1. Extract text signals (text, aria-label, placeholder, value, title)
+    # for all visible interactive elements in a single round trip
+    try:
+        candidates = await page.evaluate(_EXTRACT_JS, INTERACTIVE_SELECTOR)
+    except Exception as e:
+        print(f"❌ Healing failed. Could not scan page: {e}")
+        return None
+
+    if not candidates:
+        print("❌ Healing failed. No similar elements found.")
+        return None
+
+    # 2. Score every candidate at once against a trigram TF-IDF index.
+    # Candidates are addressed by position, so duplicate signatures stay distinct.
+    target = target_text.lower()
+    # Index building is CPU-bound; keep it off the event loop shared by other runs
+    index = await asyncio.to_thread(build_index, tuple(candidates))
+    best, score = index.best(target, cutoff=HEAL_CUTOFF)
+
+    if best is not None:
+        print(f"✅ Healed! Found replacement: '{candidates[best]}' (Match for '{target_text}', score {score:.2f})")
+    else:
+        # Fallback: check for substring manually if similarity is too low
+        best = next((i for i, candidate in enumerate(candidates) if target in candidate), None)
+        if best is not None:
+            print(f"✅ Healed (Substring Match)! Found replacement: '{candidates[best]}'")
+
+    if best is None:
+        await _clear_candidates(page)
+        print("❌ Healing failed. No similar elements found.")
+        return None
+
+    # Takes the chosen element and drops the list in the same round trip, so a reused page doesn't keep detached nodes alive
+    return (await page.evaluate_handle(_TAKE_JS, best)).as_element()
@@ -0,0 +1,234 @@
+from collections import OrderedDict
+from langchain_groq import ChatGroq
+import threading
+import random
+import httpx
+import time
+import os
+
+# Point at a local stub of the OpenAI-style chat API (e.g. http://127.0.0.1:8080) for tests
+API_BASE = os.environ.get("GROQ_API_BASE") or None
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT", "30"))
+# Requests per minute allowed per API key (token bucket), with short bursts of LLM_BURST
+LLM_RATE_PER_MIN = float(os.environ.get("LLM_RATE_PER_MIN", "30"))
+LLM_BURST = int(os.environ.get("LLM_BURST", "5"))
+# Requests in flight at once across the whole process
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+# 429 responses are retried with full-jitter exponential backoff (or the server's Retry-After)
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.environ.get("LLM_RETRY_BASE", "1"))
+LLM_RETRY_CAP_SECONDS = float(os.environ.get("LLM_RETRY_CAP", "20"))
+# Parses submitted within this window share one request (0 disables batching)
+LLM_BATCH_WINDOW_MS = int(os.environ.get("LLM_BATCH_WINDOW_MS", "50"))
+LLM_BATCH_MAX = int(os.environ.get("LLM_BATCH_MAX", "8"))
+LLM_MAX_CLIENTS = int(os.environ.get("LLM_MAX_CLIENTS", "32"))
+
+_lock = threading.Lock()
+_clients = OrderedDict()
+_buckets = {}
+_concurrency = threading.BoundedSemaphore(max(1, LLM_MAX_CONCURRENCY))
+_stats = {
+    "requests": 0,
+    "failures": 0,
+    "rate_limited": 0,
+    "retries": 0,
+    "throttle_wait_s": 0.0,
+    "batches": 0,
+    "batched_items": 0,
+}
+
+
+def _count(name, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+class TokenBucket:
+    """Blocking token bucket: 'rate' tokens per second, holding at most 'burst'."""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _is_rate_limited(error):
+    # An exhausted quota is also a 429, but retrying it is pointless
+    return getattr(error, "status_code", None) == 429 and "insufficient_quota" not in str(error)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return min(float(response.headers.get("retry-after")), LLM_RETRY_CAP_SECONDS)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class _Batch:
+    def __init__(self):
+        self.slots = []
+        self.full = threading.Event()
+
+
+class LLMClient:
+    """
+    One chat model per (API key, model), reused by every request of the process so
+    its HTTP connections stay alive. Calls go through the key's rate limiter, the
+    process-wide concurrency limit and the 429 retry policy.
+    """
+    def __init__(self, api_key, model):
+        self.model = model
+        self._http = httpx.Client(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY),
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
+        self.llm = ChatGroq(
+            model=model,
+            temperature=0,
+            api_key=api_key,
+            base_url=API_BASE,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=0, # Retries are ours, so they respect the rate limiter
+            http_client=self._http,
+        )
+        self._bucket = _bucket_for(api_key)
+        self._batch_lock = threading.Lock()
+        self._open_batches = {}
+
+    def call(self, fn):
+        """Runs fn(llm) (one API request), retrying rate-limited attempts."""
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            waited = self._bucket.acquire()
+            if waited:
+                _count("throttle_wait_s", waited)
+            with _concurrency:
+                _count("requests")
+                try:
+                    return fn(self.llm)
+                except Exception as e:
+                    if not _is_rate_limited(e):
+                        _count("failures")
+                        raise
+                    _count("rate_limited")
+                    if attempt == LLM_MAX_RETRIES:
+                        _count("failures")
+                        raise
+                    delay = _retry_after(e) or random.uniform(0, min(LLM_RETRY_CAP_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+            _count("retries")
+            print(f"⏳ LLM rate limited (429). Retrying in {delay:.1f}s ({attempt + 1}/{LLM_MAX_RETRIES})")
+            time.sleep(delay)
+
+    def submit(self, item, handler):
+        """
+        Micro-batching: items submitted within LLM_BATCH_WINDOW_MS are passed together
+        to handler(client, items), which returns one result (or Exception) per item.
+        The first caller of a batch waits for the window and runs it; the others wait
+        for their result.
+        """
+        if LLM_BATCH_WINDOW_MS <= 0:
+            return handler(self, [item])[0]
+
+        slot = {"item": item, "done": threading.Event(), "result": None}
+        with self._batch_lock:
+            batch = self._open_batches.get(handler)
+            leader = batch is None
+            if leader:
+                batch = self._open_batches[handler] = _Batch()
+            batch.slots.append(slot)
+            if len(batch.slots) >= LLM_BATCH_MAX:
+                # Full: later items start a new batch
+                del self._open_batches[handler]
+                batch.full.set()
+
+        if not leader:
+            slot["done"].wait()
+        else:
+            batch.full.wait(LLM_BATCH_WINDOW_MS / 1000)
+            with self._batch_lock:
+                if self._open_batches.get(handler) is batch:
+                    del self._open_batches[handler]
+            items = [s["item"] for s in batch.slots]
+            if len(items) > 1:
+                _count("batches")
+                _count("batched_items", len(items))
+            try:
+                results = handler(self, items)
+                if len(results) != len(items):
+                    raise ValueError(f"batch handler returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                results = [e] * len(items)
+            for s, result in zip(batch.slots, results):
+                s["result"] = result
+                s["done"].set()
+
+        if isinstance(slot["result"], Exception):
+            raise slot["result"]
+        return slot["result"]
+
+    def close(self):
+        self._http.close()
+
+
+def _bucket_for(api_key):
+    # Rate limits apply per API key, whichever model it calls
+    with _lock:
+        bucket = _buckets.get(api_key)
+        if bucket is None:
+            bucket = _buckets[api_key] = TokenBucket(LLM_RATE_PER_MIN / 60, LLM_BURST)
+        return bucket
+
+
+def get_client(api_key, model):
+    """Returns the shared client for this API key and model (LRU-bounded registry)."""
+    key = (api_key, model)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            return client
+    client = LLMClient(api_key, model)
+    with _lock:
+        existing = _clients.get(key)
+        if existing is not None:
+            # Created concurrently by another thread: keep the first one
+            client.close()
+            return existing
+        _clients[key] = client
+        while len(_clients) > LLM_MAX_CLIENTS:
+            # Not closed here: a thread may still be using it; its connections go with it
+            _clients.popitem(last=False)
+    return client
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+        result["clients"] = len(_clients)
+    result["throttle_wait_s"] = round(result["throttle_wait_s"], 3)
+    result["limits"] = {
+        "rate_per_min": LLM_RATE_PER_MIN,
+        "burst": LLM_BURST,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "max_retries": LLM_MAX_RETRIES,
+        "batch_window_ms": LLM_BATCH_WINDOW_MS,
+        "batch_max": LLM_BATCH_MAX,
+        "timeout_s": LLM_TIMEOUT_SECONDS,
+    }
+    return result
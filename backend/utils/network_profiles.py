@@ -0,0 +1,123 @@
+import re
+import os
+
+# Hosts/paths of common analytics, ad and tracking scripts
+TRACKER_PATTERNS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "adservice.google.",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "segment.io",
+    "cdn.segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "clarity.ms",
+    "scorecardresearch.com",
+    "taboola.com",
+    "outbrain.com",
+    "criteo.",
+    "adnxs.com",
+    "newrelic.com",
+    "nr-data.net",
+    "sentry.io",
+]
+
+# Named profiles. "full" loads everything (no interception at all).
+# Stylesheets are never blocked by default: visibility checks depend on them.
+PROFILES = {
+    "full": {"resource_types": [], "url_patterns": []},
+    "trackers": {"resource_types": [], "url_patterns": TRACKER_PATTERNS},
+    "lean": {"resource_types": ["image", "media", "font"], "url_patterns": TRACKER_PATTERNS},
+}
+
+DEFAULT_PROFILE = os.environ.get("NETWORK_PROFILE", "full")
+
+
+class NetworkProfile:
+    """
+    Blocks configured resource types and URL patterns for a BrowserContext
+    through context.route, and counts what was blocked and what was loaded.
+    """
+    def __init__(self, name, resource_types=(), url_patterns=()):
+        self.name = name
+        self.resource_types = set(resource_types)
+        self.url_patterns = list(url_patterns)
+        self._pattern = re.compile("|".join(re.escape(p) for p in self.url_patterns)) if self.url_patterns else None
+        self.stats = {
+            "profile": name,
+            "requests": 0,
+            "blocked_requests": 0,
+            "blocked_by_type": {},
+            "bytes_received": 0,
+        }
+
+    @property
+    def blocks_anything(self):
+        return bool(self.resource_types or self._pattern)
+
+    async def attach(self, context):
+        context.on("request", self._on_request)
+        context.on("response", self._on_response)
+        if self.blocks_anything:
+            # Only intercept when needed: routing adds a round trip per request
+            await context.route("**/*", self._handle_route)
+
+    def _on_request(self, request):
+        self.stats["requests"] += 1
+
+    def _on_response(self, response):
+        # content-length is the cheap, header-only approximation of transfer size
+        try:
+            self.stats["bytes_received"] += int(response.headers.get("content-length", 0))
+        except ValueError:
+            pass
+
+    def should_block(self, resource_type, url):
+        return resource_type in self.resource_types or bool(self._pattern and self._pattern.search(url))
+
+    async def _handle_route(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.stats["blocked_requests"] += 1
+            by_type = self.stats["blocked_by_type"]
+            by_type[request.resource_type] = by_type.get(request.resource_type, 0) + 1
+            await route.abort("blockedbyclient")
+        else:
+            # Let any other route handler (or the network) deal with it
+            await route.fallback()
+
+
+def _string_list(spec, key):
+    value = spec.get(key, [])
+    if not isinstance(value, list) or not all(isinstance(item, str) and item for item in value):
+        raise ValueError(f"network_profile '{key}' must be a list of non-empty strings")
+    return value
+
+
+def resolve_profile(spec=None):
+    """
+    Builds a NetworkProfile from a profile name ("full", "trackers", "lean") or
+    a dict {"resource_types": [...], "url_patterns": [...], "extends": "lean"}.
+    Raises ValueError for unknown profiles and malformed dicts.
+    """
+    if spec is None:
+        spec = DEFAULT_PROFILE
+
+    if isinstance(spec, str):
+        if spec not in PROFILES:
+            raise ValueError(f"Unknown network profile '{spec}'. Expected one of {list(PROFILES)}")
+        return NetworkProfile(spec, **PROFILES[spec])
+
+    if isinstance(spec, dict):
+        base = spec.get("extends", "full")
+        if not isinstance(base, str) or base not in PROFILES:
+            raise ValueError(f"Unknown network profile '{base}'. Expected one of {list(PROFILES)}")
+        resource_types = list(PROFILES[base]["resource_types"]) + _string_list(spec, "resource_types")
+        url_patterns = list(PROFILES[base]["url_patterns"]) + _string_list(spec, "url_patterns")
+        return NetworkProfile(f"custom:{base}", resource_types, url_patterns)
+
+    raise ValueError("network_profile must be a profile name or an object")
@@ -0,0 +1,140 @@
+import threading
+import hashlib
+import json
+import time
+import os
+
+import database
+from utils.verify import MODES as VERIFY_MODES
+
+# Parsed step lists are reused until TTL; the table is capped at MAX_ENTRIES (LRU)
+CACHE_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2000"))
+CACHE_ENABLED = os.environ.get("LLM_CACHE", "1").lower() not in ("0", "false", "no")
+
+# The actions the LLM prompt allows, and the fields each one needs
+STEP_ACTIONS = {
+    "open": ("value",),
+    "click": ("value",),
+    "type": ("value", "target"),
+    "search": ("value",),
+    "verify": ("value",),
+    "wait": ("value",),
+    "scroll": ("value",),
+    "hover": ("value",),
+    "select": ("value", "target"),
+    "play": ("value",),
+}
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "rejected": 0, "evictions": 0}
+
+
+def normalize_instruction(instruction):
+    # Whitespace only: case is kept because typed text and search queries come from the instruction
+    return " ".join((instruction or "").split())
+
+
+def cache_key(instruction, model, prompt_version):
+    raw = f"{model}\n{prompt_version}\n{normalize_instruction(instruction)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def validate_steps(steps):
+    """Raises ValueError unless 'steps' is a non-empty list of well-formed parser steps."""
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("expected a non-empty list of steps")
+    for i, step in enumerate(steps, start=1):
+        if not isinstance(step, dict):
+            raise ValueError(f"step {i} is not an object")
+        action = step.get("action")
+        if action not in STEP_ACTIONS:
+            raise ValueError(f"step {i} has unknown action '{action}'")
+        for field in STEP_ACTIONS[action]:
+            value = step.get(field)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                raise ValueError(f"step {i} ({action}) is missing '{field}'")
+        if action == "wait" and not str(step["value"]).strip().isdigit():
+            raise ValueError(f"step {i} (wait) needs a number of seconds")
+        if action == "scroll" and step["value"] not in ("up", "down"):
+            raise ValueError(f"step {i} (scroll) must be 'up' or 'down'")
+        if action == "verify" and (step.get("mode") or "contains") not in VERIFY_MODES:
+            raise ValueError(f"step {i} (verify) has unknown mode '{step['mode']}'")
+
+
+def _count(name, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+def lookup(instruction, model, prompt_version):
+    """Returns the cached step list for this instruction/model/prompt, or None."""
+    if not CACHE_ENABLED:
+        return None
+    key = cache_key(instruction, model, prompt_version)
+    try:
+        entry = database.get_cached_parse(key)
+    except Exception:
+        return None
+
+    if entry and time.time() - entry["created_at"] > CACHE_TTL_SECONDS:
+        try:
+            database.delete_cached_parse(key)
+            _count("evictions")
+        except Exception as e:
+            print(f"⚠️ LLM parse cache write failed: {e}")
+        entry = None
+
+    if not entry:
+        _count("misses")
+        return None
+
+    try:
+        database.touch_cached_parse(key, time.time())
+    except Exception as e:
+        print(f"⚠️ LLM parse cache write failed: {e}")
+    _count("hits")
+    return json.loads(entry["steps_json"])
+
+
+def record_bypass():
+    _count("bypassed")
+
+
+def store(instruction, model, prompt_version, steps):
+    """Caches an LLM result, unless it doesn't match the step schema."""
+    if not CACHE_ENABLED:
+        return
+    try:
+        validate_steps(steps)
+    except ValueError as e:
+        _count("rejected")
+        print(f"⚠️ Not caching LLM parse: {e}")
+        return
+    key = cache_key(instruction, model, prompt_version)
+    try:
+        now = time.time()
+        database.save_cached_parse(key, model, prompt_version, json.dumps(steps), now)
+        _count("stores")
+        removed = database.prune_parse_cache(CACHE_MAX_ENTRIES, now - CACHE_TTL_SECONDS)
+        if removed:
+            _count("evictions", removed)
+    except Exception as e:
+        print(f"⚠️ LLM parse cache write failed: {e}")
+
+
+def clear():
+    return database.clear_parse_cache()
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = round(result["hits"] / lookups, 3) if lookups else 0
+    result["enabled"] = CACHE_ENABLED
+    try:
+        result["entries"] = database.count_cached_parses()
+    except Exception:
+        result["entries"] = None
+    return result
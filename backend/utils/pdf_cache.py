@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import json
+import time
+import os
+
+import database
+from utils import retention
+from agent.reporter import generate_pdf_report
+
+# Reports with more steps than this render in the background (the request gets 202 and polls)
+PDF_BACKGROUND_STEPS = int(os.environ.get("PDF_BACKGROUND_STEPS", "20"))
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "1"))
+# A failed render is reported to every request for this long before it is tried again
+PDF_FAILURE_TTL = int(os.environ.get("PDF_FAILURE_TTL", "300"))
+
+_executor = None
+_inflight = {}
+_failures = {} # run_id -> (failed_at, error message)
+_lock = threading.Lock()
+_stats = {"cache_hits": 0, "rendered": 0, "background_renders": 0, "failures": 0}
+
+
+class PdfRenderError(Exception):
+    """The run's PDF could not be rendered (raised by request_pdf)."""
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, PDF_WORKERS), thread_name_prefix="pdf-render")
+        return _executor
+
+
+def load_report(run_id):
+    """The stored JSON report of a run, or None."""
+    path = os.path.join(retention.run_dir(run_id), "report.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    report_json = database.get_report_json_by_run_id(run_id)
+    return json.loads(report_json) if report_json else None
+
+
+def _render(run_id, report):
+    try:
+        generate_pdf_report(report)
+        with _lock:
+            _stats["rendered"] += 1
+    except Exception as e:
+        with _lock:
+            _stats["failures"] += 1
+            now = time.monotonic()
+            for expired in [r for r, (failed_at, _) in _failures.items() if now - failed_at > PDF_FAILURE_TTL]:
+                del _failures[expired]
+            _failures[run_id] = (now, str(e))
+        print(f"❌ PDF rendering failed for run {run_id}: {e}")
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(run_id, None)
+
+
+def request_pdf(run_id):
+    """
+    Returns (status, path) for a run's PDF report, rendering it on first request:
+    ("ready", path), ("rendering", None) while a large report renders in the background,
+    or ("missing", None) if the run has no report. The PDF is cached in the run's directory.
+    Raises PdfRenderError if rendering failed (for PDF_FAILURE_TTL seconds after a failure).
+    """
+    pdf_path = os.path.join(retention.run_dir(run_id), "report.pdf")
+    if os.path.exists(pdf_path):
+        with _lock:
+            _stats["cache_hits"] += 1
+        return "ready", pdf_path
+
+    with _lock:
+        future = _inflight.get(run_id)
+        failure = _failures.get(run_id)
+        if failure and time.monotonic() - failure[0] > PDF_FAILURE_TTL:
+            del _failures[run_id]
+            failure = None
+    if failure:
+        raise PdfRenderError(failure[1])
+    if future is None:
+        report = load_report(run_id)
+        if report is None:
+            return "missing", None
+        report.setdefault("run_id", run_id)
+
+        background = len(report.get("steps", [])) > PDF_BACKGROUND_STEPS
+        executor = _get_executor()
+        with _lock:
+            # Another request may have started the same render meanwhile
+            future = _inflight.get(run_id)
+            if future is None:
+                future = executor.submit(_render, run_id, report)
+                _inflight[run_id] = future
+                if background:
+                    _stats["background_renders"] += 1
+        if background:
+            return "rendering", None
+    elif not future.done():
+        return "rendering", None
+
+    # Small reports: wait for the render so the caller gets the file right away
+    try:
+        future.result()
+    except Exception as e:
+        raise PdfRenderError(str(e)) from e
+    return "ready", pdf_path
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+        result["rendering"] = len(_inflight)
+        result["failed_runs"] = len(_failures)
+    result["background_threshold_steps"] = PDF_BACKGROUND_STEPS
+    return result
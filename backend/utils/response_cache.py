@@ -0,0 +1,178 @@
+from urllib.parse import urlparse
+import threading
+import hashlib
+import asyncio
+import json
+import time
+import os
+
+import database
+
+# Modes: "off" (default), "record" (network, then store) or "replay" (serve stored responses)
+CACHE_MODE = os.environ.get("RESPONSE_CACHE_MODE", "off")
+# What replay does on a miss: "network" (load it), "record" (load and store it) or "abort" (fully offline)
+MISS_POLICY = os.environ.get("RESPONSE_CACHE_MISS", "network")
+CACHE_DIR = os.environ.get(
+    "RESPONSE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "response_cache"),
+)
+CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_MB", "500")) * 1024 * 1024
+CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "20000"))
+
+MODES = ("off", "record", "replay")
+MISS_POLICIES = ("network", "record", "abort")
+
+# Replayed bodies are already decoded, so the original transfer headers no longer apply
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+_prune_lock = threading.Lock()
+
+
+def request_key(method, url):
+    return hashlib.sha256(f"{method.upper()} {url}".encode("utf-8")).hexdigest()
+
+
+def _body_path(body_hash):
+    # Content-addressed and sharded: identical bodies (shared JS/CSS) are stored once
+    return os.path.join(CACHE_DIR, body_hash[:2], body_hash)
+
+
+def _read_entry(key):
+    """Returns (entry, body) for a cached request, or (None, None)."""
+    entry = database.get_cached_response(key)
+    if not entry:
+        return None, None
+    try:
+        with open(_body_path(entry["body_hash"]), "rb") as f:
+            return entry, f.read()
+    except OSError:
+        # Body was evicted or deleted by hand: treat as a miss
+        return None, None
+
+
+def _write_entry(key, method, url, status, headers, body):
+    body_hash = hashlib.sha256(body).hexdigest()
+    path = _body_path(body_hash)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+    database.save_cached_response(key, method, url, status, headers, body_hash, len(body), time.time())
+
+
+def prune(max_bytes=CACHE_MAX_BYTES, max_entries=CACHE_MAX_ENTRIES):
+    """Evicts least recently used responses beyond the limits. Returns the number of bodies deleted."""
+    with _prune_lock:
+        orphaned = database.prune_response_cache(max_bytes, max_entries)
+        for body_hash in orphaned:
+            try:
+                os.remove(_body_path(body_hash))
+            except OSError:
+                pass
+    return len(orphaned)
+
+
+def validate_options(mode, miss_policy):
+    if mode not in MODES:
+        raise ValueError(f"Unknown response cache mode '{mode}'. Expected one of {list(MODES)}")
+    if miss_policy not in MISS_POLICIES:
+        raise ValueError(f"Unknown response cache miss policy '{miss_policy}'. Expected one of {list(MISS_POLICIES)}")
+
+
+class ResponseCache:
+    """
+    Records a run's HTTP(S) GET traffic into an on-disk cache and replays it
+    through context.route, so reruns are fast and can run fully offline.
+    """
+    def __init__(self, mode=None, miss_policy=None):
+        self.mode = mode or CACHE_MODE
+        self.miss_policy = miss_policy or MISS_POLICY
+        validate_options(self.mode, self.miss_policy)
+        self._hit_keys = set()
+        self.stats = {
+            "mode": self.mode,
+            "miss_policy": self.miss_policy if self.mode == "replay" else None,
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "bytes_served": 0,
+            "bytes_stored": 0,
+            "evicted": 0,
+        }
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    async def attach(self, context):
+        """Must be attached before other route handlers that should run first (they are called last-registered-first)."""
+        if self.enabled:
+            await context.route("**/*", self._handle_route)
+
+    def _cacheable(self, request):
+        return (
+            request.method == "GET"
+            and urlparse(request.url).scheme in ("http", "https")
+            and "range" not in request.headers
+        )
+
+    async def _handle_route(self, route):
+        request = route.request
+        if not self._cacheable(request):
+            await route.fallback()
+            return
+
+        key = request_key(request.method, request.url)
+        if self.mode == "replay":
+            entry, body = await asyncio.to_thread(_read_entry, key)
+            if entry:
+                self.stats["hits"] += 1
+                self.stats["bytes_served"] += len(body)
+                self._hit_keys.add(key)
+                await route.fulfill(status=entry["status"], headers=json.loads(entry["headers_json"]), body=body)
+                return
+            self.stats["misses"] += 1
+            if self.miss_policy == "abort":
+                await route.abort("internetdisconnected")
+                return
+            if self.miss_policy == "network":
+                await route.fallback()
+                return
+
+        # Record (or replay miss with policy "record"): fetch, store, then serve the same response
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            await route.fallback()
+            return
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS}
+        try:
+            await asyncio.to_thread(_write_entry, key, request.method, request.url, response.status, headers, body)
+            self.stats["stored"] += 1
+            self.stats["bytes_stored"] += len(body)
+        except Exception as e:
+            print(f"⚠️ Response cache write failed for {request.url}: {e}")
+        await route.fulfill(status=response.status, headers=headers, body=body)
+
+    async def finish(self):
+        """Records LRU usage of replayed entries and enforces the size limits."""
+        if self._hit_keys:
+            await asyncio.to_thread(database.touch_cached_responses, list(self._hit_keys), time.time())
+        if self.stats["stored"]:
+            self.stats["evicted"] = await asyncio.to_thread(prune)
+
+
+def stats():
+    entries, total_bytes = database.response_cache_usage()
+    return {
+        "mode": CACHE_MODE,
+        "miss_policy": MISS_POLICY,
+        "entries": entries,
+        "bytes": total_bytes,
+        "max_bytes": CACHE_MAX_BYTES,
+        "max_entries": CACHE_MAX_ENTRIES,
+        "dir": CACHE_DIR,
+    }
@@ -0,0 +1,240 @@
+import threading
+import shutil
+import time
+import os
+
+# Per-run artifacts live in REPORTS_DIR/runs/<run_id[:2]>/<run_id>/ so no directory grows unbounded
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports")
+RUNS_DIR = os.path.join(REPORTS_DIR, "runs")
+# Flat directory used before per-run directories; still swept by age
+LEGACY_SCREENSHOTS_DIR = os.path.join(REPORTS_DIR, "screenshots")
+
+# Limits enforced by the background sweeper (0 disables a limit)
+RETENTION_MAX_AGE_DAYS = float(os.environ.get("RETENTION_MAX_AGE_DAYS", "30"))
+RETENTION_MAX_MB = int(os.environ.get("RETENTION_MAX_MB", "2048"))
+RETENTION_MAX_RUNS = int(os.environ.get("RETENTION_MAX_RUNS", "500"))
+SWEEP_INTERVAL_SECONDS = int(os.environ.get("RETENTION_SWEEP_INTERVAL", "600"))
+
+# Present in the directory of a run that is still executing (holds the owner's pid)
+ACTIVE_MARKER = ".active"
+
+_lock = threading.Lock()
+_active_runs = set()
+_stats = {"sweeps": 0, "runs_deleted": 0, "bytes_deleted": 0, "last_sweep": None}
+_sweeper = None
+
+
+def run_dir(run_id, create=False):
+    """Directory holding the artifacts (screenshots, reports) of one run."""
+    if not run_id or not all(ch.isalnum() or ch in "-_" for ch in run_id):
+        raise ValueError(f"Invalid run id '{run_id}'")
+    path = os.path.join(RUNS_DIR, run_id[:2], run_id)
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _marker_path(run_id):
+    return os.path.join(run_dir(run_id), ACTIVE_MARKER)
+
+
+def mark_active(run_id):
+    """
+    Runs still executing are never swept. Besides the in-process set, a marker file
+    with the owner's pid goes in the run directory, so runs executing in other processes
+    (batch workers) are skipped too.
+    """
+    with _lock:
+        _active_runs.add(run_id)
+    try:
+        os.makedirs(run_dir(run_id), exist_ok=True)
+        with open(_marker_path(run_id), "w") as f:
+            f.write(str(os.getpid()))
+    except OSError as e:
+        print(f"⚠️ Could not mark run {run_id} active: {e}")
+
+
+def mark_finished(run_id):
+    with _lock:
+        _active_runs.discard(run_id)
+    try:
+        os.remove(_marker_path(run_id))
+    except OSError:
+        pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_active(run_id, path):
+    with _lock:
+        if run_id in _active_runs:
+            return True
+    # Marker left by another process: active while that process lives (a crashed run's marker is ignored)
+    try:
+        with open(os.path.join(path, ACTIVE_MARKER)) as f:
+            return _pid_alive(int(f.read().strip()))
+    except (OSError, ValueError):
+        return False
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove_dir(path):
+    size = _dir_size(path)
+    shutil.rmtree(path, ignore_errors=True)
+    # Drop the shard directory once it is empty
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+    return size
+
+
+def delete_run_artifacts(run_id):
+    """Deletes everything stored for one run. Returns the bytes freed."""
+    if not run_id:
+        return 0
+    path = run_dir(run_id)
+    if not os.path.isdir(path):
+        return 0
+    freed = _remove_dir(path)
+    with _lock:
+        _stats["runs_deleted"] += 1
+        _stats["bytes_deleted"] += freed
+    return freed
+
+
+def delete_all_artifacts():
+    """Deletes the artifacts of every finished run (and legacy screenshots). Returns the bytes freed."""
+    freed = 0
+    for run_id, path, _ in _list_runs():
+        if _is_active(run_id, path):
+            continue
+        freed += _remove_dir(path)
+    freed += _sweep_legacy(max_age_seconds=0)
+    with _lock:
+        _stats["bytes_deleted"] += freed
+    return freed
+
+
+def _list_runs():
+    """Returns [(run_id, path, mtime)] for every run directory, oldest first."""
+    runs = []
+    if not os.path.isdir(RUNS_DIR):
+        return runs
+    for shard in os.scandir(RUNS_DIR):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                if entry.is_dir():
+                    runs.append((entry.name, entry.path, entry.stat().st_mtime))
+            except FileNotFoundError:
+                continue # Deleted meanwhile
+    runs.sort(key=lambda r: r[2])
+    return runs
+
+
+def _sweep_legacy(max_age_seconds):
+    freed = 0
+    if not os.path.isdir(LEGACY_SCREENSHOTS_DIR):
+        return freed
+    cutoff = time.time() - max_age_seconds
+    for entry in os.scandir(LEGACY_SCREENSHOTS_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime <= cutoff:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                freed += size
+        except FileNotFoundError:
+            continue # Deleted meanwhile
+    return freed
+
+
+def sweep(max_age_days=RETENTION_MAX_AGE_DAYS, max_mb=RETENTION_MAX_MB, max_runs=RETENTION_MAX_RUNS):
+    """
+    Deletes the oldest run directories until all limits hold:
+    age (days), total size (MB) and number of runs. Active runs are skipped.
+    Returns {"runs_deleted", "bytes_deleted", "runs_kept", "bytes_kept"}.
+    """
+    runs = [(run_id, path, mtime, _dir_size(path)) for run_id, path, mtime in _list_runs() if not _is_active(run_id, path)]
+
+    total_bytes = sum(r[3] for r in runs)
+    cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+    deleted, freed = 0, 0
+    remaining = len(runs)
+    for run_id, path, mtime, size in runs:
+        expired = cutoff is not None and mtime < cutoff
+        over_bytes = max_mb and total_bytes > max_mb * 1024 * 1024
+        over_runs = max_runs and remaining > max_runs
+        if not (expired or over_bytes or over_runs):
+            break # Oldest first: everything after this is newer and within limits
+        freed += _remove_dir(path)
+        total_bytes -= size
+        remaining -= 1
+        deleted += 1
+
+    if max_age_days:
+        freed += _sweep_legacy(max_age_days * 86400)
+
+    with _lock:
+        _stats["sweeps"] += 1
+        _stats["runs_deleted"] += deleted
+        _stats["bytes_deleted"] += freed
+        _stats["last_sweep"] = time.time()
+    if deleted:
+        print(f"🧹 Retention sweep removed {deleted} run(s), {freed // 1024} KB")
+    return {"runs_deleted": deleted, "bytes_deleted": freed, "runs_kept": remaining, "bytes_kept": total_bytes}
+
+
+def _sweep_loop(stop_event):
+    # Sweep once at start-up, then every SWEEP_INTERVAL_SECONDS
+    while True:
+        try:
+            sweep()
+        except Exception as e:
+            print(f"⚠️ Retention sweep failed: {e}")
+        if stop_event.wait(SWEEP_INTERVAL_SECONDS):
+            return
+
+
+def start_sweeper():
+    """Starts the background sweeper thread (once per process). Returns its stop event."""
+    global _sweeper
+    with _lock:
+        if _sweeper is None:
+            stop_event = threading.Event()
+            thread = threading.Thread(target=_sweep_loop, args=(stop_event,), name="retention-sweeper", daemon=True)
+            thread.start()
+            _sweeper = (thread, stop_event)
+        return _sweeper[1]
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+        result["active_runs"] = len(_active_runs)
+    result["limits"] = {
+        "max_age_days": RETENTION_MAX_AGE_DAYS,
+        "max_mb": RETENTION_MAX_MB,
+        "max_runs": RETENTION_MAX_RUNS,
+        "sweep_interval_s": SWEEP_INTERVAL_SECONDS,
+    }
+    return result
@@ -0,0 +1,156 @@
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import random
+import time
+import os
+
+# Backoff between attempts: exponential from RETRY_BASE_MS, capped at RETRY_CAP_MS, with
+# "equal jitter" (half fixed, half random) so concurrent runs don't retry in lockstep
+RETRY_BASE_MS = int(os.environ.get("RETRY_BASE_MS", "250"))
+RETRY_CAP_MS = int(os.environ.get("RETRY_CAP_MS", "4000"))
+# Scales every step deadline, e.g. 2 on slow CI machines
+STEP_DEADLINE_SCALE = float(os.environ.get("STEP_DEADLINE_SCALE", "1"))
+# Hard limit on attempts per step, whatever the budgets allow
+MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", "5"))
+
+# Retries allowed per error class within one step, and how to wait before the next attempt:
+# "settle" waits for the page to go quiet (at most the backoff), "sleep" waits the full backoff.
+ERROR_CLASSES = {
+    "cancelled": {"retries": 0},
+    "fatal": {"retries": 0},            # page, context or browser closed or crashed
+    "invalid": {"retries": 0},          # the step itself is wrong: bad regex or selector
+    "navigation": {"retries": 2, "wait": "sleep"},      # net::ERR_*, DNS, connection resets
+    "timeout": {"retries": 2, "wait": "settle"},
+    "element_state": {"retries": 3, "wait": "settle"},  # detached, hidden, covered or moving element
+    "not_found": {"retries": 1, "wait": "settle"},      # locate() already ran every strategy and healing
+    "other": {"retries": 1, "wait": "settle"},
+}
+
+# Total time per step (seconds, None = unbounded) and per-action budget overrides.
+# Each attempt is cut off at the deadline, and no retry starts that would end its backoff past it.
+DEFAULT_POLICY = {"deadline_s": 20}
+ACTION_POLICIES = {
+    "goto": {"deadline_s": 60},
+    "click": {"deadline_s": 20},
+    "type": {"deadline_s": 20},
+    "hover": {"deadline_s": 15},
+    "select": {"deadline_s": 20, "retries": {"not_found": 2}}, # Custom dropdowns render options late
+    "search": {"deadline_s": 30},
+    "play": {"deadline_s": 30, "retries": {"not_found": 2}},   # Result lists load lazily
+    "scroll": {"deadline_s": 10},
+    "wait": {"deadline_s": None, "retries": {"timeout": 0, "element_state": 0, "not_found": 0, "other": 0}},
+    "verify": {"deadline_s": 15},
+}
+
+_FATAL = ("target closed", "has been closed", "browser has disconnected", "crashed")
+_NAVIGATION = ("net::err_", "ns_error_", "navigation failed", "navigation interrupted")
+_ELEMENT_STATE = ("not attached", "detached", "not visible", "not stable", "intercepts pointer events",
+                  "not enabled", "outside of the viewport", "execution context was destroyed")
+_INVALID = ("is not a valid selector", "unexpected token", "unknown step type", "invalid url",
+            "invalid regex", "unknown verify mode")
+# Also not found yet, e.g. a VERIFY container that is still rendering
+_NOT_FOUND = ("could not find", "container '")
+
+
+def classify(error):
+    """Error class (a key of ERROR_CLASSES) of an exception raised by a step attempt."""
+    message = str(error).lower()
+    if message == "run cancelled":
+        return "cancelled"
+    if any(s in message for s in _FATAL):
+        return "fatal"
+    if any(s in message for s in _INVALID):
+        return "invalid"
+    if any(s in message for s in _NAVIGATION):
+        return "navigation"
+    if isinstance(error, PlaywrightTimeoutError) or "timeout" in message:
+        return "timeout"
+    if any(s in message for s in _ELEMENT_STATE):
+        return "element_state"
+    if message.startswith(_NOT_FOUND):
+        return "not_found"
+    return "other"
+
+
+def backoff_seconds(retry_no):
+    """Delay before retry number retry_no (0-based)."""
+    ceiling = min(RETRY_CAP_MS, RETRY_BASE_MS * 2 ** retry_no) / 1000
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class StepRetry:
+    """
+    Retry decisions for one step. Call begin_attempt() before each attempt (and
+    bound it by remaining()) and next_retry(error) after a failed one: it returns
+    (delay_s, wait_kind) to try again, or None to give up (the reason is in gave_up).
+    """
+    def __init__(self, action):
+        policy = ACTION_POLICIES.get(action, DEFAULT_POLICY)
+        self.budgets = {name: spec["retries"] for name, spec in ERROR_CLASSES.items()}
+        self.budgets.update(policy.get("retries", {}))
+        deadline_s = policy.get("deadline_s", DEFAULT_POLICY["deadline_s"])
+        self.deadline_s = deadline_s * STEP_DEADLINE_SCALE if deadline_s else None
+        self.started = time.monotonic()
+        self.deadline = self.started + self.deadline_s if deadline_s else None
+        self.attempts = 0
+        self.retries = 0
+        self.errors = {}
+        self.last_class = None
+        self.gave_up = None
+        self.backoff_s = 0.0
+
+    def begin_attempt(self):
+        self.attempts += 1
+        return self.attempts
+
+    def remaining(self):
+        """Seconds left before the step's deadline (None if it has none), to bound an attempt."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def next_retry(self, error):
+        name = self.last_class = classify(error)
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+        if self.budgets.get(name, 0) == 0:
+            self.gave_up = "not_retryable"
+        elif self.errors[name] > self.budgets[name]:
+            self.gave_up = "budget"
+        elif self.attempts >= MAX_ATTEMPTS:
+            self.gave_up = "max_attempts"
+        if self.gave_up:
+            return None
+
+        delay = backoff_seconds(self.retries)
+        if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+            self.gave_up = "deadline"
+            return None
+        self.retries += 1
+        self.backoff_s += delay
+        return delay, ERROR_CLASSES[name]["wait"]
+
+    def stats(self):
+        """The step's "retry" entry in the report."""
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "errors": dict(self.errors),
+            "gave_up": self.gave_up,
+            "backoff_ms": round(self.backoff_s * 1000, 1),
+            "elapsed_ms": round((time.monotonic() - self.started) * 1000, 1),
+        }
+
+
+def summarize(step_stats):
+    """Run-level retry totals from the steps' stats, for tuning the budgets."""
+    summary = {"attempts": 0, "retries": 0, "retried_steps": 0, "errors": {}, "gave_up": {}}
+    for s in step_stats:
+        summary["attempts"] += s["attempts"]
+        summary["retries"] += s["retries"]
+        if s["retries"]:
+            summary["retried_steps"] += 1
+        for name, n in s["errors"].items():
+            summary["errors"][name] = summary["errors"].get(name, 0) + n
+        if s["gave_up"]:
+            summary["gave_up"][s["gave_up"]] = summary["gave_up"].get(s["gave_up"], 0) + 1
+    return summary
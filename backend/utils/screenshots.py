@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, features
+import threading
+import hashlib
+import asyncio
+import time
+import io
+import os
+
+# Which steps get a screenshot: "all", "failure" (FAIL steps only) or "sampled"
+# (every FAIL step plus every SCREENSHOT_SAMPLE_EVERY-th PASS step)
+SCREENSHOT_POLICY = os.environ.get("SCREENSHOT_POLICY", "all")
+SAMPLE_EVERY = max(1, int(os.environ.get("SCREENSHOT_SAMPLE_EVERY", "3")))
+# Encoding happens off the event loop; "webp" falls back to "jpeg" if Pillow lacks WebP
+SCREENSHOT_FORMAT = os.environ.get("SCREENSHOT_FORMAT", "webp").lower()
+SCREENSHOT_QUALITY = int(os.environ.get("SCREENSHOT_QUALITY", "75"))
+# Downscale wider screenshots to this width (0 keeps the viewport size)
+SCREENSHOT_MAX_WIDTH = int(os.environ.get("SCREENSHOT_MAX_WIDTH", "0"))
+SCREENSHOT_WORKERS = int(os.environ.get("SCREENSHOT_WORKERS", "2"))
+
+POLICIES = ("all", "failure", "sampled")
+
+_EXTENSIONS = {"webp": "webp", "jpeg": "jpg", "png": "png"}
+if SCREENSHOT_FORMAT not in _EXTENSIONS or (SCREENSHOT_FORMAT == "webp" and not features.check("webp")):
+    SCREENSHOT_FORMAT = "jpeg"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Process-wide encoder threads shared by all runs (Pillow releases the GIL while encoding)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, SCREENSHOT_WORKERS), thread_name_prefix="screenshot-encoder")
+        return _pool
+
+
+def _encode(png_bytes, path, fmt, quality, max_width):
+    """Decodes the captured PNG, optionally downscales it and writes it in the target format. Returns bytes written."""
+    img = Image.open(io.BytesIO(png_bytes))
+    if max_width and img.width > max_width:
+        img = img.resize((max_width, round(img.height * max_width / img.width)), Image.LANCZOS)
+    if fmt == "jpeg":
+        img = img.convert("RGB")
+
+    buf = io.BytesIO()
+    if fmt == "png":
+        img.save(buf, "PNG", optimize=True)
+    elif fmt == "webp":
+        img.save(buf, "WEBP", quality=quality, method=4)
+    else:
+        img.save(buf, "JPEG", quality=quality, optimize=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buf.getvalue())
+    os.replace(tmp_path, path)
+    return buf.tell()
+
+
+def validate_policy(policy):
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown screenshot policy '{policy}'. Expected one of {list(POLICIES)}")
+
+
+class ScreenshotRecorder:
+    """
+    Captures screenshots into memory and hands them to background encoder threads,
+    so steps don't wait for compression or disk writes. Identical frames (same
+    content hash) within a run are written once and share a filename.
+    on_ready(step_no, filename) is called (from an encoder thread) once a step's file exists.
+    """
+    def __init__(self, directory, policy=None, on_ready=None):
+        self.directory = directory
+        self.policy = policy or SCREENSHOT_POLICY
+        validate_policy(self.policy)
+        self.format = SCREENSHOT_FORMAT
+        self.on_ready = on_ready
+        self._seen = {}
+        self._pending = []
+        self._pass_steps = 0
+        self.stats = {
+            "policy": self.policy,
+            "format": self.format,
+            "captured": 0,
+            "skipped": 0,
+            "deduplicated": 0,
+            "capture_ms": 0.0,
+            "bytes_written": 0,
+        }
+
+    def wanted(self, status):
+        if status == "FAIL" or self.policy == "all":
+            return True
+        if self.policy == "sampled":
+            self._pass_steps += 1
+            return (self._pass_steps - 1) % SAMPLE_EVERY == 0
+        return False
+
+    async def capture(self, page, step_no, status):
+        """Returns the filename the screenshot will be written to, or None if the policy skips it."""
+        if not self.wanted(status):
+            self.stats["skipped"] += 1
+            return None
+
+        started = time.monotonic()
+        png_bytes = await page.screenshot(type="png")
+        self.stats["capture_ms"] = round(self.stats["capture_ms"] + (time.monotonic() - started) * 1000, 1)
+        self.stats["captured"] += 1
+
+        digest = hashlib.sha1(png_bytes).hexdigest()
+        if digest in self._seen:
+            self.stats["deduplicated"] += 1
+            filename, future = self._seen[digest]
+            self._notify_when_written(future, step_no, filename)
+            return filename
+
+        filename = f"step_{step_no}_{status}_{int(time.time())}_{digest[:8]}.{_EXTENSIONS[self.format]}"
+        future = _get_pool().submit(_encode, png_bytes, os.path.join(self.directory, filename),
+                                    self.format, SCREENSHOT_QUALITY, SCREENSHOT_MAX_WIDTH)
+        self._seen[digest] = (filename, future)
+        self._pending.append(future)
+        self._notify_when_written(future, step_no, filename)
+        return filename
+
+    def _notify_when_written(self, future, step_no, filename):
+        if self.on_ready is None:
+            return
+        def done(f):
+            if not f.cancelled() and f.exception() is None:
+                self.on_ready(step_no, filename)
+        future.add_done_callback(done)
+
+    async def flush(self):
+        """Waits for all pending writes of this run. Returns the run's screenshot stats."""
+        for future in self._pending:
+            try:
+                self.stats["bytes_written"] += await asyncio.wrap_future(future)
+            except Exception as e:
+                print(f"⚠️ Screenshot write failed: {e}")
+        self._pending = []
+        return self.stats
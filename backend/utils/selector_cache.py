@@ -0,0 +1,129 @@
+from urllib.parse import urlparse
+import threading
+import time
+import re
+import os
+
+import database
+
+# Entries older than TTL are re-learned; the table is capped at MAX_ENTRIES (LRU)
+CACHE_TTL_SECONDS = int(os.environ.get("SELECTOR_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("SELECTOR_CACHE_MAX_ENTRIES", "5000"))
+CACHE_ENABLED = os.environ.get("SELECTOR_CACHE", "1").lower() not in ("0", "false", "no")
+
+# Path segments that vary between pages of the same kind (/item/123, /u/3f9a0c1e...)
+_NUMERIC_SEGMENT = re.compile(r"^\d+$")
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[0-9a-f-]{8,}$", re.IGNORECASE)
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "evictions": 0}
+
+
+def cache_key(url, target, action):
+    """
+    Builds the (host, path_pattern, target, action) key for a page URL.
+    Numeric and id-like path segments are collapsed so /item/1 and /item/2 share entries.
+    """
+    parsed = urlparse(url or "")
+    segments = []
+    for seg in parsed.path.split("/"):
+        if _NUMERIC_SEGMENT.match(seg):
+            segments.append(":num")
+        elif _ID_SEGMENT.match(seg):
+            segments.append(":id")
+        else:
+            segments.append(seg.lower())
+    path_pattern = "/".join(segments).rstrip("/") or "/"
+    return (parsed.netloc.lower(), path_pattern, target.strip().lower(), action)
+
+
+def _count(name, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+def lookup(url, target, action):
+    """
+    Returns the learned selector for this page/target/action, or None.
+    Only misses are counted here: call record_hit() once the selector validated, or invalidate().
+    """
+    if not CACHE_ENABLED:
+        return None
+    key = cache_key(url, target, action)
+    try:
+        entry = database.get_cached_selector(*key)
+    except Exception:
+        return None
+
+    if entry and time.time() - entry["created_at"] > CACHE_TTL_SECONDS:
+        try:
+            database.delete_cached_selector(*key)
+            _count("evictions")
+        except Exception as e:
+            print(f"⚠️ Selector cache write failed: {e}")
+        entry = None
+
+    if not entry:
+        _count("misses")
+        return None
+    return entry["selector"]
+
+
+def record_hit(url, target, action):
+    """Counts a cached selector that still matched and refreshes its LRU position."""
+    _count("hits")
+    try:
+        database.touch_cached_selector(*cache_key(url, target, action), time.time())
+    except Exception as e:
+        print(f"⚠️ Selector cache write failed: {e}")
+
+
+async def validate(page, selector):
+    """
+    Checks that a cached selector still points at a visible element.
+    Returns a locator for it, or None if the selector stopped matching.
+    """
+    try:
+        loc = page.locator(f"{selector} >> visible=true").first
+        if await loc.count() > 0:
+            return loc
+    except Exception:
+        pass
+    return None
+
+
+def store(url, target, action, selector):
+    """Records the selector that actually worked for this target."""
+    if not CACHE_ENABLED or not selector:
+        return
+    key = cache_key(url, target, action)
+    try:
+        now = time.time()
+        database.save_cached_selector(*key, selector, now)
+        _count("stores")
+        removed = database.prune_selector_cache(CACHE_MAX_ENTRIES, now - CACHE_TTL_SECONDS)
+        if removed:
+            _count("evictions", removed)
+    except Exception as e:
+        print(f"⚠️ Selector cache write failed: {e}")
+
+
+def invalidate(url, target, action):
+    """Drops a cached selector that stopped matching. Counts as a failed lookup in hit_rate."""
+    _count("invalidations")
+    try:
+        database.delete_cached_selector(*cache_key(url, target, action))
+    except Exception as e:
+        print(f"⚠️ Selector cache write failed: {e}")
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+    lookups = result["hits"] + result["misses"] + result["invalidations"]
+    result["hit_rate"] = round(result["hits"] / lookups, 3) if lookups else 0
+    try:
+        result["entries"] = database.count_cached_selectors()
+    except Exception:
+        result["entries"] = None
+    return result
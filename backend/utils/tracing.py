@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+import os
+
+try:
+    from playwright._impl._connection import Connection
+except ImportError: # Private module: may move in a Playwright upgrade
+    Connection = None
+
+# Structured spans (step, attempt, locate, heal, wait, screenshot, navigation) stored in the report
+TRACING_ENABLED = os.environ.get("TRACING", "1").lower() not in ("0", "false", "no")
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "5000"))
+
+# The tracer of the run executing in the current task (runs share one event loop)
+_current_tracer = ContextVar("current_tracer", default=None)
+_current_span = ContextVar("current_span", default=None)
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _install_ipc_counter():
+    """
+    Counts Playwright protocol messages per run: every call that crosses the pipe to
+    the browser goes through Connection._send_message_to_server in the caller's task.
+    Without that private hook (renamed in another Playwright version) nothing is counted.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+        if not hasattr(Connection, "_send_message_to_server"):
+            print("⚠️ Playwright IPC counting unavailable in this version: traces will show 0 IPC calls")
+            return
+        original = Connection._send_message_to_server
+
+        def counting_send(self, *args, **kwargs):
+            tracer = _current_tracer.get()
+            if tracer is not None:
+                tracer.ipc_calls += 1
+            return original(self, *args, **kwargs)
+
+        Connection._send_message_to_server = counting_send
+
+
+class Tracer:
+    """
+    Records nested spans for one run. Each span has a monotonic start/duration
+    (ms since the run started) and the number of Playwright IPC messages sent
+    while it was open. Activate it in the run's task with activate().
+    """
+    def __init__(self, enabled=None):
+        self.enabled = TRACING_ENABLED if enabled is None else enabled
+        self.ipc_calls = 0
+        self.spans = []
+        self.dropped = 0
+        self._origin = time.monotonic()
+        if self.enabled:
+            _install_ipc_counter()
+
+    def activate(self):
+        _current_tracer.set(self)
+
+    def start(self, name, **attrs):
+        """Opens a span; close it with end(). Returns None when tracing is off."""
+        if not self.enabled:
+            return None
+        parent = _current_span.get()
+        span = {
+            "id": len(self.spans) + self.dropped + 1,
+            "parent": parent["id"] if parent else None,
+            "name": name,
+            "start_ms": round((time.monotonic() - self._origin) * 1000, 3),
+            "dur_ms": None,
+            "ipc": self.ipc_calls, # IPC count at start; replaced by the delta in end()
+        }
+        if attrs:
+            span["attrs"] = attrs
+        span["_token"] = _current_span.set(span)
+        if len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+        return span
+
+    def end(self, span, **attrs):
+        """Closes a span (again is a no-op); attrs are added to it, e.g. error=..."""
+        if span is None or span["dur_ms"] is not None:
+            return
+        span["dur_ms"] = round((time.monotonic() - self._origin) * 1000 - span["start_ms"], 3)
+        span["ipc"] = self.ipc_calls - span["ipc"]
+        if attrs:
+            span.setdefault("attrs", {}).update(attrs)
+        token = span.pop("_token")
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Ended from another context (e.g. out of order); the parent is restored by its own end()
+            _current_span.set(None)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = self.start(name, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            self.end(span, error=str(e) or type(e).__name__)
+            raise
+        else:
+            self.end(span)
+
+    def summary(self):
+        """Totals per span name: {"name": {"count", "total_ms", "max_ms", "ipc"}}."""
+        totals = {}
+        for span in self.spans:
+            if span["dur_ms"] is None:
+                continue
+            t = totals.setdefault(span["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "ipc": 0})
+            t["count"] += 1
+            t["total_ms"] = round(t["total_ms"] + span["dur_ms"], 3)
+            t["max_ms"] = max(t["max_ms"], span["dur_ms"])
+            t["ipc"] += span["ipc"]
+        return totals
+
+    def export(self):
+        """The "trace" section of the report."""
+        for span in self.spans:
+            if span["dur_ms"] is None: # Left open by an early return: close at export time
+                self.end(span, unfinished=True)
+        return {
+            "spans": self.spans,
+            "summary": self.summary(),
+            "ipc_calls": self.ipc_calls,
+            "dropped_spans": self.dropped,
+        }
+
+
+def current_tracer():
+    return _current_tracer.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """Span on the current run's tracer; a no-op outside a traced run."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, **attrs) as s:
+        yield s
+
+
+def chrome_trace(trace, name="run"):
+    """Converts a report's "trace" section into Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+    events = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": name}}]
+    for span in trace.get("spans", []):
+        args = dict(span.get("attrs") or {})
+        args["ipc"] = span["ipc"]
+        events.append({
+            "name": span["name"],
+            "cat": span["name"].split(".")[0],
+            "ph": "X",
+            "ts": round(span["start_ms"] * 1000),
+            "dur": round((span["dur_ms"] or 0) * 1000),
+            "pid": 1,
+            "tid": 1,
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -0,0 +1,98 @@
+from playwright.async_api import Page
+import time
+
+# "contains": case-insensitive substring (default), "exact": case-sensitive substring,
+# "regex": JavaScript regular expression, case-insensitive
+MODES = ("contains", "exact", "regex")
+
+# Searches the page's text in place and stops at the first match, so only a small
+# result object crosses the Playwright pipe instead of the serialized DOM.
+# Text nodes are walked in document order; a tail of the previous text is kept so
+# matches spanning several nodes ("Hello <b>World</b>") are still found.
+_VERIFY_JS = """
+([needle, mode, visibleOnly, container]) => {
+    const root = container ? document.querySelector(container) : (document.body || document.documentElement);
+    if (!root) return { found: false, error: `Container '${container}' not found`, nodes: 0, chars: 0 };
+
+    const norm = (s) => s.replace(/\\s+/g, " ");
+    let test, keep;
+    if (mode === "regex") {
+        let re;
+        try { re = new RegExp(needle, "i"); }
+        catch (e) { return { found: false, error: `Invalid regex: ${e.message}`, nodes: 0, chars: 0 }; }
+        test = (s) => { const m = re.exec(s); return m ? m[0] : null; };
+        keep = 1024;
+    } else if (mode === "exact") {
+        const n = norm(needle);
+        test = (s) => s.includes(n) ? n : null;
+        keep = Math.max(n.length, 1);
+    } else {
+        const n = norm(needle).toLowerCase();
+        test = (s) => s.toLowerCase().includes(n) ? n : null;
+        keep = Math.max(n.length, 1);
+    }
+
+    // Like page.title() before: the title counts as page text
+    if (!container) {
+        const m = test(norm(document.title || ""));
+        if (m !== null) return { found: true, match: m, where: "title", nodes: 0, chars: 0 };
+    }
+
+    const SKIP = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE"]);
+    const visibility = new Map();
+    const isVisible = (el) => {
+        let v = visibility.get(el);
+        if (v === undefined) {
+            if (el.checkVisibility) {
+                v = el.checkVisibility({ visibilityProperty: true, opacityProperty: true });
+            } else {
+                const style = getComputedStyle(el);
+                v = style.display !== "none" && style.visibility !== "hidden" && el.getClientRects().length > 0;
+            }
+            visibility.set(el, v);
+        }
+        return v;
+    };
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT, {
+        acceptNode(node) {
+            const parent = node.parentElement;
+            if (parent && SKIP.has(parent.tagName)) return NodeFilter.FILTER_REJECT;
+            if (visibleOnly && parent && !isVisible(parent)) return NodeFilter.FILTER_REJECT;
+            return NodeFilter.FILTER_ACCEPT;
+        }
+    });
+
+    let tail = "", nodes = 0, chars = 0;
+    while (walker.nextNode()) {
+        const text = walker.currentNode.nodeValue;
+        nodes++;
+        chars += text.length;
+        const window = norm(tail + text);
+        const m = test(window);
+        if (m !== null) return { found: true, match: m.slice(0, 200), where: "text", nodes, chars };
+        tail = window.slice(-keep);
+    }
+    return { found: false, nodes, chars };
+}
+"""
+
+
+def validate_mode(mode):
+    if mode not in MODES:
+        raise ValueError(f"Unknown verify mode '{mode}'. Expected one of {list(MODES)}")
+
+
+async def verify_text(page: Page, text, mode="contains", visible_only=False, container=None):
+    """
+    Looks for 'text' in the page (or in the element matching the CSS selector 'container').
+    Returns {"found", "match", "where", "nodes", "chars", "elapsed_ms"}; "nodes"/"chars"
+    count the text scanned before the search stopped. Raises ValueError for a bad
+    mode, an invalid regex or a missing container.
+    """
+    validate_mode(mode)
+    started = time.monotonic()
+    result = await page.evaluate(_VERIFY_JS, [str(text), mode, bool(visible_only), container])
+    if result.get("error"):
+        raise ValueError(result["error"])
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
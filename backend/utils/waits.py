@@ -0,0 +1,157 @@
+from playwright.async_api import Page, TimeoutError
+import asyncio
+import time
+
+from utils.tracing import span
+
+# Fixed sleeps the executor used before condition-based waits, by (step type, wait) that
+# replaced them; used to report the time saved. Waits with no entry (e.g. the settle
+# between retries, which replaced a backoff and not a sleep) add nothing to the baseline.
+LEGACY_SLEEP_MS = {
+    ("hover", "dom_quiet"): 2000,
+    ("search", "settle"): 2000,
+    ("scroll", "dom_quiet"): 1000,
+    ("select", "dom_quiet"): 1000,
+    ("play", "stable"): 500,
+    ("play", "settle"): 3000,
+}
+
+# Resolves true once the DOM has had no mutations for quietMs, false on timeout
+_DOM_QUIET_JS = """
+([quietMs, timeoutMs]) => new Promise((resolve) => {
+    const start = performance.now();
+    let last = start;
+    const observer = new MutationObserver(() => { last = performance.now(); });
+    observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+    const tick = () => {
+        const now = performance.now();
+        if (now - last >= quietMs) { observer.disconnect(); resolve(true); }
+        else if (now - start >= timeoutMs) { observer.disconnect(); resolve(false); }
+        else setTimeout(tick, Math.min(50, quietMs));
+    };
+    setTimeout(tick, Math.min(50, quietMs));
+})
+"""
+
+
+class WaitEngine:
+    """
+    Condition-based waits for a page, each bounded by a timeout:
+    DOM mutation quiescence, network idle (in-flight request counter),
+    element stability and URL change.
+
+    Every wait is recorded against the step type it was made for, so the
+    report can show the time actually waited versus the old fixed sleeps.
+    """
+    def __init__(self, page: Page):
+        self.page = page
+        self._inflight = 0
+        self._last_network_activity = time.monotonic()
+        self._step = {"waited_ms": 0.0, "legacy_ms": 0.0}
+
+        page.on("request", self._on_request_start)
+        page.on("requestfinished", self._on_request_end)
+        page.on("requestfailed", self._on_request_end)
+
+    def _on_request_start(self, request):
+        self._inflight += 1
+        self._last_network_activity = time.monotonic()
+
+    def _on_request_end(self, request):
+        self._inflight = max(0, self._inflight - 1)
+        self._last_network_activity = time.monotonic()
+
+    # ---------------- BOOKKEEPING ----------------
+    def begin_step(self):
+        self._step = {"waited_ms": 0.0, "legacy_ms": 0.0}
+
+    def end_step(self):
+        """Returns {"waited_ms", "saved_ms"} for the step just executed."""
+        waited = round(self._step["waited_ms"], 1)
+        return {"waited_ms": waited, "saved_ms": round(max(0.0, self._step["legacy_ms"] - waited), 1)}
+
+    def _record(self, step_type, wait, started):
+        self._step["waited_ms"] += (time.monotonic() - started) * 1000
+        self._step["legacy_ms"] += LEGACY_SLEEP_MS.get((step_type, wait), 0)
+
+    # ---------------- CONDITIONS ----------------
+    async def _dom_quiet(self, quiet_ms, timeout_ms):
+        if timeout_ms <= 0:
+            return False
+        try:
+            return await self.page.evaluate(_DOM_QUIET_JS, [quiet_ms, timeout_ms])
+        except Exception:
+            # Navigation destroyed the context mid-wait: the page is changing, not quiet
+            return False
+
+    async def _network_idle(self, idle_ms, timeout_ms):
+        deadline = time.monotonic() + timeout_ms / 1000
+        while time.monotonic() < deadline:
+            idle_for = (time.monotonic() - self._last_network_activity) * 1000
+            if self._inflight == 0 and idle_for >= idle_ms:
+                return True
+            await asyncio.sleep(min(0.05, max(0.001, deadline - time.monotonic())))
+        return False
+
+    async def _url_change(self, old_url, timeout_ms):
+        if timeout_ms <= 0:
+            return self.page.url != old_url
+        try:
+            await self.page.wait_for_url(lambda url: url != old_url, wait_until="commit", timeout=timeout_ms)
+            return True
+        except TimeoutError:
+            return False
+
+    def _remaining_ms(self, deadline):
+        return max(0, int((deadline - time.monotonic()) * 1000))
+
+    # ---------------- PUBLIC WAITS ----------------
+    async def dom_quiet(self, step_type, quiet_ms=300, timeout_ms=2000):
+        started = time.monotonic()
+        with span("wait.dom_quiet", step_type=step_type):
+            ok = await self._dom_quiet(quiet_ms, timeout_ms)
+        self._record(step_type, "dom_quiet", started)
+        return ok
+
+    async def network_idle(self, step_type, idle_ms=300, timeout_ms=2000):
+        started = time.monotonic()
+        with span("wait.network_idle", step_type=step_type):
+            ok = await self._network_idle(idle_ms, timeout_ms)
+        self._record(step_type, "network_idle", started)
+        return ok
+
+    async def stable(self, step_type, element, timeout_ms=500):
+        """Waits until the element stops moving/animating (two identical animation frames)."""
+        started = time.monotonic()
+        with span("wait.stable", step_type=step_type):
+            try:
+                handle = await element.element_handle(timeout=timeout_ms) if hasattr(element, "element_handle") else element
+                await handle.wait_for_element_state("stable", timeout=timeout_ms)
+                ok = True
+            except Exception:
+                ok = False
+        self._record(step_type, "stable", started)
+        return ok
+
+    async def url_change(self, step_type, old_url, timeout_ms=2000):
+        started = time.monotonic()
+        with span("wait.url_change", step_type=step_type):
+            ok = await self._url_change(old_url, timeout_ms)
+        self._record(step_type, "url_change", started)
+        return ok
+
+    async def settle(self, step_type, timeout_ms=2000, old_url=None):
+        """
+        Waits for the page to settle after an action, all within one budget:
+        an expected URL change (if old_url is given), then network idle, then DOM quiet.
+        """
+        started = time.monotonic()
+        deadline = started + timeout_ms / 1000
+        with span("wait.settle", step_type=step_type):
+            if old_url is not None and self.page.url == old_url:
+                # Only a short grace period: many actions update the page in place
+                await self._url_change(old_url, min(500, self._remaining_ms(deadline)))
+            await self._network_idle(300, self._remaining_ms(deadline))
+            ok = await self._dom_quiet(200, self._remaining_ms(deadline))
+        self._record(step_type, "settle", started)
+        return ok
@@ -1,10 +1,46 @@
 import streamlit as st
 import requests
+import json
+import time
 import os
 
 # Get backend URL from environment or default to localhost
 BACKEND_URL = os.environ.get("BACKEND_URL", "http://127.0.0.1:5000")
 
+def report_url(fmt):
+    """Report of the run shown on screen (falls back to the latest run)."""
+    run_id = (st.session_state.get("report") or {}).get("run_id")
+    if run_id:
+        return f"{BACKEND_URL}/runs/{run_id}/report.{fmt}"
+    return f"{BACKEND_URL}/download/{fmt}"
+
+def stream_job_events(job_id):
+    """Yields a job's progress events as they happen, ending with "run_finished"."""
+    with requests.get(f"{BACKEND_URL}/jobs/{job_id}/events", params={"format": "ndjson"},
+                      stream=True, timeout=(10, 60)) as res:
+        res.raise_for_status()
+        for line in res.iter_lines():
+            if line: # Blank lines are keep-alives
+                yield json.loads(line)
+
+def step_card(step):
+    badge_class = "badge-pass" if step["status"] == "PASS" else "badge-fail"
+    error_html = ""
+    if "error" in step and step["error"]:
+        error_html = f'<div class="error-text">⚠️ {step["error"]}</div>'
+    return f"""
+            <div class="step-card">
+                <div style="display:flex; justify-content:space-between; align-items:center;">
+                    <span class="step-title">Step {step['step_no']}: {step['action']}</span>
+                    <span class="badge {badge_class}">{step['status']}</span>
+                </div>
+                <div style="margin-top:8px;"> 
+                    Target: <span class="step-target">{step['target']}</span>
+                </div>
+                {error_html}
+            </div>
+            """
+
 st.set_page_config(page_title="AI Web Test Agent", layout="wide", page_icon="🤖")
 
 st.markdown("""
@@ -223,6 +259,8 @@ tab1, tab2 = st.tabs(["▶️ Run Test", "📜 History"])
 
 with tab1:
     col1, col2 = st.columns([2, 1])
+    # Steps appear here while the test runs
+    live_area = st.empty()
 
     if "report" not in st.session_state:
         st.session_state.report = None
@@ -237,6 +275,13 @@ with tab1:
 
     with col2:
         st.write("### ⚙️ Controls")
+
+        # The Cancel button below interrupts the polling loop; this rerun cancels the job
+        if st.session_state.get("cancel_job") and st.session_state.get("job_id"):
+            requests.post(f"{BACKEND_URL}/jobs/{st.session_state.job_id}/cancel", timeout=10)
+            st.session_state.job_id = None
+            st.info("Cancellation requested.")
+
         if st.button("▶️ Run Test", type="primary", use_container_width=True):
             if not instruction:
                 st.warning("Please enter test steps.")
@@ -246,15 +291,65 @@ with tab1:
 
                 with st.spinner("🤖 Agent is executing test..."):
                     try:
+                        # /run queues the test and returns a job id straight away
                         res = requests.post(
-                            "http://127.0.0.1:5000/run",
+                            f"{BACKEND_URL}/run",
                             json={"instruction": instruction, "api_key": api_key},
-                            timeout=120
+                            timeout=10
                         )
 
+                        if res.status_code == 202:
+                            job_id = res.json()["job_id"]
+                            st.session_state.job_id = job_id
+                            st.button("⏹️ Cancel Test", key="cancel_job", use_container_width=True)
+
+                            # Render each step as soon as it finishes instead of waiting for the report
+                            try:
+                                with live_area.container():
+                                    st.subheader("🔴 Live Execution")
+                                    progress = st.progress(0.0, text="Waiting for a browser...")
+                                    current = st.empty()
+                                    total, done = 0, 0
+                                    for event in stream_job_events(job_id):
+                                        kind = event["type"]
+                                        if kind == "run_started":
+                                            total = event["total_steps"]
+                                            progress.progress(0.0, text=f"0 / {total} steps")
+                                        elif kind == "step_started":
+                                            current.info(f"▶️ Step {event['step_no']}: {event['action']} {event['target']}")
+                                        elif kind == "attempt_failed":
+                                            current.warning(f"🔁 Step {event['step_no']} attempt {event['attempt']} failed: {event['error']}")
+                                        elif kind == "healed":
+                                            current.info(f"🏥 Healed '{event['target']}' (step {event['step_no']})")
+                                        elif kind == "step_finished":
+                                            done += 1
+                                            st.markdown(step_card(event["step"]), unsafe_allow_html=True)
+                                            if total:
+                                                progress.progress(min(done / total, 1.0), text=f"{done} / {total} steps")
+                                        elif kind == "screenshot_ready":
+                                            img_resp = requests.get(f"{BACKEND_URL}/screenshots/{job_id}/{event['screenshot']}", timeout=5)
+                                            if img_resp.status_code == 200:
+                                                st.image(img_resp.content, caption=f"Step {event['step_no']} Screenshot", width=400)
+                                        elif kind == "run_finished":
+                                            current.empty()
+                                            break
+                            except requests.exceptions.RequestException:
+                                pass # Stream unavailable or dropped: fall back to polling below
+
+                            # Normally ready right away; polls if the stream ended early
+                            while True:
+                                res = requests.get(f"{BACKEND_URL}/jobs/{job_id}/result", timeout=10)
+                                if res.status_code != 202:
+                                    break
+                                time.sleep(1)
+                            st.session_state.job_id = None
+
                         if res.status_code == 200:
+                            live_area.empty() # The full results below replace the live view
                             st.session_state.report = res.json()
                             st.balloons()
+                        elif res.status_code == 409:
+                            st.warning("Test was cancelled before it started.")
                         else:
                             st.error("Backend error")
                             st.text(res.text)
@@ -282,30 +377,14 @@ with tab1:
 
         st.subheader("🧪 Step Execution")
         for step in st.session_state.report["steps"]:
-            status = step["status"]
-            badge_class = "badge-pass" if status == "PASS" else "badge-fail"
-
-            error_html = ""
-            if "error" in step and step["error"]:
-                error_html = f'<div class="error-text">⚠️ {step["error"]}</div>'
-
-            st.markdown(f"""
-            <div class="step-card">
-                <div style="display:flex; justify-content:space-between; align-items:center;">
-                    <span class="step-title">Step {step['step_no']}: {step['action']}</span>
-                    <span class="badge {badge_class}">{status}</span>
-                </div>
-                <div style="margin-top:8px;"> 
-                    Target: <span class="step-target">{step['target']}</span>
-                </div>
-                {error_html}
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(step_card(step), unsafe_allow_html=True)
             
             if step.get("screenshot"):
                 # Fetch image server-side to ensure it loads even if client can't hit backend port directly
                 try:
-                    img_url = f"http://127.0.0.1:5000/screenshots/{step['screenshot']}"
+                    run_id = st.session_state.report.get("run_id")
+                    img_path = f"{run_id}/{step['screenshot']}" if run_id else step['screenshot']
+                    img_url = f"{BACKEND_URL}/screenshots/{img_path}"
                     img_resp = requests.get(img_url, timeout=5)
                     if img_resp.status_code == 200:
                         st.image(img_resp.content, caption=f"Step {step['step_no']} Screenshot", width=600)
@@ -328,7 +407,7 @@ with tab1:
 
     with d2:
         if st.button("🧾 Generate JSON", use_container_width=True):
-            response = requests.get("http://127.0.0.1:5000/download/json")
+            response = requests.get(report_url("json"))
             if response.status_code == 200:
                 st.session_state.json_file = response.content
             else:
@@ -348,9 +427,18 @@ with tab1:
 
     with d1:
         if st.button("📄 Generate PDF", use_container_width=True):
-            response = requests.get("http://127.0.0.1:5000/download/pdf")
+            with st.spinner("Rendering PDF..."):
+                # Large reports render in the background: 202 until the PDF is ready
+                response = requests.get(report_url("pdf"))
+                for _ in range(120):
+                    if response.status_code != 202:
+                        break
+                    time.sleep(1)
+                    response = requests.get(report_url("pdf"))
             if response.status_code == 200:
                 st.session_state.pdf_file = response.content
+            elif response.status_code == 500:
+                st.error(response.json().get("error", "PDF rendering failed"))
             else:
                 st.error("Failed to fetch PDF report")
 
@@ -374,15 +462,56 @@ with tab2:
         if st.button("🗑️ Delete All History", type="primary"):
             try:
                 requests.delete(f"{BACKEND_URL}/history")
+                st.session_state.history_cursors = [None]
                 st.success("History deleted!")
                 st.rerun()
             except:
                 st.error("Failed to delete history")
-        
+
+    # Pass-rate trend is aggregated by the backend; the full table is never downloaded
     try:
-        res = requests.get(f"{BACKEND_URL}/history")
+        trend_res = requests.get(f"{BACKEND_URL}/history/trends", params={"bucket": "day"}, timeout=10)
+        if trend_res.status_code == 200 and trend_res.json()["points"]:
+            points = trend_res.json()["points"]
+            st.markdown("### 📈 Daily Pass Rate")
+            st.line_chart({p["bucket"]: p["pass_rate"] for p in points})
+    except Exception:
+        pass
+
+    # Filters (applied server-side)
+    f1, f2, f3 = st.columns([2, 1, 2])
+    with f1:
+        search = st.text_input("Search instructions", key="history_search")
+    with f2:
+        status_filter = st.selectbox("Status", ["All", "PASS", "FAIL"], key="history_status")
+    with f3:
+        date_range = st.date_input("Date range", value=(), key="history_dates")
+
+    params = {"limit": 25}
+    if search:
+        params["q"] = search
+    if status_filter != "All":
+        params["status"] = status_filter
+    if len(date_range) == 2:
+        params["since"] = date_range[0].isoformat()
+        params["until"] = date_range[1].isoformat()
+
+    # Cursor stack for keyset pagination; a filter change starts again at the first page
+    filter_key = repr(sorted(params.items()))
+    if st.session_state.get("history_filter_key") != filter_key:
+        st.session_state.history_filter_key = filter_key
+        st.session_state.history_cursors = [None]
+    if "history_cursors" not in st.session_state:
+        st.session_state.history_cursors = [None]
+    cursor = st.session_state.history_cursors[-1]
+    if cursor is not None:
+        params["cursor"] = cursor
+
+    try:
+        res = requests.get(f"{BACKEND_URL}/history", params=params, timeout=10)
         if res.status_code == 200:
-            history = res.json()
+            page = res.json()
+            history = page["runs"]
             if not history:
                 st.info("No test runs found yet.")
             else:
@@ -409,8 +538,20 @@ with tab2:
                     use_container_width=True,
                     hide_index=True
                 )
+
+                p1, p2, p3 = st.columns([1, 1, 3])
+                with p1:
+                    if st.button("⬅️ Newer", disabled=len(st.session_state.history_cursors) == 1):
+                        st.session_state.history_cursors.pop()
+                        st.rerun()
+                with p2:
+                    if st.button("Older ➡️", disabled=page["next_cursor"] is None):
+                        st.session_state.history_cursors.append(page["next_cursor"])
+                        st.rerun()
+                with p3:
+                    st.caption(f"Page {len(st.session_state.history_cursors)}")
                 
-                # Show full exact query in expander
+                # Show full exact query in expander (current page only)
                 st.markdown("### 📝 Detailed Instruction Logs")
                 for run in history:
                     with st.expander(f"Run #{run['id']} - {run['timestamp']} (Status: {run['status']})"):
@@ -427,4 +568,3 @@ with tab2:
             st.error("Failed to fetch history")
     except Exception as e:
         st.error(f"Error connecting to backend: {e}")
-